@@ -0,0 +1,215 @@
+"""
+Module containing Barnes-Hut gravity solver
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.physic import Physic
+from app.scripts.config import Config
+
+
+class BarnesHut:
+    """
+    Barnes-Hut solver, based on quadtree.
+    Tree is built from Morton (Z-order) codes of bodies, so every node of the tree
+    owns a contiguous range of sorted bodies. Tree is walked by all targets at once,
+    level by level.
+    """
+
+    MAX_DEPTH = 16  # Max depth of the tree (bodies in the same deepest cell are summed directly)
+
+    def __init__(self, theta: float = Config.BARNES_HUT_THETA):
+        """
+        :param theta: Opening angle. Node is used as a single body, if size / distance < theta
+        """
+
+        self.theta = theta
+        self.nodes_count = 0
+
+    @staticmethod
+    def get_morton_codes(cells: np.ndarray) -> np.ndarray:
+        """
+        Interleaves bits of X and Y cell coordinates
+        :param cells: Array (n, 2) of integer cell coordinates (less than 2 ** 16)
+        :return: Array (n,) of Morton codes
+        """
+
+        codes = np.zeros(len(cells), dtype=np.int64)
+        for axis in range(2):
+            value = cells[:, axis].astype(np.int64)
+            value = (value | (value << 8)) & 0x00FF00FF
+            value = (value | (value << 4)) & 0x0F0F0F0F
+            value = (value | (value << 2)) & 0x33333333
+            value = (value | (value << 1)) & 0x55555555
+            codes |= value << axis
+
+        return codes
+
+    @staticmethod
+    def expand_ranges(starts: np.ndarray, ends: np.ndarray) -> tuple:
+        """
+        Concatenates ranges [start, end)
+        :param starts: Array of beginnings of ranges
+        :param ends: Array of ends of ranges
+        :return: Tuple of (index of range, value) arrays
+        """
+
+        counts = ends - starts
+        owners = np.repeat(np.arange(len(starts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owners, starts[owners] + offsets
+
+    def build(self, positions: np.ndarray, masses: np.ndarray) -> None:
+        """
+        Builds tree from bodies
+        :param positions: Array (n, 2) of positions of bodies
+        :param masses: Array (n,) of masses of bodies
+        :return: None
+        """
+
+        self.positions = positions
+        self.masses = masses
+        self.nodes_count = 0
+        if len(positions) == 0:
+            return
+
+        # Square box containing all bodies
+        box_min = positions.min(axis=0)
+        box_size = max(float((positions.max(axis=0) - box_min).max()), 1.0)
+
+        # Sorting bodies by Morton code of the deepest cells
+        resolution = 2 ** BarnesHut.MAX_DEPTH
+        cells = np.clip(((positions - box_min) / box_size * resolution).astype(np.int64), 0, resolution - 1)
+        codes = self.get_morton_codes(cells)
+        self.order = np.argsort(codes, kind='stable')
+        codes = codes[self.order]
+        sorted_positions = positions[self.order]
+        sorted_masses = masses[self.order]
+        weighted_positions = sorted_positions * sorted_masses[:, np.newaxis]
+
+        # Nodes of all levels, root is the first one
+        levels = []
+        for depth in range(BarnesHut.MAX_DEPTH + 1):
+            prefixes = codes >> (2 * (BarnesHut.MAX_DEPTH - depth))
+            starts = np.flatnonzero(np.r_[True, prefixes[1:] != prefixes[:-1]])
+            ends = np.r_[starts[1:], len(codes)]
+            levels.append((starts, ends))
+
+            if np.all(ends - starts == 1):
+                break  # Every node of this level contains a single body
+
+        node_starts = np.concatenate([starts for starts, _ in levels])
+        node_ends = np.concatenate([ends for _, ends in levels])
+        level_offsets = np.cumsum([0] + [len(starts) for starts, _ in levels])
+
+        # Children of each node are contiguous nodes of the next level
+        first_children = np.zeros(len(node_starts), dtype=np.int64)
+        last_children = np.zeros(len(node_starts), dtype=np.int64)
+        for depth in range(len(levels) - 1):
+            starts, ends = levels[depth]
+            next_starts = levels[depth + 1][0]
+            nodes = slice(level_offsets[depth], level_offsets[depth + 1])
+            first_children[nodes] = level_offsets[depth + 1] + np.searchsorted(next_starts, starts)
+            last_children[nodes] = level_offsets[depth + 1] + np.searchsorted(next_starts, ends)
+
+        # Mass and center of mass of each node
+        cumulative_masses = np.r_[0, np.cumsum(sorted_masses)]
+        cumulative_positions = np.vstack([np.zeros((1, 2)), np.cumsum(weighted_positions, axis=0)])
+        node_masses = cumulative_masses[node_ends] - cumulative_masses[node_starts]
+        node_centers = cumulative_positions[node_ends] - cumulative_positions[node_starts]
+        node_centers /= np.where(node_masses == 0, 1, node_masses)[:, np.newaxis]
+
+        node_depths = np.repeat(np.arange(len(levels)), np.diff(level_offsets))
+
+        self.node_starts = node_starts
+        self.node_ends = node_ends
+        self.first_children = first_children
+        self.last_children = last_children
+        self.node_masses = node_masses
+        self.node_centers = node_centers
+        self.node_sizes = box_size / 2.0 ** node_depths
+        self.is_leaf = (node_ends - node_starts == 1) | (node_depths == len(levels) - 1)
+        self.sorted_positions = sorted_positions
+        self.sorted_masses = sorted_masses
+        self.nodes_count = len(node_starts)
+
+    def calculate_accelerations(self, targets: np.ndarray) -> np.ndarray:
+        """
+        Calculates accelerations in targets, caused by bodies of the tree
+        :param targets: Array (n, 2) of positions, in which acceleration is calculated
+        :return: Array (n, 2) of accelerations
+        """
+
+        accelerations = np.zeros((len(targets), 2))
+        if self.nodes_count == 0 or len(targets) == 0:
+            return accelerations
+
+        # Pairs (target, node), that have to be processed. Beginning from the root
+        pair_targets = np.arange(len(targets))
+        pair_nodes = np.zeros(len(targets), dtype=np.int64)
+
+        while pair_targets.size:
+            distances = self.node_centers[pair_nodes] - targets[pair_targets]
+            lengths = np.sqrt(np.einsum('ij,ij->i', distances, distances))
+
+            leaves = self.is_leaf[pair_nodes]
+            accepted = ~leaves & (self.node_sizes[pair_nodes] < self.theta * lengths)
+            opened = ~leaves & ~accepted
+
+            # Far nodes are used as a single body
+            self.accumulate(accelerations, pair_targets[accepted],
+                            Config.K * distances[accepted], self.node_masses[pair_nodes[accepted]])
+
+            # Bodies of leaves are summed directly
+            leaf_targets = pair_targets[leaves]
+            owners, bodies = self.expand_ranges(self.node_starts[pair_nodes[leaves]],
+                                                self.node_ends[pair_nodes[leaves]])
+            leaf_targets = leaf_targets[owners]
+            self.accumulate(accelerations, leaf_targets,
+                            Config.K * (self.sorted_positions[bodies] - targets[leaf_targets]),
+                            self.sorted_masses[bodies])
+
+            # Near nodes are replaced with their children
+            owners, children = self.expand_ranges(self.first_children[pair_nodes[opened]],
+                                                  self.last_children[pair_nodes[opened]])
+            pair_targets = pair_targets[opened][owners]
+            pair_nodes = children
+
+        return accelerations
+
+    @staticmethod
+    def accumulate(accelerations: np.ndarray, targets: np.ndarray, vector_distances: np.ndarray,
+                   masses: np.ndarray) -> None:
+        """
+        Adds accelerations of pairs to accelerations of targets
+        :param accelerations: Array (n, 2) of accelerations, that is changed in place
+        :param targets: Array (p,) of indexes of targets
+        :param vector_distances: Array (p, 2) of scaled distances
+        :param masses: Array (p,) of masses
+        :return: None
+        """
+
+        if targets.size == 0:
+            return
+
+        pair_accelerations = Physic.pair_accelerations(vector_distances, masses)
+        for axis in range(2):
+            accelerations[:, axis] += np.bincount(targets, weights=pair_accelerations[:, axis],
+                                                  minlength=len(accelerations))
+
+    @staticmethod
+    def calculate_error(approximate: np.ndarray, exact: np.ndarray) -> dict:
+        """
+        Calculates relative error of approximate accelerations
+        :param approximate: Array (n, 2) of approximate accelerations
+        :param exact: Array (n, 2) of exact accelerations
+        :return: Dictionary with mean and max relative error
+        """
+
+        if len(exact) == 0:
+            return {'mean': 0.0, 'max': 0.0}
+
+        exact_lengths = np.linalg.norm(exact, axis=1)
+        errors = np.linalg.norm(approximate - exact, axis=1) / np.where(exact_lengths == 0, 1, exact_lengths)
+        return {'mean': float(errors.mean()), 'max': float(errors.max())}
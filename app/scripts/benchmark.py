@@ -0,0 +1,228 @@
+"""
+Benchmark suite: times subsystems of simulation on reproducible scenes.
+
+Usage (from the root of project):
+    python -m app.scripts.benchmark --bodies 100 500 1000 --output bench.json
+    python -m app.scripts.benchmark --output new.json --compare bench.json --threshold 0.15
+"""
+
+# Modules
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Rendering benchmarks need display, but not a window
+
+import numpy as np
+import pygame
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.scenarios import Scenarios
+from app.scripts.collisions import Collisions
+from app.scripts.grid import Grid
+from app.scripts.physics_worker import PhysicsState
+from app.scripts.trace_buffer import TraceBuffer
+from app.scripts.config import Config
+
+
+class Benchmark:
+    def __init__(self, repeats: int = 5, dt: float = Config.PHYSICS_DT):
+        """
+        :param repeats: Number of timed calls of each subsystem
+        :param dt: Time step of physics
+        """
+
+        self.repeats = repeats
+        self.dt = dt
+        self.results = []
+
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))  # convert_alpha() needs display mode to be set
+        self.grid = Grid(color=Config.GRID_COLOR, distance=Config.GRID_DISTANCE)
+
+    def get_subsystems(self) -> dict:
+        """Returns dictionary {name: function}, calls of which are timed"""
+
+        def physics():
+            SimulationManager.update_physics(self.dt)
+
+        def collisions():
+            # Only search of pairs is timed: resolving them would merge bodies of scene, shared by next subsystems
+            store = SimulationManager.bodies
+            Collisions.find_collisions(store.positions[:store.count], store.radii[:store.count])
+
+        def grid_dots():
+            self.grid.calculate_grid_dots()
+
+        def grid_draw():
+            self.grid.draw_curved_grid()
+
+        def trace():
+            SimulationManager.trace_surface.fill(Config.TRANSPARENT)
+            SimulationManager.update_view(PhysicsState.capture())
+            SimulationManager.draw_traces()
+
+        def glow():
+            SimulationManager.glow_surface.fill(Config.TRANSPARENT)
+            SimulationManager.update_view(PhysicsState.capture())
+            SimulationManager.draw_glow()
+
+        return {
+            'physics': physics,
+            'collisions': collisions,
+            'grid_dots': grid_dots,
+            'grid_draw': grid_draw,
+            'trace': trace,
+            'glow': glow,
+        }
+
+    def prepare_scene(self, scenario: str, bodies: int, seed: int) -> None:
+        """
+        Generates scene and fills traces of planets, so drawing of traces costs as much as in a long run
+        :param scenario: Name of scenario
+        :param bodies: Number of planets
+        :param seed: Seed of scenario
+        :return: None
+        """
+
+        Scenarios.clear()
+        Scenarios.GENERATORS[scenario](bodies, seed=seed)
+
+        store = SimulationManager.bodies
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        steps = np.arange(-Config.MAX_TRACE_LENGTH, 1)[:, np.newaxis] * self.dt
+        for body_id, position, velocity in zip(store.ids[planet_slots].tolist(), store.positions[planet_slots],
+                                               store.velocities[planet_slots]):
+            trace = SimulationManager.traces[body_id] = TraceBuffer(capacity=Config.MAX_TRACE_LENGTH)
+            trace.set_points(position + steps * velocity)
+
+        self.grid.calculate_grid_dots()
+
+    def run(self, scenarios: list, bodies_counts: list, seed: int = 0, subsystems: list = None) -> list:
+        """
+        Times subsystems on every scenario and number of bodies
+        :param scenarios: List of names of scenarios
+        :param bodies_counts: List of numbers of planets
+        :param seed: Seed of scenarios
+        :param subsystems: Names of timed subsystems (all if None)
+        :return: List of results
+        """
+
+        for scenario in scenarios:
+            for bodies in bodies_counts:
+                self.prepare_scene(scenario, bodies, seed)
+
+                for name, function in self.get_subsystems().items():
+                    if subsystems and name not in subsystems:
+                        continue
+
+                    times = []
+                    for _ in range(self.repeats):
+                        start_time = time.perf_counter()
+                        function()
+                        times.append(time.perf_counter() - start_time)
+
+                    seconds = statistics.median(times)
+                    result = {
+                        'scenario': scenario,
+                        'bodies': bodies,
+                        'subsystem': name,
+                        'seconds': seconds,
+                        'calls_per_second': 1 / seconds if seconds > 0 else float('inf'),
+                        'bodies_left': SimulationManager.bodies.get_count(BodyStore.PLANET),
+                    }
+                    self.results.append(result)
+                    print(f'{scenario:>8} {bodies:>6} {name:>10}: {1000 * seconds:9.3f} ms')
+
+        return self.results
+
+    def save(self, path: str) -> None:
+        """
+        Saves results to JSON file
+        :param path: Path to file
+        :return: None
+        """
+
+        data = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'pygame': pygame.version.ver,
+                'machine': platform.machine(),
+                'gravity_solver': Config.GRAVITY_SOLVER,
+                'integrator': Config.INTEGRATOR,
+                'repeats': self.repeats,
+            },
+            'results': self.results,
+        }
+
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=2)
+
+    @staticmethod
+    def compare(results: list, baseline_path: str, threshold: float) -> list:
+        """
+        Compares results with stored baseline
+        :param results: List of current results
+        :param baseline_path: Path to JSON file with baseline
+        :param threshold: Allowed relative slowdown (0.1 is 10%)
+        :return: List of regressions
+        """
+
+        with open(baseline_path) as file:
+            baseline = {(result['scenario'], result['bodies'], result['subsystem']): result['seconds']
+                        for result in json.load(file)['results']}
+
+        regressions = []
+        for result in results:
+            key = (result['scenario'], result['bodies'], result['subsystem'])
+            if key not in baseline or baseline[key] == 0:
+                continue
+
+            ratio = result['seconds'] / baseline[key]
+            status = 'REGRESSION' if ratio > 1 + threshold else 'ok'
+            print(f'{key[0]:>8} {key[1]:>6} {key[2]:>10}: x{ratio:.2f} {status}')
+
+            if ratio > 1 + threshold:
+                regressions.append({**result, 'baseline_seconds': baseline[key], 'ratio': ratio})
+
+        return regressions
+
+
+def parse_arguments(arguments=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Times subsystems of simulation')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(Scenarios.GENERATORS),
+                        default=['ring', 'cloud', 'cluster'], help='Scenarios')
+    parser.add_argument('--bodies', nargs='+', type=int, default=[100, 250, 500, 1000], help='Numbers of planets')
+    parser.add_argument('--subsystems', nargs='+', help='Timed subsystems (all by default)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of scenarios')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of timed calls of each subsystem')
+    parser.add_argument('--output', default='bench_output.json', help='Path to JSON file with results')
+    parser.add_argument('--compare', help='Path to JSON file with baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative slowdown')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None) -> int:
+    arguments = parse_arguments(arguments)
+
+    benchmark = Benchmark(repeats=arguments.repeats)
+    benchmark.run(arguments.scenarios, arguments.bodies, seed=arguments.seed, subsystems=arguments.subsystems)
+    benchmark.save(arguments.output)
+
+    if arguments.compare:
+        regressions = Benchmark.compare(benchmark.results, arguments.compare, arguments.threshold)
+        print(f'Regressions: {len(regressions)}')
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
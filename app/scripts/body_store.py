@@ -0,0 +1,186 @@
+"""
+Module containing struct-of-arrays storage of state of celestial bodies.
+
+State of every body lives in typed arrays, so physics, collisions, recording and snapshots read and write all bodies
+at once without gathering them from objects. Bodies are densely packed into the first `count` slots:
+removed body is replaced with the last one (swap-remove), and stable handles map to current slots.
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.config import Config
+
+
+class BodyStore:
+    # Kinds of bodies (the same as in Snapshot)
+    STAR = 0
+    PLANET = 1
+
+    # Arrays of state {name: (dtype, shape of item)}
+    FIELDS = {
+        'positions': (np.float64, (2,)),
+        'velocities': (np.float64, (2,)),
+        'masses': (np.float64, ()),
+        'radii': (np.float64, ()),
+        'kinds': (np.uint8, ()),
+        'colors': (np.uint8, (4,)),
+        'ids': (np.int64, ()),
+        'handles': (np.int64, ()),  # Handle of body in every slot
+    }
+
+    def __init__(self, capacity: int = Config.BODY_STORE_CAPACITY):
+        """
+        :param capacity: Initial number of slots (arrays are doubled, when they are full)
+        """
+
+        self.count = 0  # Number of bodies (bodies occupy slots 0 ... count - 1)
+        self.capacity = 0
+        self.bodies = []  # Objects of bodies in order of slots
+        self.slots = np.zeros(0, dtype=np.int64)  # Slot of every handle (-1 if handle is free)
+        self.free_handles = []  # Handles of removed bodies, that are reused
+        self.version = 0  # Increased on every adding and removing of body
+        self.resize(capacity)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def resize(self, capacity: int) -> None:
+        """
+        Reallocates arrays (views of arrays, taken before resizing, aren't updated)
+        :param capacity: New number of slots (not less than number of bodies)
+        :return: None
+        """
+
+        for name, (dtype, shape) in BodyStore.FIELDS.items():
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+        slots = np.full(capacity, -1, dtype=np.int64)
+        slots[:len(self.slots)] = self.slots
+        self.slots = slots
+        self.capacity = capacity
+
+    def add(self, body, body_id: int, kind: int, position: tuple, velocity: tuple, mass: float, radius: float,
+            color: tuple) -> int:
+        """
+        Adds body to the end of arrays (O(1) amortized)
+        :param body: Object of body (it is returned by get_body)
+        :param body_id: ID of body
+        :param kind: BodyStore.STAR or BodyStore.PLANET
+        :param position: Position (x, y)
+        :param velocity: Velocity (x, y)
+        :param mass: Mass
+        :param radius: Radius
+        :param color: Color (r, g, b, a)
+        :return: Handle of body (stays the same, while body exists)
+        """
+
+        if self.count == self.capacity:
+            self.resize(2 * self.capacity)
+
+        # Handles of removed bodies are reused, so number of handles never exceeds capacity
+        handle = self.free_handles.pop() if self.free_handles else self.count
+
+        slot = self.count
+        self.positions[slot] = position
+        self.velocities[slot] = velocity
+        self.masses[slot] = mass
+        self.radii[slot] = radius
+        self.kinds[slot] = kind
+        self.ids[slot] = body_id
+        self.colors[slot] = color
+        self.handles[slot] = handle
+        self.slots[handle] = slot
+        self.bodies.append(body)
+
+        self.count += 1
+        self.version += 1
+        return handle
+
+    def add_many(self, columns: dict, bodies: list = None) -> np.ndarray:
+        """
+        Adds bodies to the end of arrays with one write per array (version is increased once)
+        :param columns: State of new bodies {name of field: array}, all fields except handles
+        :param bodies: Objects of bodies (None for every body, if None, see SimulationManager.get_body)
+        :return: Array of handles of bodies
+        """
+
+        count = len(columns['ids'])
+        capacity = max(self.capacity, 1)
+        while capacity < self.count + count:
+            capacity *= 2
+        if capacity != self.capacity:
+            self.resize(capacity)
+
+        # Handles of removed bodies are reused first in the same order as in BodyStore.add,
+        # the rest of handles follow all allocated handles
+        reused_count = min(count, len(self.free_handles))
+        reused_handles = self.free_handles[len(self.free_handles) - reused_count:][::-1]
+        del self.free_handles[len(self.free_handles) - reused_count:]
+        handles = np.concatenate([np.array(reused_handles, dtype=np.int64),
+                                  np.arange(self.count + reused_count, self.count + count, dtype=np.int64)])
+
+        start, end = self.count, self.count + count
+        for name in BodyStore.FIELDS:
+            if name != 'handles':
+                getattr(self, name)[start:end] = columns[name]
+        self.handles[start:end] = handles
+        self.slots[handles] = np.arange(start, end)
+        self.bodies.extend([None] * count if bodies is None else bodies)
+
+        self.count = end
+        self.version += 1
+        return handles
+
+    def remove(self, handle: int) -> None:
+        """
+        Removes body, moving the last body into its slot (O(1)). Free handle is ignored
+        :param handle: Handle of body
+        :return: None
+        """
+
+        slot = self.slots[handle]
+        if slot < 0:
+            return
+
+        last = self.count - 1
+        if slot != last:
+            for name in BodyStore.FIELDS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            self.slots[self.handles[slot]] = slot
+            self.bodies[slot] = self.bodies[last]
+
+        self.bodies.pop()
+        self.slots[handle] = -1
+        self.free_handles.append(handle)
+        self.count = last
+        self.version += 1
+
+    def clear(self) -> None:
+        self.slots[:] = -1
+        self.free_handles = []
+        self.bodies = []
+        self.count = 0
+        self.version += 1
+
+    def get_slot(self, handle: int) -> int:
+        return int(self.slots[handle])
+
+    def get_body(self, slot: int):
+        """Returns object of body in slot (None for body, added by add_many without objects)"""
+
+        return self.bodies[slot]
+
+    def get_count(self, kind: int) -> int:
+        """Returns number of bodies of given kind"""
+
+        return int(np.count_nonzero(self.kinds[:self.count] == kind))
+
+    def get_indexes(self, kind: int) -> np.ndarray:
+        """Returns slots of all bodies of given kind in order of slots"""
+
+        return np.flatnonzero(self.kinds[:self.count] == kind)
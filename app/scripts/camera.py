@@ -0,0 +1,89 @@
+"""
+Module containing camera, that maps coordinates of world to coordinates of screen
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.config import Config
+
+
+class Camera:
+    """
+    Pan and zoom over unbounded world.
+    Point of world (x, y) is drawn at ((x - left) * zoom, (y - top) * zoom) of screen.
+    """
+
+    def __init__(self, size: tuple = Config.WINDOW_SIZE):
+        """
+        :param size: Size of screen (width, height)
+        """
+
+        self.width, self.height = size
+        self.left = 0.0  # Point of world in the top left corner of screen
+        self.top = 0.0
+        self.zoom = 1.0  # Pixels of screen per unit of world
+        self.version = 0  # Increased on every change of view
+
+    def reset(self) -> None:
+        self.set_view(0.0, 0.0, 1.0)
+
+    def set_view(self, left: float, top: float, zoom: float) -> None:
+        zoom = min(max(zoom, Config.CAMERA_MIN_ZOOM), Config.CAMERA_MAX_ZOOM)
+        if (left, top, zoom) != (self.left, self.top, self.zoom):
+            self.left, self.top, self.zoom = left, top, zoom
+            self.version += 1
+
+    def pan(self, dx: float, dy: float) -> None:
+        """
+        Moves view
+        :param dx: Shift of world on screen along X (pixels)
+        :param dy: Shift of world on screen along Y (pixels)
+        :return: None
+        """
+
+        self.set_view(self.left - dx / self.zoom, self.top - dy / self.zoom, self.zoom)
+
+    def zoom_at(self, point: tuple, factor: float) -> None:
+        """
+        Changes zoom, keeping point of world under given point of screen
+        :param point: Point of screen (x, y)
+        :param factor: Multiplier of zoom
+        :return: None
+        """
+
+        x, y = self.to_world(point)
+        zoom = min(max(self.zoom * factor, Config.CAMERA_MIN_ZOOM), Config.CAMERA_MAX_ZOOM)
+        self.set_view(x - point[0] / zoom, y - point[1] / zoom, zoom)
+
+    def to_screen(self, point: tuple) -> tuple:
+        return (point[0] - self.left) * self.zoom, (point[1] - self.top) * self.zoom
+
+    def to_world(self, point: tuple) -> tuple:
+        return point[0] / self.zoom + self.left, point[1] / self.zoom + self.top
+
+    def to_screen_array(self, points: np.ndarray) -> np.ndarray:
+        """
+        Maps array (..., 2) of points of world to points of screen
+        :param points: Points of world
+        :return: Array of the same shape
+        """
+
+        return (points - (self.left, self.top)) * self.zoom
+
+    def get_world_rect(self) -> tuple:
+        """Returns visible part of world (left, top, right, bottom)"""
+
+        return self.left, self.top, self.left + self.width / self.zoom, self.top + self.height / self.zoom
+
+    def get_visible(self, positions: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """
+        Finds circles, that are at least partly visible
+        :param positions: Array (n, 2) of centers in world
+        :param radii: Array (n,) of radii in world
+        :return: Boolean array (n,)
+        """
+
+        left, top, right, bottom = self.get_world_rect()
+        x, y = positions[:, 0], positions[:, 1]
+        return (x + radii >= left) & (x - radii <= right) & (y + radii >= top) & (y - radii <= bottom)
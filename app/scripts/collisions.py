@@ -0,0 +1,119 @@
+"""
+Module containing search of collisions between bodies
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.barnes_hut import BarnesHut
+
+
+class SpatialHash:
+    """
+    Uniform grid of cells, in which bodies are sorted by key of their cell.
+    If size of cell isn't less than the biggest diameter, colliding bodies are in the same or in neighbouring cells.
+    """
+
+    # Own cell and half of neighbouring cells (the other half is checked by neighbours), so every pair is found once
+    NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+    def __init__(self, cell_size: float):
+        """
+        :param cell_size: Size of cell
+        """
+
+        self.cell_size = cell_size
+
+    @staticmethod
+    def get_keys(cells: np.ndarray) -> np.ndarray:
+        """Returns unique integer keys of cells"""
+
+        return cells[:, 0] * 2 ** 32 + cells[:, 1]
+
+    def build(self, positions: np.ndarray) -> None:
+        """
+        Puts bodies into cells
+        :param positions: Array (n, 2) of positions of bodies
+        :return: None
+        """
+
+        self.cells = np.floor(positions / self.cell_size).astype(np.int64)
+        keys = self.get_keys(self.cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def get_candidate_pairs(self) -> tuple:
+        """
+        Returns pairs of bodies from the same or neighbouring cells
+        :return: Tuple of arrays of indexes of first and second bodies of pairs
+        """
+
+        first_bodies, second_bodies = [], []
+
+        for offset in SpatialHash.NEIGHBOURS:
+            neighbour_keys = self.get_keys(self.cells + offset)
+            starts = np.searchsorted(self.sorted_keys, neighbour_keys, side='left')
+            ends = np.searchsorted(self.sorted_keys, neighbour_keys, side='right')
+
+            owners, indexes = BarnesHut.expand_ranges(starts, ends)
+            others = self.order[indexes]
+
+            if offset == (0, 0):
+                is_new_pair = owners < others  # Pair inside of cell is found by both bodies
+                owners, others = owners[is_new_pair], others[is_new_pair]
+
+            first_bodies.append(owners)
+            second_bodies.append(others)
+
+        return np.concatenate(first_bodies), np.concatenate(second_bodies)
+
+
+class Collisions:
+    @staticmethod
+    def find_collisions(positions: np.ndarray, radii: np.ndarray) -> tuple:
+        """
+        Returns pairs of overlapping bodies
+        :param positions: Array (n, 2) of positions of bodies
+        :param radii: Array (n,) of radii of bodies
+        :return: Tuple of arrays of indexes of first and second bodies of pairs
+        """
+
+        if len(positions) < 2:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Broad phase
+        spatial_hash = SpatialHash(cell_size=max(2 * float(radii.max()), 1.0))
+        spatial_hash.build(positions)
+        first_bodies, second_bodies = spatial_hash.get_candidate_pairs()
+
+        # Narrow phase
+        distances = np.linalg.norm(positions[first_bodies] - positions[second_bodies], axis=1)
+        is_colliding = distances < radii[first_bodies] + radii[second_bodies]
+
+        return first_bodies[is_colliding], second_bodies[is_colliding]
+
+    @staticmethod
+    def group_pairs(pairs: list) -> list:
+        """
+        Unites pairs of colliding objects into groups (connected components)
+        :param pairs: List of pairs of objects
+        :return: List of lists of objects
+        """
+
+        parents = {}
+
+        def find(item):
+            parents.setdefault(item, item)
+            while parents[item] is not item:
+                parents[item] = parents[parents[item]]
+                item = parents[item]
+            return item
+
+        for first, second in pairs:
+            parents[find(first)] = find(second)
+
+        groups = {}
+        for item in parents:
+            groups.setdefault(find(item), []).append(item)
+
+        return list(groups.values())
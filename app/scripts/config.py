@@ -24,22 +24,108 @@ class Config:
     # Simulation variables
     G = 0.075
     K = 1.3
+    MIN_DISTANCE = 4  # Min distance between bodies, used to soften close encounters
+    FORCE_CHUNK_SIZE = 256  # Number of bodies processed by one vectorized force evaluation
+
+    # Fixed time step of physics (1 is a step of 1 / STABLE_FPS seconds at normal speed)
+    PHYSICS_DT = 1
+    MAX_PHYSICS_STEPS = 24  # Max number of physics steps per frame (the rest of time is dropped)
+    INTEGRATOR = 'leapfrog'  # 'euler', 'leapfrog' or 'rk4'
+    PHYSICS_WORKER = True  # Physics is advanced by background thread, independently of rendering
+    PHYSICS_WORKER_IDLE_TIME = 0.01  # Max time between checks of speed and of stopping of worker (seconds)
+
+    # Block time steps (every planet gets step PHYSICS_DT / 2 ** level, replaces INTEGRATOR with leapfrog)
+    BLOCK_TIMESTEPS = False
+    BLOCK_MAX_LEVEL = 6  # The smallest step is PHYSICS_DT / 2 ** BLOCK_MAX_LEVEL
+    BLOCK_TIMESTEP_ACCURACY = 0.05  # Step is this part of |velocity| / |acceleration|
+
+    # Gravity solver ('direct', 'barnes_hut' or 'parallel')
+    GRAVITY_SOLVER = 'direct'
+    BARNES_HUT_THETA = 0.5  # Opening angle: bigger value is faster, but less accurate
+    BARNES_HUT_REPORT_ERROR = False  # Comparing Barnes-Hut with direct summation (errors are events of EventBus)
+    BARNES_HUT_REPORT_INTERVAL = 100  # Steps between error reports
+    PARALLEL_WORKERS = None  # Number of processes of parallel solver (number of CPUs if None)
+    PARALLEL_MIN_BODIES = 2000  # Parallel solver works serially, if there are fewer planets
+
+    # Precomputed field of stars (planets read it by interpolation, only planet-planet forces are summed)
+    STAR_FIELD = False
+    STAR_FIELD_LEVELS = 5  # Number of nested patches around every star (each is twice smaller and finer)
+    STAR_FIELD_RESOLUTION = 64  # Number of cells along side of every patch
+    STAR_FIELD_PATCH_SIZE = 1024  # Half of side of the biggest patch
+    STAR_FIELD_EXTENT = 8  # Coarse grid covers this number of window sizes from origin
+    STAR_FIELD_UPDATE_INTERVAL = 50  # Steps between adding of changes of stars' masses to grids (summed until then)
+    STAR_FIELD_REPORT_ERROR = False  # Comparing interpolated field with direct summation (events of EventBus)
+    STAR_FIELD_REPORT_INTERVAL = 100  # Steps between error reports
+
+    # Profiling of frames
+    PROFILER_HISTORY = 240  # Number of last frames, from which percentiles are calculated
+    PROFILER_OVERLAY_INTERVAL = 30  # Frames between updates of overlay
+    PROFILER_FONT_SIZE = 20
+    PROFILER_BG_COLOR = Color(0, 0, 0, 160)
+
+    # Conservation diagnostics (energy, momentum and angular momentum)
+    DIAGNOSTICS_INTERVAL = 50  # Steps between samples
+    DIAGNOSTICS_TOLERANCE = 1e-3  # Max relative drift of energy, that is considered accurate
+
+    # Parameter sweeps (independent simulations on pool of processes)
+    SWEEP_WORKERS = None  # Number of processes (number of CPUs if None)
+    SWEEP_EVENTS_INTERVAL = 1000  # Steps between counting of events of run (less, than size of buffer of events)
+
+    # Generated scenes (positions of planets, that overlap other bodies, are drawn again)
+    SCENARIO_MAX_FILL = 0.15  # Max part of area of cloud or cluster, covered by planets (region is enlarged)
+    SCENARIO_PLACEMENT_ATTEMPTS = 100  # Max number of redrawings of overlapping positions
+
+    # Camera (world isn't bounded by window, bodies out of view are simulated, but not drawn)
+    CAMERA_MIN_ZOOM = 0.05
+    CAMERA_MAX_ZOOM = 8
+    CAMERA_ZOOM_STEP = 1.1  # Change of zoom by one step of mouse wheel
+    SYSTEM_BOUNDARY = 8  # Planets farther than this number of window sizes from origin are removed (never if None)
+
+    # Stream of events of simulation (births, deaths, devours and changes of mass)
+    EVENT_BUFFER_SIZE = 65536  # Number of the newest events, that are kept in memory
+    EVENT_SINK_INTERVAL = 0.5  # Time between writes of events to JSONL file (seconds)
+
+    # Replay of recorded trajectories
+    REPLAY_SEEK_FRAMES = 100  # Frames skipped by one press of arrow key
+
+    # Rendering (with dirty rects only regions, changed in this or in the previous frame, are redrawn)
+    DIRTY_RECTS = True
+    DIRTY_RECTS_MAX_AREA = 0.5  # Whole screen is redrawn, if dirty rects cover bigger part of it
+    DIRTY_RECTS_MAX_COUNT = 200  # or if there are more dirty rects (many small blits are slower than one big)
+
+    # Adaptive quality (lowered level by level, if frames are slower, than 1 / FPS)
+    ADAPTIVE_QUALITY = True
+    QUALITY_SMOOTHING = 0.1  # Weight of the last frame in average time of frame
+    QUALITY_COOLDOWN_FRAMES = 30  # Min number of frames between changes of quality
+    QUALITY_HEADROOM = 0.75  # Quality is restored, if frames take less than this part of budget
+    QUALITY_RETRY_FRAMES = 300  # Frames before retrying of better quality without enough headroom
 
     # Simulation objects' settings
     BASE_GLOW_ALPHA = 20
     BASE_TRACE_ALPHA = 128
+    BODY_STORE_CAPACITY = 1024  # Initial number of slots in arrays of bodies (doubled, when they are full)
+    RENDER_CACHE_SIZE = 256  # Max number of cached surfaces of bodies and glow
+    RENDER_CACHE_RADIUS_STEP = 0.5  # Radii of cached surfaces are rounded to this step
 
     # Planet settings
     PLANET_DEFAULT_MASS = 150
     PLANET_MIN_MASS = 50
     PLANET_MAX_MASS = 450
     MAX_TRACE_LENGTH = 400
+    TRACE_ALPHA_BUCKETS = 16  # Number of different alphas in trace (each is drawn by a single polyline)
 
     # Planet preview
-    PV_LENGTH_COEF = 20 / K
+    PV_LENGTH_COEF = 20 / K  # Derived from K (see Config.derive)
     PV_LINE_THICKNESS = 2
     PV_VELOCITY_COEF = 1 / 80
 
+    # Predicted trajectory of new planet (integrated in snapshot of bodies, taken when launch changes)
+    ORBIT_PREVIEW = True
+    ORBIT_PREVIEW_STEPS = 3000  # Max number of predicted steps
+    ORBIT_PREVIEW_FRAME_TIME = 0.002  # Time, spent on extension of trajectory in every frame (seconds)
+    ORBIT_PREVIEW_POINT_STRIDE = 4  # Steps between drawn points of trajectory
+    ORBIT_PREVIEW_COLOR = Color(120, 130, 150)
+
     # Star settings
     STAR_DEFAULT_MASS = 20000
     STAR_MIN_MASS = 10000
@@ -47,9 +133,16 @@ class Config:
     DEVOUR_COEFFICIENT = 10
 
     # Grid settings
-    GRID_DISTANCE = 30 / K
+    GRID_DISTANCE = 30 / K  # Derived from K (see Config.derive)
     GRID_THICKNESS = 1
     GRID_OPACITY = 32
     GRID_COLOR = Color(155, 155, 155, GRID_OPACITY)
     GRID_CURVATURE = 15
     MAX_GRID_DOT_OFFSET = 15
+
+    @staticmethod
+    def derive() -> None:
+        """Recalculates constants, derived from K (after K has been changed, e.g. by snapshot)"""
+
+        Config.PV_LENGTH_COEF = 20 / Config.K
+        Config.GRID_DISTANCE = 30 / Config.K
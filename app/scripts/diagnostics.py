@@ -0,0 +1,222 @@
+"""
+Module containing conservation diagnostics: energy, momentum and angular momentum of all bodies.
+
+Drift of conserved quantities shows accuracy, that is lost by bigger steps, integrators and approximate solvers.
+Stars don't move, so they are external field for planets: energy is always conserved,
+momentum only without stars and angular momentum (around center of stars) only with one star.
+Devouring and merging change quantities, so drift is summed over segments between changes of set of bodies
+(segment ends just before collisions change bodies and the next one starts just after them).
+"""
+
+# Modules
+import os
+import csv
+
+import numpy as np
+import pygame
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.physic import Physic
+from app.scripts.config import Config
+
+
+class Diagnostics:
+    QUANTITIES = ('energy', 'momentum', 'angular_momentum')
+    COLUMNS = ('step', 'kinetic', 'potential', 'energy', 'momentum_x', 'momentum_y', 'angular_momentum',
+               'energy_drift', 'momentum_drift', 'angular_momentum_drift')
+
+    def __init__(self, interval: int = Config.DIAGNOSTICS_INTERVAL):
+        """
+        :param interval: Min number of steps between samples
+        """
+
+        self.interval = interval
+        self.samples = []  # Rows of Diagnostics.COLUMNS
+        self.last_step = None
+
+        self.baseline = None  # Quantities at the beginning of current segment (after the last change of bodies)
+        self.version = None  # Version of SimulationManager.bodies, for which baseline was measured
+        self.segments_count = 0
+        self.drift = dict.fromkeys(Diagnostics.QUANTITIES, 0.0)  # Total relative drift in the last sample
+        self.previous_drift = dict(self.drift)  # Total relative drift of all finished segments
+        self.max_drift = dict.fromkeys(Diagnostics.QUANTITIES, 0.0)
+
+        self.is_overlay_shown = False
+        self.overlay = None
+        self.font = None
+
+    @staticmethod
+    def measure() -> dict:
+        """
+        Calculates conserved quantities of all planets in field of all bodies (the same G, K and softening, as Physic)
+        :return: Dictionary of quantities and their scales, used for relative drift
+        """
+
+        store = SimulationManager.bodies
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        star_slots = store.get_indexes(BodyStore.STAR)
+        masses = store.masses[planet_slots]
+        positions = store.positions[planet_slots]
+        velocities = store.velocities[planet_slots]
+
+        # Every pair of planets is counted twice, energy of stars doesn't change
+        planet_potentials = Physic.calculate_potentials(positions, positions, masses)
+        star_potentials = Physic.calculate_potentials(positions, store.positions[star_slots], store.masses[star_slots])
+        kinetic = 0.5 * float(masses @ np.einsum('ij,ij->i', velocities, velocities))
+        potential = Config.G * float(masses @ (0.5 * planet_potentials + star_potentials))
+
+        # Angular momentum around center of mass of stars
+        star_masses = store.masses[star_slots]
+        center = (star_masses @ store.positions[star_slots] / star_masses.sum()) if len(star_slots) else np.zeros(2)
+        offsets = positions - center
+        angular_momenta = masses * (offsets[:, 0] * velocities[:, 1] - offsets[:, 1] * velocities[:, 0])
+
+        return {
+            'kinetic': kinetic,
+            'potential': potential,
+            'energy': kinetic + potential,
+            'momentum': masses @ velocities if len(masses) else np.zeros(2),
+            'angular_momentum': float(angular_momenta.sum()),
+            'momentum_scale': float(masses @ np.linalg.norm(velocities, axis=1)),
+            'angular_momentum_scale': float(np.abs(angular_momenta).sum()),
+        }
+
+    def sample(self, step: int) -> bool:
+        """
+        Measures quantities, if interval has passed since the previous sample or set of bodies has changed.
+        Collisions end and start segments themselves (see SimulationManager.diagnostics), other changes of bodies
+        start new segment here (drift between the last sample and such change isn't counted)
+        :param step: Number of the current step
+        :return: True, if sample has been taken
+        """
+
+        is_changed = self.version != SimulationManager.bodies.version
+        if not is_changed and self.last_step is not None and step - self.last_step < self.interval:
+            return False
+        self.last_step = step
+
+        quantities = Diagnostics.measure()
+        if is_changed:
+            self.start_segment(quantities)
+        self.update_drift(quantities)
+
+        self.samples.append((step, quantities['kinetic'], quantities['potential'], quantities['energy'],
+                             *quantities['momentum'].tolist(), quantities['angular_momentum'],
+                             self.drift['energy'], self.drift['momentum'], self.drift['angular_momentum']))
+
+        if self.is_overlay_shown:
+            self.render_overlay()
+        return True
+
+    def start_segment(self, quantities: dict = None) -> None:
+        """
+        Starts new segment from the current state, keeping drift of finished segments
+        :param quantities: Quantities of the current state (measured if None)
+        :return: None
+        """
+
+        self.version = SimulationManager.bodies.version
+        self.baseline = Diagnostics.measure() if quantities is None else quantities
+        self.previous_drift = dict(self.drift)
+        self.segments_count += 1
+
+    def end_segment(self) -> None:
+        """Updates drift with the current state, that is the last state of segment (bodies are going to change)"""
+
+        # Segment, broken by other change of bodies, has been ended by the last sample
+        if self.baseline is not None and self.version == SimulationManager.bodies.version:
+            self.update_drift(Diagnostics.measure())
+
+    def update_drift(self, quantities: dict) -> None:
+        """
+        Sets total drift to drift of finished segments and drift of current segment up to quantities
+        :param quantities: Quantities of the current state
+        :return: None
+        """
+
+        baseline = self.baseline
+        energy_scale = abs(baseline['energy']) or baseline['kinetic'] or 1.0
+        segment_drift = {
+            'energy': (quantities['energy'] - baseline['energy']) / energy_scale,
+            'momentum': float(np.linalg.norm(quantities['momentum'] - baseline['momentum'])) /
+                        (baseline['momentum_scale'] or 1.0),
+            'angular_momentum': abs(quantities['angular_momentum'] - baseline['angular_momentum']) /
+                                (baseline['angular_momentum_scale'] or 1.0),
+        }
+
+        for quantity in Diagnostics.QUANTITIES:
+            self.drift[quantity] = self.previous_drift[quantity] + segment_drift[quantity]
+            self.max_drift[quantity] = max(self.max_drift[quantity], abs(self.drift[quantity]))
+
+    def is_within_tolerance(self) -> bool:
+        return self.max_drift['energy'] <= Config.DIAGNOSTICS_TOLERANCE
+
+    def get_report(self) -> str:
+        """Returns max relative drift of quantities over the run"""
+
+        status = 'within' if self.is_within_tolerance() else 'exceeds'
+        return (f'Drift (max relative): energy {self.max_drift["energy"]:.2e} '
+                f'({status} tolerance {Config.DIAGNOSTICS_TOLERANCE:.0e}), '
+                f'momentum {self.max_drift["momentum"]:.2e}, '
+                f'angular momentum {self.max_drift["angular_momentum"]:.2e}, '
+                f'samples: {len(self.samples)}, segments: {self.segments_count}')
+
+    def save_csv(self, path: str) -> None:
+        """
+        Writes all samples to CSV file
+        :param path: Path to CSV file (file is overwritten)
+        :return: None
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(Diagnostics.COLUMNS)
+            writer.writerows(self.samples)
+
+    def toggle_overlay(self) -> None:
+        self.is_overlay_shown = not self.is_overlay_shown
+        SimulationManager.diagnostics = self if self.is_overlay_shown else None
+        self.overlay = None
+        self.last_step = None  # The next frame takes sample
+
+    def render_overlay(self) -> None:
+        """Renders the last sample and drift"""
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, Config.PROFILER_FONT_SIZE)
+
+        _, kinetic, potential, energy, momentum_x, momentum_y, angular_momentum = self.samples[-1][:7]
+        lines = [
+            f'energy {energy:.4e} (kinetic {kinetic:.3e}, potential {potential:.3e})',
+            f'momentum ({momentum_x:.3e}, {momentum_y:.3e}), angular {angular_momentum:.3e}',
+        ]
+        lines += [f'{quantity.replace("_", " ")} drift {self.drift[quantity]:+.2e} (max {self.max_drift[quantity]:.2e})'
+                  for quantity in Diagnostics.QUANTITIES]
+
+        color = Config.WHITE if self.is_within_tolerance() else Config.BUTTON_RED
+        texts = [self.font.render(line, True, color) for line in lines]
+        line_height = self.font.get_linesize()
+
+        self.overlay = pygame.Surface((max(text.get_width() for text in texts) + 10, line_height * len(texts) + 10),
+                                      pygame.SRCALPHA)
+        self.overlay.fill(Config.PROFILER_BG_COLOR)
+        for index, text in enumerate(texts):
+            self.overlay.blit(text, (5, 5 + index * line_height))
+
+    def get_overlay_rect(self, surface: pygame.Surface):
+        """Returns rect of overlay in the bottom right corner of surface (None if overlay isn't drawn)"""
+
+        if not self.is_overlay_shown or self.overlay is None:
+            return None
+
+        return self.overlay.get_rect(bottomright=surface.get_size())
+
+    def draw_overlay(self, surface: pygame.Surface) -> None:
+        rect = self.get_overlay_rect(surface)
+        if rect is not None:
+            surface.blit(self.overlay, rect)
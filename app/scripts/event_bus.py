@@ -0,0 +1,203 @@
+"""
+Module containing buffered stream of events of simulation (births, deaths, devours, changes of mass
+and errors of approximate solvers).
+
+Events are written into preallocated ring buffer, so emitting event doesn't print, allocate or post PyGame events.
+Changes of stars are also coalesced into one change of mass per star, that is taken by Game once per frame.
+Events can be written to JSONL file by background thread, so simulation never waits for disk.
+"""
+
+# Modules
+import os
+import json
+import threading
+
+import numpy as np
+
+from app.scripts.config import Config
+
+
+class EventBus:
+    # Kinds of events
+    BIRTH = 0  # Body has been created (value is its mass)
+    DEATH = 1  # Planet has left the system
+    DEVOUR = 2  # Planet has been devoured by star (other is ID of star)
+    MERGE = 3  # Planet has merged with other planet (other is ID of planet, that remains)
+    MASS_CHANGE = 4  # Mass of body has changed (value is change of mass)
+    BARNES_HUT_ERROR = 5  # Relative error of Barnes-Hut on report step (position is mean and max error)
+    STAR_FIELD_ERROR = 6  # Relative error of star field on report step (position is mean and max error)
+    KINDS = ('birth', 'death', 'devour', 'merge', 'mass_change', 'barnes_hut_error', 'star_field_error')
+    ERRORS = (BARNES_HUT_ERROR, STAR_FIELD_ERROR)
+
+    EVENT = np.dtype([
+        ('step', '<i8'),
+        ('kind', 'u1'),
+        ('id', '<i8'),
+        ('other', '<i8'),  # ID of the second body (-1 if there is no such body)
+        ('position', '<f8', (2,)),  # Position of body (mean and max relative error for errors of solvers)
+        ('value', '<f8'),
+    ])
+
+    def __init__(self, capacity: int = Config.EVENT_BUFFER_SIZE):
+        """
+        :param capacity: Number of the newest events, that are kept in buffer
+        """
+
+        self.events = np.zeros(capacity, dtype=EventBus.EVENT)
+        self.events_count = 0  # Number of emitted events (event i is stored at i % capacity)
+        self.lock = threading.Lock()
+
+        self.star_changes = {}  # Coalesced changes of stars since the last frame {star: change of mass}
+
+    def emit(self, kind: int, body, other=None, value: float = 0.0, step: int = 0) -> None:
+        """
+        Adds event to buffer (the oldest event is overwritten, if buffer is full)
+        :param kind: Kind of event (EventBus.BIRTH, EventBus.DEATH, ...)
+        :param body: Celestial body
+        :param other: The second celestial body
+        :param value: Mass or change of mass
+        :param step: Step of simulation
+        :return: None
+        """
+
+        with self.lock:
+            self.events[self.events_count % len(self.events)] = (
+                step, kind, body.id, -1 if other is None else other.id, (body.x, body.y), value
+            )
+            self.events_count += 1
+
+    def emit_error(self, kind: int, error: dict, step: int = 0) -> None:
+        """
+        Adds relative error of approximate solver to buffer (error isn't related to any body)
+        :param kind: EventBus.BARNES_HUT_ERROR or EventBus.STAR_FIELD_ERROR
+        :param error: Dictionary with mean and max relative error
+        :param step: Step of simulation
+        :return: None
+        """
+
+        with self.lock:
+            self.events[self.events_count % len(self.events)] = (
+                step, kind, -1, -1, (error['mean'], error['max']), error['max']
+            )
+            self.events_count += 1
+
+    def emit_many(self, kind: int, ids: np.ndarray, positions: np.ndarray, values: np.ndarray,
+                  step: int = 0) -> None:
+        """
+        Adds events of the same kind of many bodies with one write (only the newest events are kept,
+        if they don't fit into buffer)
+        :param kind: Kind of events (EventBus.BIRTH, EventBus.DEATH, ...)
+        :param ids: Array (n,) of IDs of bodies
+        :param positions: Array (n, 2) of positions of bodies
+        :param values: Array (n,) of masses or changes of mass
+        :param step: Step of simulation
+        :return: None
+        """
+
+        events = np.zeros(len(ids), dtype=EventBus.EVENT)
+        events['step'] = step
+        events['kind'] = kind
+        events['id'] = ids
+        events['other'] = -1
+        events['position'] = positions
+        events['value'] = values
+
+        with self.lock:
+            indexes = np.arange(self.events_count, self.events_count + len(events))[-len(self.events):]
+            self.events[indexes % len(self.events)] = events[-len(self.events):]
+            self.events_count += len(events)
+
+    def change_star(self, star, mass_delta: float) -> None:
+        """
+        Adds change of star's mass to coalesced changes (new star adds its whole mass)
+        :param star: Star
+        :param mass_delta: Change of mass
+        :return: None
+        """
+
+        with self.lock:
+            self.star_changes[star] = self.star_changes.get(star, 0) + mass_delta
+
+    def pop_star_changes(self) -> dict:
+        """Returns changes of stars since the previous call and forgets them"""
+
+        with self.lock:
+            star_changes, self.star_changes = self.star_changes, {}
+        return star_changes
+
+    def read(self, cursor: int) -> tuple:
+        """
+        Returns events, emitted after cursor
+        :param cursor: Number of events, that have already been read
+        :return: Tuple of (copy of events, new cursor, number of lost events, that were overwritten)
+        """
+
+        with self.lock:
+            end = self.events_count
+            start = max(cursor, end - len(self.events))
+            indexes = np.arange(start, end) % len(self.events)
+            events = self.events[indexes]
+
+        return events, end, start - cursor
+
+    @staticmethod
+    def to_json(event) -> str:
+        step, kind, body_id, other, position, value = event.tolist()
+        if kind in EventBus.ERRORS:
+            return json.dumps({'step': step, 'event': EventBus.KINDS[kind], 'mean': position[0], 'max': position[1]})
+
+        return json.dumps({'step': step, 'event': EventBus.KINDS[kind], 'id': body_id,
+                           'other': None if other < 0 else other, 'x': position[0], 'y': position[1],
+                           'value': value})
+
+
+class EventSink(threading.Thread):
+    """Background thread, that appends events of bus to JSONL file"""
+
+    def __init__(self, bus: EventBus, path: str, interval: float = Config.EVENT_SINK_INTERVAL, cursor: int = None):
+        """
+        :param bus: Bus of events
+        :param path: Path to JSONL file (file is overwritten)
+        :param interval: Time between reading of buffer (seconds)
+        :param cursor: Number of events, that aren't written (events, emitted before start, if None)
+        """
+
+        super().__init__(name='event-sink', daemon=True)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.bus = bus
+        self.path = path
+        self.interval = interval
+        self.cursor = bus.events_count if cursor is None else cursor
+        self.written_count = 0
+        self.lost_count = 0  # Events, overwritten before they were written
+
+        self.file = open(path, 'w')
+        self.stop_event = threading.Event()
+
+    def write_events(self) -> None:
+        events, self.cursor, lost_count = self.bus.read(self.cursor)
+        if lost_count:
+            self.lost_count += lost_count
+            self.file.write(json.dumps({'event': 'lost', 'count': lost_count}) + '\n')
+
+        if len(events):
+            self.file.write(''.join(EventBus.to_json(event) + '\n' for event in events))
+            self.written_count += len(events)
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            self.write_events()
+
+    def stop(self) -> None:
+        """Writes the rest of events and closes file"""
+
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+        self.write_events()
+        self.file.close()
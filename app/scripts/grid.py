@@ -1,62 +1,159 @@
+import numpy as np
 import pygame
 from pygame.math import Vector2
 
 from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
 from app.scripts.physic import Physic
 from app.scripts.config import Config
 
 
 class Grid:
     def __init__(self, color: pygame.Color, distance: int):
-        self.surface = pygame.Surface(Config.WINDOW_SIZE, pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
+        # Rendered grids (normal grid never changes, curved one is re-rendered only when dots change)
+        self.normal_surface = pygame.Surface(Config.WINDOW_SIZE, pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
+        self.curved_surface = pygame.Surface(Config.WINDOW_SIZE, pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
+        self.is_curved_grid_changed = True
         self.color = color  # Grid color
         self.distance = distance  # Distance between dots of grid
+        self.stride = 1  # Only every stride-th line is drawn (density of grid)
+
+        # Grid covers view of camera
+        self.camera_version = None
+        self.spacing = distance  # Distance between dots in world
+        self.positions = None  # Positions of dots in world without offset, array (columns, rows, 2)
+        self.field = None  # Sum of accelerations, caused by stars
+        self.dots = None
+        self.set_positions()
+
+    def set_positions(self) -> None:
+        """
+        Places dots over view of camera. Distance between dots in world is doubled or halved with zoom,
+        so distance on screen stays close to Grid.distance
+        """
+
+        camera = SimulationManager.camera
+        self.camera_version = camera.version
+        self.spacing = self.distance * 2.0 ** round(np.log2(1 / camera.zoom))
+
+        left, top, right, bottom = camera.get_world_rect()
+        first_x = np.floor(left / self.spacing) * self.spacing
+        first_y = np.floor(top / self.spacing) * self.spacing
+        x_positions = first_x + np.arange(int((right - first_x) / self.spacing) + 2) * self.spacing
+        y_positions = first_y + np.arange(int((bottom - first_y) / self.spacing) + 2) * self.spacing
+        self.positions = np.stack(np.meshgrid(x_positions, y_positions, indexing='ij'), axis=-1).astype(float)
+
+        self.field = np.zeros_like(self.positions)
+        self.update_dots()
+        self.draw_normal_grid()
+
+    def update_view(self) -> bool:
+        """
+        Moves grid with camera (dots are recalculated only if view has changed)
+        :return: True if view has changed
+        """
+
+        if self.camera_version == SimulationManager.camera.version:
+            return False
+
+        self.set_positions()
+        self.calculate_grid_dots()
+        return True
 
     def calculate_grid_dots(self) -> None:
-        dots = []
-        for x in range(int(Config.WIDTH / self.distance) + 2):
-            row = []  # Cleaning up row array
-            for y in range(int(Config.HEIGHT / self.distance) + 2):
-                position = Vector2(x * self.distance, y * self.distance)  # Position of current dot
+        """Calculates offsets of all dots from all stars"""
+
+        # Stars are read, while physics worker isn't making step
+        with SimulationManager.lock:
+            store = SimulationManager.bodies
+            star_slots = store.get_indexes(BodyStore.STAR)
+            star_positions = store.positions[star_slots]
+            star_masses = store.masses[star_slots]
+
+        targets = self.positions.reshape(-1, 2)
+        self.field = Physic.calculate_accelerations(targets, star_positions, star_masses).reshape(self.positions.shape)
+        self.update_dots()
+
+    def add_star_mass(self, position: Vector2, mass: float) -> None:
+        """
+        Adds to offsets of dots contribution of a single star.
+        Field is linear in mass, so new star or change of mass of star is added without recalculation of other stars
+        :param position: Position of star
+        :param mass: Mass of new star or change of mass of star
+        :return: None
+        """
+
+        targets = self.positions.reshape(-1, 2)
+        field = Physic.calculate_accelerations(targets, np.array([tuple(position)], dtype=float),
+                                               np.array([mass], dtype=float))
+        self.field += field.reshape(self.positions.shape)
+        self.update_dots()
 
-                # Calculating offset, based on gravity forces
-                offset = Physic.calculate_acceleration(position, SimulationManager.stars) * Config.GRID_CURVATURE
-                scaled_offset = Physic.scale_vector(offset, max_length=Config.MAX_GRID_DOT_OFFSET)
+    def update_dots(self) -> None:
+        """Calculates positions of dots from field"""
 
-                row.append(position + scaled_offset)  # Append offset point to row array
-            dots.append(row)  # Append row to dots array
+        # Calculating offset, based on gravity forces (not longer than Config.MAX_GRID_DOT_OFFSET),
+        # offsets are scaled with distance between dots
+        scale = self.spacing / self.distance
+        offsets = self.field * Config.GRID_CURVATURE * scale
+        lengths = np.linalg.norm(offsets, axis=-1, keepdims=True)
+        scales = np.minimum(1, Config.MAX_GRID_DOT_OFFSET * scale / np.where(lengths == 0, 1, lengths))
 
-        self.dots = dots
+        self.dots = self.positions + offsets * scales
+        self.is_curved_grid_changed = True
 
     def draw_normal_grid(self) -> None:
-        # Drawing vertical lines
-        for x in range(int(Config.WIDTH / self.distance) + 2):
-            pygame.draw.line(
-                self.surface,
-                self.color,
-                (x * self.distance, 0),
-                (x * self.distance, Config.HEIGHT),
-                Config.GRID_THICKNESS
-            )
-
-        # drawing horizontal lines
-        for y in range(int(Config.HEIGHT / self.distance) + 2):
-            pygame.draw.line(
-                self.surface,
-                self.color,
-                (0, y * self.distance),
-                (Config.WIDTH, y * self.distance),
-                Config.GRID_THICKNESS
-            )
+        """Renders normal grid on normal_surface"""
+
+        self.normal_surface.fill(Config.TRANSPARENT)
+        self.draw_lines(self.normal_surface, SimulationManager.camera.to_screen_array(self.positions))
 
     def draw_curved_grid(self) -> None:
-        # Connecting dots from left to right
-        for row in self.dots:
-            for index in range(len(row) - 1):
-                pygame.draw.line(self.surface, self.color, row[index], row[index + 1], Config.GRID_THICKNESS)
+        """Renders curved grid on curved_surface"""
+
+        self.curved_surface.fill(Config.TRANSPARENT)
+        self.draw_lines(self.curved_surface, SimulationManager.camera.to_screen_array(self.dots))
+        self.is_curved_grid_changed = False
+
+    def draw_lines(self, surface: pygame.Surface, dots: np.ndarray) -> None:
+        """
+        Connects dots of grid, drawing each line as a single polyline
+        :param surface: Surface, on which grid is drawn
+        :param dots: Array (columns, rows, 2) of dots on screen
+        :return: None
+        """
 
         # Connecting dots from top to bottom
-        columns = [[row[i] for row in self.dots] for i in range(len(self.dots[0]))]
-        for column in columns:
-            for index in range(len(column) - 1):
-                pygame.draw.line(self.surface, self.color, column[index], column[index + 1], Config.GRID_THICKNESS)
+        for column in dots[::self.stride].tolist():
+            pygame.draw.lines(surface, self.color, False, column, Config.GRID_THICKNESS)
+
+        # Connecting dots from left to right
+        for row in dots[:, ::self.stride].transpose(1, 0, 2).tolist():
+            pygame.draw.lines(surface, self.color, False, row, Config.GRID_THICKNESS)
+
+    def set_stride(self, stride: int) -> None:
+        """
+        Changes density of grid (dots are kept, so lines stay smooth)
+        :param stride: Only every stride-th line is drawn
+        :return: None
+        """
+
+        if stride != self.stride:
+            self.stride = stride
+            self.draw_normal_grid()
+            self.is_curved_grid_changed = True
+
+    def get_surface(self, is_curved: bool) -> pygame.Surface:
+        """
+        Returns rendered grid, re-rendering curved grid only if dots have changed
+        :param is_curved: Is grid curved
+        :return: pygame.Surface
+        """
+
+        if not is_curved:
+            return self.normal_surface
+
+        if self.is_curved_grid_changed:
+            self.draw_curved_grid()
+
+        return self.curved_surface
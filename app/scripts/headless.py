@@ -0,0 +1,164 @@
+"""
+Headless simulation runner: steps physics without window, GUI and rendering.
+
+Usage (from the root of project):
+    python -m app.scripts.headless --scenario ring --bodies 500 --steps 1000
+    python -m app.scripts.headless --scene scene.json --steps 1000 --dt 0.5
+    python -m app.scripts.headless --snapshot saved.snapshot --steps 1000 --save-snapshot result.snapshot
+    python -m app.scripts.headless --scenario cloud --steps 5000 --record run.rec
+    python -m app.scripts.headless --scenario cloud --steps 5000 --events events.jsonl
+    python -m app.scripts.headless --scenario cluster --bodies 2000 --steps 1000 --star-field
+    python -m app.scripts.headless --scenario ring --steps 5000 --dt 2 --diagnostics drift.csv
+"""
+
+# Modules
+import argparse
+import time
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.scenarios import Scenarios
+from app.scripts.integrators import Integrators
+from app.scripts.snapshot import Snapshot
+from app.scripts.recorder import TrajectoryRecorder
+from app.scripts.event_bus import EventSink
+from app.scripts.diagnostics import Diagnostics
+from app.scripts.config import Config
+
+
+class HeadlessRunner:
+    def __init__(self, dt: float = Config.PHYSICS_DT, recorder: TrajectoryRecorder = None,
+                 diagnostics: Diagnostics = None):
+        """
+        :param dt: Fixed time step (1 is a step of 1 / STABLE_FPS seconds at normal speed)
+        :param recorder: Recorder of state of bodies after every step
+        :param diagnostics: Diagnostics, that sample conserved quantities (time of sampling isn't measured)
+        """
+
+        self.dt = dt
+        self.recorder = recorder
+        self.diagnostics = diagnostics
+        SimulationManager.diagnostics = diagnostics  # Segments of drift are ended and started by collisions
+        self.steps = 0
+        self.body_steps = 0  # Sum of numbers of planets over all steps
+        self.elapsed_time = 0.0
+
+    def run(self, steps: int) -> None:
+        """
+        Makes given number of steps
+        :param steps: Number of steps
+        :return: None
+        """
+
+        if self.diagnostics is not None:
+            self.diagnostics.sample(self.steps)
+
+        start_time = time.perf_counter()
+
+        for _ in range(steps):
+            self.body_steps += SimulationManager.bodies.get_count(BodyStore.PLANET)
+            SimulationManager.step(self.dt)
+            self.steps += 1
+
+            if self.recorder is not None:
+                self.recorder.record()
+
+            if self.diagnostics is not None:
+                sample_time = time.perf_counter()
+                self.diagnostics.sample(self.steps)
+                start_time += time.perf_counter() - sample_time
+
+        self.elapsed_time += time.perf_counter() - start_time
+
+    def get_report(self) -> str:
+        """Returns throughput of simulation"""
+
+        elapsed_time = max(self.elapsed_time, 1e-9)
+        return (f'Steps: {self.steps}, time: {self.elapsed_time:.3f} s, '
+                f'{self.steps / elapsed_time:.1f} steps/s, {self.body_steps / elapsed_time:.1f} body-steps/s, '
+                f'force evaluations: {SimulationManager.force_evaluations / max(self.body_steps, 1):.2f} '
+                f'per body-step, '
+                f'planets left: {SimulationManager.bodies.get_count(BodyStore.PLANET)}, '
+                f'stars: {SimulationManager.bodies.get_count(BodyStore.STAR)}')
+
+
+def parse_arguments(arguments=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Runs simulation without window')
+    parser.add_argument('--scene', help='Path to JSON file with bodies')
+    parser.add_argument('--snapshot', help='Path to snapshot of simulation (restores its bodies and constants)')
+    parser.add_argument('--save-snapshot', help='Path, where snapshot is saved after the last step')
+    parser.add_argument('--record', help='Path, where trajectories of all steps are recorded (for replay)')
+    parser.add_argument('--diagnostics', nargs='?', const='',
+                        help='Report drift of energy and momenta (samples are written to CSV, if path is given)')
+    parser.add_argument('--events', help='Path, where events of simulation (births, deaths, ...) are written as JSONL')
+    parser.add_argument('--scenario', choices=sorted(Scenarios.GENERATORS), default='ring',
+                        help='Generated scene (if --scene is not set)')
+    parser.add_argument('--bodies', type=int, default=500, help='Number of generated planets')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of generated scene')
+    parser.add_argument('--steps', type=int, default=1000, help='Number of steps')
+    parser.add_argument('--dt', type=float, help=f'Time step (default: {Config.PHYSICS_DT})')
+    parser.add_argument('--integrator', choices=sorted(Integrators.INTEGRATORS),
+                        help=f'Integrator of motion (default: {Config.INTEGRATOR})')
+    parser.add_argument('--solver', choices=['direct', 'barnes_hut', 'parallel'],
+                        help=f'Gravity solver (default: {Config.GRAVITY_SOLVER})')
+    parser.add_argument('--block-timesteps', action='store_true', default=None,
+                        help=f'Use per-planet block time steps (default: {Config.BLOCK_TIMESTEPS})')
+    parser.add_argument('--star-field', action='store_true', default=None,
+                        help=f'Interpolate precomputed field of stars instead of summing their forces '
+                             f'(default: {Config.STAR_FIELD})')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None) -> None:
+    arguments = parse_arguments(arguments)
+
+    # Constants of snapshot are applied first, so explicit arguments override them
+    if arguments.snapshot:
+        Snapshot.restore(arguments.snapshot)
+    elif arguments.scene:
+        Scenarios.load(arguments.scene)
+    else:
+        Scenarios.GENERATORS[arguments.scenario](arguments.bodies, seed=arguments.seed)
+
+    Config.INTEGRATOR = arguments.integrator or Config.INTEGRATOR
+    Config.GRAVITY_SOLVER = arguments.solver or Config.GRAVITY_SOLVER
+    if arguments.block_timesteps is not None:
+        Config.BLOCK_TIMESTEPS = arguments.block_timesteps
+    if arguments.star_field is not None:
+        Config.STAR_FIELD = arguments.star_field
+
+    recorder = TrajectoryRecorder(arguments.record) if arguments.record else None
+    # Births of initial bodies are written too
+    event_sink = EventSink(SimulationManager.events, arguments.events, cursor=0) if arguments.events else None
+    if event_sink is not None:
+        event_sink.start()
+
+    diagnostics = Diagnostics(interval=Config.DIAGNOSTICS_INTERVAL) if arguments.diagnostics is not None else None
+    runner = HeadlessRunner(dt=arguments.dt or Config.PHYSICS_DT, recorder=recorder, diagnostics=diagnostics)
+    runner.run(arguments.steps)
+    print(runner.get_report())
+
+    if diagnostics is not None:
+        print(diagnostics.get_report())
+        if arguments.diagnostics:
+            diagnostics.save_csv(arguments.diagnostics)
+
+    if Config.STAR_FIELD:
+        star_field = SimulationManager.star_field
+        planet_slots = SimulationManager.bodies.get_indexes(BodyStore.PLANET)
+        error = star_field.calculate_error(SimulationManager.bodies.positions[planet_slots])
+        print(f'Star field: builds {star_field.builds_count}, updates of masses {star_field.updates_count}, '
+              f'relative error: mean {error["mean"]:.2e}, max {error["max"]:.2e}')
+
+    if recorder is not None:
+        recorder.close()
+    if event_sink is not None:
+        event_sink.stop()
+        print(f'Events: {event_sink.written_count}, lost: {event_sink.lost_count}')
+
+    if arguments.save_snapshot:
+        Snapshot.save(arguments.save_snapshot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Module containing numerical integrators of motion of planets.
+
+Every integrator takes arrays of positions and velocities, function returning
+accelerations in given positions and time step. It returns new positions, velocities
+and accelerations in new positions (or None, if they are unknown), which can be passed
+to the next step as already calculated accelerations.
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.config import Config
+
+
+class Integrators:
+    @staticmethod
+    def euler(positions: np.ndarray, velocities: np.ndarray, get_accelerations, dt: float,
+              accelerations: np.ndarray = None) -> tuple:
+        """Semi-implicit Euler method (first order, one evaluation of forces)"""
+
+        if accelerations is None:
+            accelerations = get_accelerations(positions)
+
+        velocities = velocities + accelerations * dt
+        positions = positions + velocities * dt
+
+        return positions, velocities, None
+
+    @staticmethod
+    def leapfrog(positions: np.ndarray, velocities: np.ndarray, get_accelerations, dt: float,
+                 accelerations: np.ndarray = None) -> tuple:
+        """Leapfrog (velocity Verlet) method (second order, symplectic, one evaluation of forces)"""
+
+        if accelerations is None:
+            accelerations = get_accelerations(positions)
+
+        half_velocities = velocities + 0.5 * dt * accelerations  # Kick
+        positions = positions + dt * half_velocities  # Drift
+        new_accelerations = get_accelerations(positions)
+        velocities = half_velocities + 0.5 * dt * new_accelerations  # Kick
+
+        return positions, velocities, new_accelerations
+
+    @staticmethod
+    def rk4(positions: np.ndarray, velocities: np.ndarray, get_accelerations, dt: float,
+            accelerations: np.ndarray = None) -> tuple:
+        """Classic Runge-Kutta method (fourth order, four evaluations of forces)"""
+
+        if accelerations is None:
+            accelerations = get_accelerations(positions)
+
+        k1_positions, k1_velocities = velocities, accelerations
+        k2_positions = velocities + 0.5 * dt * k1_velocities
+        k2_velocities = get_accelerations(positions + 0.5 * dt * k1_positions)
+        k3_positions = velocities + 0.5 * dt * k2_velocities
+        k3_velocities = get_accelerations(positions + 0.5 * dt * k2_positions)
+        k4_positions = velocities + dt * k3_velocities
+        k4_velocities = get_accelerations(positions + dt * k3_positions)
+
+        positions = positions + dt / 6 * (k1_positions + 2 * k2_positions + 2 * k3_positions + k4_positions)
+        velocities = velocities + dt / 6 * (k1_velocities + 2 * k2_velocities + 2 * k3_velocities + k4_velocities)
+
+        return positions, velocities, None
+
+    # Integrators, that can be chosen in Config.INTEGRATOR
+    INTEGRATORS = {
+        'euler': euler.__func__,
+        'leapfrog': leapfrog.__func__,
+        'rk4': rk4.__func__,
+    }
+
+
+class BlockTimesteps:
+    """
+    Hierarchical (block) time steps for leapfrog.
+    Every planet gets its own step dt / 2 ** level, based on its acceleration and velocity.
+    Forces are evaluated only for planets, whose step ends at the current moment,
+    and all planets drift together between these moments.
+    """
+
+    @staticmethod
+    def get_levels(accelerations: np.ndarray, velocities: np.ndarray, dt: float, max_level: int) -> np.ndarray:
+        """
+        Returns levels of steps of planets
+        :param accelerations: Array (n, 2) of accelerations
+        :param velocities: Array (n, 2) of velocities
+        :param dt: The biggest step
+        :param max_level: Max level (the smallest step is dt / 2 ** max_level)
+        :return: Array (n,) of levels
+        """
+
+        # Time, in which velocity changes by itself (r / v on circular orbit, smallest at periapsis)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps = Config.BLOCK_TIMESTEP_ACCURACY * (np.linalg.norm(velocities, axis=1) /
+                                                      np.linalg.norm(accelerations, axis=1))
+            levels = np.ceil(np.log2(dt / steps))
+
+        return np.clip(np.nan_to_num(levels, nan=0, neginf=0), 0, max_level).astype(np.int64)
+
+    @staticmethod
+    def integrate(positions: np.ndarray, velocities: np.ndarray, get_accelerations, dt: float,
+                  accelerations: np.ndarray = None, max_level: int = None) -> tuple:
+        """
+        Makes one step dt with block time steps
+        :param positions: Array (n, 2) of positions
+        :param velocities: Array (n, 2) of velocities
+        :param get_accelerations: Function (positions, indexes), returning accelerations of planets with indexes
+        :param dt: The biggest step
+        :param accelerations: Already calculated accelerations in positions (or None)
+        :param max_level: Max level (Config.BLOCK_MAX_LEVEL if None)
+        :return: Tuple of positions, velocities, accelerations and number of evaluations of forces
+        """
+
+        max_level = Config.BLOCK_MAX_LEVEL if max_level is None else max_level
+        ticks = 2 ** max_level  # Step is divided into ticks of the smallest step
+        tick = dt / ticks
+
+        positions = positions.copy()
+        velocities = velocities.copy()
+        evaluations = 0
+
+        if accelerations is None:
+            accelerations = get_accelerations(positions, np.arange(len(positions)))
+            evaluations += len(positions)
+        accelerations = accelerations.copy()
+
+        # Length of step and moment of end of current step of each planet (in ticks)
+        periods = ticks >> BlockTimesteps.get_levels(accelerations, velocities, dt, max_level)
+        ends = periods.copy()
+        velocities += 0.5 * (periods * tick)[:, np.newaxis] * accelerations  # Opening kick
+
+        current_tick = 0
+        while current_tick < ticks:
+            # Drifting all planets to the nearest end of step
+            next_tick = ends.min()
+            positions += velocities * (next_tick - current_tick) * tick
+            current_tick = next_tick
+
+            # Forces are evaluated only for planets, whose step has ended
+            active = np.flatnonzero(ends == current_tick)
+            accelerations[active] = get_accelerations(positions, active)
+            evaluations += len(active)
+            # Closing kick
+            velocities[active] += 0.5 * (periods[active] * tick)[:, np.newaxis] * accelerations[active]
+
+            if current_tick < ticks:
+                # New steps have to be aligned with current moment
+                new_periods = ticks >> BlockTimesteps.get_levels(accelerations[active], velocities[active],
+                                                                 dt, max_level)
+                misaligned = current_tick % new_periods != 0
+                while misaligned.any():
+                    new_periods[misaligned] //= 2
+                    misaligned = current_tick % new_periods != 0
+
+                periods[active] = new_periods
+                ends[active] = current_tick + new_periods
+                # Opening kick
+                velocities[active] += 0.5 * (new_periods * tick)[:, np.newaxis] * accelerations[active]
+
+        return positions, velocities, accelerations, evaluations
@@ -3,6 +3,8 @@ Main project file, that containing game loop
 """
 
 # Modules
+import os
+import time
 from copy import copy
 
 import pygame
@@ -16,7 +18,14 @@ from app.scripts.simulation import SimulationManager, Planet, Star  # Classes
 from app.scripts.grid import Grid  # Background grid
 from app.scripts.gui import GUI  # GUI
 from app.scripts.config import Config  # Config
-from app.scripts.events import CustomEvents  # Custom events
+from app.scripts.snapshot import Snapshot  # Saving and restoring of simulation
+from app.scripts.recorder import TrajectoryRecorder, TrajectoryPlayer  # Recording and replay of trajectories
+from app.scripts.profiler import FrameProfiler  # Timings of stages of frame
+from app.scripts.quality import QualityController  # Adaptive quality of rendering
+from app.scripts.physics_worker import PhysicsWorker, PhysicsState  # Background physics and drawn states
+from app.scripts.event_bus import EventSink  # Export of events of simulation
+from app.scripts.diagnostics import Diagnostics  # Drift of energy and momenta
+from app.scripts.orbit_preview import OrbitPreview  # Predicted trajectory of new planet
 
 
 class Game:
@@ -33,6 +42,42 @@ class Game:
         self.grid.calculate_grid_dots()  # Calculating dots
 
         self.animation_speed = 1  # Animation speed
+        self.physics_time = 0  # Simulation time, that hasn't been simulated yet
+        self.state = None  # State of bodies, drawn in the last frame (PhysicsState)
+        self.is_panning = False  # Camera is moved by middle mouse button
+        self.snapshot_path = os.path.join('..', 'data', 'snapshots', 'quicksave.snapshot')  # Path to quick save
+
+        # Recording of trajectories and replay (physics isn't calculated during replay)
+        self.recording_path = os.path.join('..', 'data', 'recordings', 'trajectory.rec')
+        self.recorder = None
+        self.player = None
+
+        # Profiling (overlay and export of timings to CSV)
+        self.profiler = FrameProfiler(history=Config.PROFILER_HISTORY)
+        self.profile_path = os.path.join('..', 'data', 'profiles', 'frames.csv')
+
+        # Conservation diagnostics (overlay), sampled only while overlay is shown
+        self.diagnostics = Diagnostics(interval=Config.DIAGNOSTICS_INTERVAL)
+
+        # Export of events of simulation to JSONL
+        self.events_path = os.path.join('..', 'data', 'events', 'events.jsonl')
+        self.event_sink = None
+
+        # Physics, advanced by background thread (if None, steps are made by Game.update_simulation)
+        self.physics_worker = PhysicsWorker() if Config.PHYSICS_WORKER else None
+        if self.physics_worker is not None:
+            self.physics_worker.start()
+
+        # Adaptive quality
+        self.quality = QualityController(fps=Config.FPS)
+        self.frames_count = 0
+
+        # Dirty rects rendering (only regions, changed in this or in the previous frame, are redrawn)
+        self.is_full_redraw_needed = True
+        self.previous_rects = []  # Changed regions of screen in the previous frame
+        self.previous_layer_rects = []  # Changed regions of glow and trace surfaces in the previous frame
+        self.is_preview_shown = False
+        self.orbit_preview = OrbitPreview(max_steps=Config.ORBIT_PREVIEW_STEPS, dt=Config.PHYSICS_DT)
 
         self.init_gui()  # Initiating GUI
 
@@ -111,11 +156,16 @@ class Game:
         }
 
     def restart(self) -> None:
+        # Stopping replay and removing bodies
+        with SimulationManager.lock:
+            if self.player is not None:
+                self.player.close()
+                self.player = None
+            SimulationManager.clear()
 
-        # Cleaning groups of sprites
-        SimulationManager.stars.empty()
-        SimulationManager.planets.empty()
-        SimulationManager.celestial_bodies.empty()
+        SimulationManager.render_cache.clear()
+        SimulationManager.camera.reset()
+        self.state = None
 
         # Initiating beginning colors
         self.current_planet_color = copy(Config.PLANET_COLOR)
@@ -145,16 +195,125 @@ class Game:
 
         self.play_button.disable()
         self.animation_speed = 1
+        self.physics_time = 0
+        self.is_full_redraw_needed = True
+        if self.physics_worker is not None:
+            self.physics_worker.reset()
 
         # Resetting background grid dots
         self.grid.calculate_grid_dots()
 
+    def publish_changes(self) -> None:
+        """
+        Publishes bodies, changed by user, so they are drawn before the next step of physics worker
+        (must be called, while SimulationManager.lock is held)
+        """
+
+        if self.physics_worker is not None:
+            self.physics_worker.publish(is_step=False)
+
+    def save_snapshot(self) -> None:
+        with SimulationManager.lock:
+            Snapshot.save(self.snapshot_path)
+        print(f'Simulation has been saved to {self.snapshot_path}')
+
+    def load_snapshot(self) -> None:
+        if not os.path.exists(self.snapshot_path):
+            print(f'Snapshot {self.snapshot_path} does not exist')
+            return
+
+        # Stars of snapshot add their masses to reset grid through coalesced changes of stars
+        self.restart()
+        with SimulationManager.lock:
+            Snapshot.restore(self.snapshot_path)
+            self.publish_changes()
+
+            # Constants of snapshot can change spacing of grid (stars are added by coalesced changes)
+            self.grid.distance = Config.GRID_DISTANCE
+            self.grid.set_positions()
+        self.info_gui_elements['G_label'].set_text(f'G = {Config.G}')
+        self.info_gui_elements['K_label'].set_text(f'Distance = {100 * Config.K}%')
+        print(f'Simulation has been loaded from {self.snapshot_path}')
+
+    def toggle_recording(self) -> None:
+        # Physics worker records under the lock, so it never writes to closed recorder
+        with SimulationManager.lock:
+            if self.recorder is None:
+                self.recorder = TrajectoryRecorder(self.recording_path)
+                if self.physics_worker is not None:
+                    self.physics_worker.recorder = self.recorder
+                print(f'Recording to {self.recording_path} has been started')
+            else:
+                if self.physics_worker is not None:
+                    self.physics_worker.recorder = None
+                self.recorder.close()
+                print(f'Recording has been stopped, frames: {self.recorder.frames_count}')
+                self.recorder = None
+
+    def toggle_profile_export(self) -> None:
+        if self.profiler.csv_writer is None:
+            self.profiler.start_csv(self.profile_path)
+            print(f'Export of timings to {self.profile_path} has been started')
+        else:
+            self.profiler.stop_csv()
+            print('Export of timings has been stopped')
+
+    def toggle_event_export(self) -> None:
+        if self.event_sink is None:
+            self.event_sink = EventSink(SimulationManager.events, self.events_path)
+            self.event_sink.start()
+            print(f'Export of events to {self.events_path} has been started')
+        else:
+            self.event_sink.stop()
+            print(f'Export of events has been stopped, events: {self.event_sink.written_count}, '
+                  f'lost: {self.event_sink.lost_count}')
+            self.event_sink = None
+
+    def toggle_replay(self) -> None:
+        if self.player is not None:
+            self.restart()
+            print('Replay has been stopped')
+            return
+
+        if self.recorder is not None:
+            self.toggle_recording()
+        if not os.path.exists(self.recording_path):
+            print(f'Recording {self.recording_path} does not exist')
+            return
+
+        self.restart()
+        self.player = TrajectoryPlayer(self.recording_path)
+        if len(self.player) == 0:
+            print(f'Recording {self.recording_path} is empty')
+            self.player = None
+            return
+
+        self.seek_replay(0)
+        print(f'Replay of {self.recording_path} has been started, frames: {len(self.player)}')
+
+    def seek_replay(self, frame: int, is_continuous: bool = False) -> None:
+        with SimulationManager.lock:
+            is_stars_changed = self.player.seek(frame, is_continuous)
+            self.publish_changes()
+
+        if is_stars_changed:
+            # Grid is recalculated from shown stars instead of changes of stars
+            with SimulationManager.lock:
+                SimulationManager.events.pop_star_changes()
+                self.grid.calculate_grid_dots()
+
     def clear_surfaces(self) -> None:
-        # Filling surfaces
-        SimulationManager.glow_surface.fill(Config.TRANSPARENT)
-        SimulationManager.trace_surface.fill(Config.TRANSPARENT)
-        self.grid.surface.fill(Config.TRANSPARENT)
-        self.screen.fill(Config.DARK_BLUE)
+        # Filling surfaces (in dirty rects mode only regions, drawn in the previous frame, are filled)
+        if Config.DIRTY_RECTS and not self.is_full_redraw_needed \
+                and len(self.previous_layer_rects) <= Config.DIRTY_RECTS_MAX_COUNT:
+            for rect in self.previous_layer_rects:
+                SimulationManager.glow_surface.fill(Config.TRANSPARENT, rect)
+                SimulationManager.trace_surface.fill(Config.TRANSPARENT, rect)
+        else:
+            SimulationManager.glow_surface.fill(Config.TRANSPARENT)
+            SimulationManager.trace_surface.fill(Config.TRANSPARENT)
+
+        # Screen is filled when frame is composed (see Game.compose_frame)
 
     def handle_events(self) -> None:
         # Checking if any of windows are open
@@ -167,6 +326,10 @@ class Game:
                 self.is_running = False
                 print('Simulation has ended')
 
+            # Contents of window were lost
+            if event.type == pygame.VIDEOEXPOSE:
+                self.is_full_redraw_needed = True
+
             # User events
             if event.type == pygame.USEREVENT:
                 if event.user_type == UI_BUTTON_PRESSED:
@@ -196,6 +359,7 @@ class Game:
                             self.gui.set_button_color(event.ui_element, Config.BUTTON_GREEN)
 
                         self.radio_buttons[event.ui_element] = not self.radio_buttons[event.ui_element]
+                        self.is_full_redraw_needed = True
 
                     # If pressed button in dict of multimedia buttons
                     if event.ui_element in self.multimedia_buttons:
@@ -234,6 +398,48 @@ class Game:
                         self.star_color_button.enable()
                         self.star_color_picker = None
 
+            # Quick save (F5) and quick load (F9)
+            elif event.type == pygame.KEYDOWN and not self.is_dialogue_open:
+                if event.key == pygame.K_F5:
+                    self.save_snapshot()
+                elif event.key == pygame.K_F9:
+                    self.load_snapshot()
+
+                # Conservation diagnostics overlay (F2)
+                elif event.key == pygame.K_F2:
+                    self.diagnostics.toggle_overlay()
+
+                # Profiling overlay (F3) and export of timings to CSV (F4)
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
+                elif event.key == pygame.K_F4:
+                    self.toggle_profile_export()
+
+                # Recording (F6), replay (F7) and seeking of replay (arrows)
+                elif event.key == pygame.K_F6 and self.player is None:
+                    self.toggle_recording()
+                elif event.key == pygame.K_F8:
+                    self.toggle_event_export()
+                elif event.key == pygame.K_F7:
+                    self.toggle_replay()
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and self.player is not None:
+                    direction = 1 if event.key == pygame.K_RIGHT else -1
+                    self.seek_replay(self.player.frame + direction * Config.REPLAY_SEEK_FRAMES)
+
+                # Resetting of camera (Home)
+                elif event.key == pygame.K_HOME:
+                    SimulationManager.camera.reset()
+
+            # Zooming of camera around mouse (mouse wheel)
+            elif event.type == pygame.MOUSEWHEEL and not self.is_dialogue_open:
+                mouse_position = pygame.mouse.get_pos()
+                if not self.mouse_collision_with_gui(mouse_position, self.gui.gui_rects):
+                    SimulationManager.camera.zoom_at(mouse_position, Config.CAMERA_ZOOM_STEP ** event.y)
+
+            # Moving of camera (dragging with middle mouse button)
+            elif event.type == pygame.MOUSEMOTION and self.is_panning:
+                SimulationManager.camera.pan(*event.rel)
+
             # Mouse button down event
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Mouse position
@@ -245,27 +451,38 @@ class Game:
                     mouse_position=pressed_mouse_position,
                     gui_rects=self.gui.gui_rects) or self.is_dialogue_open
 
-                if event.button == 3 and not self.is_mouse_on_gui:
-                    # Creating a star
-                    Star(
-                        x=self.mouse_x,
-                        y=self.mouse_y,
-                        mass=self.settings_gui_elements['star_mass_slider'].get_current_value(),
-                        color=copy(self.current_star_color)
-                    )
+                self.is_panning = event.button == 2 and not self.is_mouse_on_gui
+
+                if event.button == 3 and not self.is_mouse_on_gui and self.player is None:
+                    # Creating a star (at position of mouse in world)
+                    x, y = SimulationManager.camera.to_world((self.mouse_x, self.mouse_y))
+                    with SimulationManager.lock:
+                        Star(
+                            x=x,
+                            y=y,
+                            mass=self.settings_gui_elements['star_mass_slider'].get_current_value(),
+                            color=copy(self.current_star_color)
+                        )
+                        self.publish_changes()
 
             # Mouse button up event
-            elif event.type == pygame.MOUSEBUTTONUP and not self.is_mouse_on_gui:
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 2:
+                self.is_panning = False
+
+            elif event.type == pygame.MOUSEBUTTONUP and not self.is_mouse_on_gui and self.player is None:
                 if event.button == 1:
                     try:
-                        # Creating a planet
-                        Planet(
-                            x=self.mouse_x,
-                            y=self.mouse_y,
-                            velocity=self.velocity_vector,
-                            mass=self.settings_gui_elements['planet_mass_slider'].get_current_value(),
-                            color=copy(self.current_planet_color)
-                        )
+                        # Creating a planet (at position of mouse in world)
+                        x, y = SimulationManager.camera.to_world((self.mouse_x, self.mouse_y))
+                        with SimulationManager.lock:
+                            Planet(
+                                x=x,
+                                y=y,
+                                velocity=self.velocity_vector,
+                                mass=self.settings_gui_elements['planet_mass_slider'].get_current_value(),
+                                color=copy(self.current_planet_color)
+                            )
+                            self.publish_changes()
 
                         # Setting labels
                         self.info_gui_elements['velocity_x_label'].set_text('X velocity: None')
@@ -274,14 +491,28 @@ class Game:
                     except Exception as error:
                         print(f'Velocity vector is not defined. Error: {error}')
 
-            elif event.type == CustomEvents.ADDED_NEW_STAR or event.type == CustomEvents.CHANGED_STAR_MASS:
-                self.grid.calculate_grid_dots()  # Calculating dots
-
             self.gui.manager.process_events(event)
 
-        # Drawing preview line of velocity of new planet
+        # Adding contribution of new stars and of changes of stars' masses to dots, coalesced into one change
+        # per star since the previous frame (if star wasn't removed by restart).
+        # If camera has moved, dots are placed over new view and calculated from all stars, which already include
+        # changes. Changes are taken under the same lock as stars, so every change is added exactly once
+        with SimulationManager.lock:
+            if self.grid.update_view():
+                self.is_full_redraw_needed = True
+                SimulationManager.events.pop_star_changes()
+                star_changes = []
+            else:
+                star_changes = [(star.position_vector, mass_delta)
+                                for star, mass_delta in SimulationManager.events.pop_star_changes().items()
+                                if star.alive()]
+        for position, mass_delta in star_changes:
+            self.grid.add_star_mass(position, mass_delta)
+
+        # Calculating velocity of new planet (preview is drawn by Game.draw_preview)
         pressed = pygame.mouse.get_pressed()  # Pressed buttons
-        if pressed[0] and not self.is_mouse_on_gui:
+        self.is_preview_shown = pressed[0] and not self.is_mouse_on_gui and self.player is None
+        if self.is_preview_shown:
             # Mouse position (x, y)
             current_mouse_position = pygame.mouse.get_pos()
             current_mouse_x, current_mouse_y = current_mouse_position
@@ -289,64 +520,264 @@ class Game:
             # Calculating velocity vector
             current_pos_vector = Vector2(current_mouse_x, current_mouse_y)
             pressed_pos_vector = Vector2(self.mouse_x, self.mouse_y)
-            self.velocity_vector = -(current_pos_vector - pressed_pos_vector) * Config.PV_VELOCITY_COEF
+            self.velocity_vector = -(current_pos_vector - pressed_pos_vector) * Config.PV_VELOCITY_COEF \
+                / SimulationManager.camera.zoom
 
             # Setting labels
             self.info_gui_elements['velocity_x_label'].set_text(f'X velocity: {round(self.velocity_vector.x, 4)}')
             self.info_gui_elements['velocity_y_label'].set_text(f'Y velocity: {-round(self.velocity_vector.y, 4)}')
 
-            # Drawing preview
-            preview_radius = Planet.get_radius(self.settings_gui_elements['planet_mass_slider'].get_current_value())
-            pygame.draw.circle(self.screen, Config.WHITE, (self.mouse_x, self.mouse_y), preview_radius)
+            # Trajectory is predicted again only if launch has changed, otherwise it is extended
+            if Config.ORBIT_PREVIEW and self.state is not None:
+                mass = self.settings_gui_elements['planet_mass_slider'].get_current_value()
+                self.orbit_preview.set_launch(self.state,
+                                              SimulationManager.camera.to_world((self.mouse_x, self.mouse_y)),
+                                              tuple(self.velocity_vector), Planet.get_radius(mass))
+                self.orbit_preview.extend(Config.ORBIT_PREVIEW_FRAME_TIME)
+        else:
+            self.orbit_preview.reset()
+
+    def draw_preview(self) -> list:
+        """Draws preview of new planet and returns list of changed rects"""
+
+        if not self.is_preview_shown:
+            return []
+
+        zoom = SimulationManager.camera.zoom
+        preview_radius = Planet.get_radius(self.settings_gui_elements['planet_mass_slider'].get_current_value()) * zoom
+        return self.orbit_preview.draw(self.screen, SimulationManager.camera) + [
+            pygame.draw.circle(self.screen, Config.WHITE, (self.mouse_x, self.mouse_y), preview_radius),
             pygame.draw.line(self.screen, Config.WHITE,
                              (self.mouse_x, self.mouse_y),
-                             (self.mouse_x + self.velocity_vector.x * Config.PV_LENGTH_COEF,
-                              self.mouse_y + self.velocity_vector.y * Config.PV_LENGTH_COEF),
+                             (self.mouse_x + self.velocity_vector.x * Config.PV_LENGTH_COEF * zoom,
+                              self.mouse_y + self.velocity_vector.y * Config.PV_LENGTH_COEF * zoom),
                              Config.PV_LINE_THICKNESS)
+        ]
 
-    def update(self) -> None:
-        # Drawing grid
-        if self.radio_buttons[self.grid_button]:
-            if self.radio_buttons[self.curvature_button]:
-                self.grid.draw_curved_grid()  # Drawing curved grid on grid.surface
-            else:
-                self.grid.draw_normal_grid()  # Drawing normal grid on grid.surface
+    def get_state(self) -> PhysicsState:
+        """Returns state of bodies, drawn in this frame"""
+
+        # Frame shows planets between the last two states of physics worker
+        if self.physics_worker is not None:
+            return self.physics_worker.interpolate()
+
+        with SimulationManager.lock:
+            return PhysicsState.capture()
 
-            self.screen.blit(self.grid.surface, (0, 0))  # Drawing grid.surface on screen
+    def update_simulation(self) -> PhysicsState:
+        """
+        Runs physics with fixed time step, independent of FPS.
+        Faster animation speed makes more steps per frame.
+        :return: State of bodies, drawn in this frame
+        """
+
+        # Steps are made by physics worker (its time of steps is added to timings of frame)
+        if self.physics_worker is not None:
+            self.physics_worker.speed = self.animation_speed
+            for stage, seconds in self.physics_worker.pop_timings().items():
+                self.profiler.add(stage, seconds)
+            return self.get_state()
+
+        self.physics_time += self.animation_speed * self.time_delta * Config.STABLE_FPS
+
+        steps = 0
+        with SimulationManager.lock:
+            while self.physics_time >= Config.PHYSICS_DT and steps < Config.MAX_PHYSICS_STEPS:
+                # Same as SimulationManager.step, but physics and collisions are profiled separately
+                with self.profiler.measure('physics'):
+                    SimulationManager.update_physics(dt=Config.PHYSICS_DT)
+                with self.profiler.measure('collisions'):
+                    SimulationManager.resolve_collisions()
+                self.physics_time -= Config.PHYSICS_DT
+                steps += 1
+
+                if self.recorder is not None:
+                    self.recorder.record()
+
+        # Dropping time, that can't be simulated in real time
+        self.physics_time = min(self.physics_time, Config.PHYSICS_DT)
+        return self.get_state()
+
+    def update_replay(self) -> PhysicsState:
+        """
+        Shows recorded frames with the same speed, as physics is simulated
+        :return: State of bodies, drawn in this frame
+        """
 
-        # Simulation objects
-        SimulationManager.celestial_bodies.update(dt=self.animation_speed * self.time_delta)
+        if self.physics_worker is not None:
+            self.physics_worker.speed = 0  # Physics isn't calculated during replay
 
+        self.physics_time += self.animation_speed * self.time_delta * Config.STABLE_FPS
+        frames = int(self.physics_time // Config.PHYSICS_DT)
+        self.physics_time -= frames * Config.PHYSICS_DT
+
+        if frames > 0 and self.player.frame < len(self.player) - 1:
+            self.seek_replay(self.player.frame + frames, is_continuous=True)
+
+        return self.get_state()
+
+    def apply_quality(self) -> None:
+        """Applies settings of current level of quality, that aren't applied every frame"""
+
+        self.grid.set_stride(self.quality.settings['grid_stride'])
+        self.is_full_redraw_needed = True
+
+    def get_ui_rects(self) -> list:
+        """
+        Returns rects of visible elements of GUI outside of panels (windows, tool tips and labels).
+        Panels are opaque and are filled every frame, so elements inside them don't need redrawing of background
+        """
+
+        rects = []
+        for element in self.gui.manager.get_sprite_group():
+            if element.image is None or not element.image.get_width() or not element.image.get_height():
+                continue  # Containers
+            if not any(pygame.Rect(panel).contains(element.rect) for panel in self.gui.gui_rects):
+                rects.append(pygame.Rect(element.rect))
+
+        return rects
+
+    def compose_frame(self, rects: list = None) -> None:
+        """
+        Draws background, grid, glow and traces on screen
+        :param rects: Regions of screen, that are composed (the whole screen if None)
+        :return: None
+        """
+
+        layers = []
+        if self.radio_buttons[self.grid_button]:
+            layers.append(self.grid.get_surface(is_curved=self.radio_buttons[self.curvature_button]))
         if self.radio_buttons[self.glow_button]:
-            self.screen.blit(SimulationManager.glow_surface, (0, 0))  # Blit glow surface
+            layers.append(SimulationManager.glow_surface)
         if self.radio_buttons[self.trace_button]:
-            self.screen.blit(SimulationManager.trace_surface, (0, 0))  # Blit trace surface
+            layers.append(SimulationManager.trace_surface)
 
-        SimulationManager.celestial_bodies.draw(self.screen)
+        if rects is None:
+            self.screen.fill(Config.DARK_BLUE)
+            for layer in layers:
+                self.screen.blit(layer, (0, 0))
+            return
 
-        # GUI
-        for rect in self.gui.gui_rects:
-            pygame.draw.rect(self.screen, self.gui.gui_rect_color, rect)
+        # Every region is composed from scratch, so overlapping regions aren't blended twice
+        for rect in rects:
+            self.screen.fill(Config.DARK_BLUE, rect)
+            for layer in layers:
+                self.screen.blit(layer, rect, rect)
 
-        self.info_gui_elements['FPS_counter'].set_text(f'FPS: {int(self.clock.get_fps())}')  # FPS
-        self.gui.manager.update(self.time_delta)
-        self.gui.manager.draw_ui(self.screen)
+    def update(self) -> None:
+        # Curved grid is re-rendered only when its dots have changed
+        with self.profiler.measure('grid'):
+            is_grid_changed = self.radio_buttons[self.grid_button] and self.radio_buttons[self.curvature_button] \
+                              and self.grid.is_curved_grid_changed
+            if self.radio_buttons[self.grid_button]:
+                self.grid.get_surface(is_curved=self.radio_buttons[self.curvature_button])
+
+        # Bodies are drawn from published state, so renderer doesn't wait for physics worker
+        if self.player is not None:
+            with self.profiler.measure('physics'):
+                self.state = self.update_replay()
+        else:
+            self.state = self.update_simulation()
+            if self.diagnostics.is_overlay_shown:
+                with SimulationManager.lock:
+                    self.diagnostics.sample(SimulationManager.steps_count)
+        quality = self.quality.settings
+
+        # Adding positions to traces if simulation not on pause (and trace is updated in this frame)
+        if self.animation_speed * self.time_delta > 0 and self.frames_count % quality['trace_interval'] == 0:
+            SimulationManager.update_traces(self.state)
+
+        # Only bodies in view of camera are drawn
+        SimulationManager.update_view(self.state)
+
+        # Glow and traces are drawn only if they are shown
+        layer_rects = []
+        with self.profiler.measure('glow'):
+            if self.radio_buttons[self.glow_button]:
+                layer_rects += SimulationManager.draw_glow(max_layers=quality['glow_layers'],
+                                                           min_radius=quality['min_glow_radius'])
+        with self.profiler.measure('trace'):
+            if self.radio_buttons[self.trace_button]:
+                layer_rects += SimulationManager.draw_traces(max_length=quality['trace_length'])
+
+        # Regions of screen, changed in this frame
+        screen_rect = self.screen.get_rect()
+        overlay_rects = [self.profiler.get_overlay_rect(self.screen),
+                         self.diagnostics.get_overlay_rect(self.screen)]
+        rects = layer_rects + SimulationManager.get_view_rects()
+        rects += self.get_ui_rects()
+        rects += [rect for rect in overlay_rects if rect is not None]
+        rects = [rect.clip(screen_rect) for rect in rects]
+
+        # Regions, changed in this or in the previous frame, are redrawn (whole screen, if they are too big)
+        dirty_rects = list({tuple(rect): rect for rect in self.previous_rects + rects
+                            if rect.width and rect.height}.values())
+        dirty_area = sum(rect.width * rect.height for rect in dirty_rects)
+        is_full_redraw = not Config.DIRTY_RECTS or self.is_full_redraw_needed or is_grid_changed \
+            or len(dirty_rects) > Config.DIRTY_RECTS_MAX_COUNT \
+            or dirty_area > Config.DIRTY_RECTS_MAX_AREA * screen_rect.width * screen_rect.height
+
+        with self.profiler.measure('compose'):
+            self.compose_frame(None if is_full_redraw else dirty_rects)
+            preview_rects = self.draw_preview()
+            rects += preview_rects
+            dirty_rects += preview_rects
+
+        with self.profiler.measure('sprites'):
+            SimulationManager.draw_bodies(self.screen)
+
+        # GUI
+        with self.profiler.measure('ui_update'):
+            quality_text = f' (quality -{self.quality.level})' if self.quality.level else ''
+            self.info_gui_elements['FPS_counter'].set_text(f'FPS: {int(self.clock.get_fps())}{quality_text}')  # FPS
+            self.gui.manager.update(self.time_delta)
+
+        with self.profiler.measure('ui_draw'):
+            for rect in self.gui.gui_rects:
+                pygame.draw.rect(self.screen, self.gui.gui_rect_color, rect)
+            self.gui.manager.draw_ui(self.screen)
+            self.profiler.draw_overlay(self.screen)
+            self.diagnostics.draw_overlay(self.screen)
 
         # Display
-        pygame.display.flip()
+        with self.profiler.measure('flip'):
+            if is_full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects + self.gui.gui_rects)
+
+        self.previous_rects = rects
+        self.previous_layer_rects = layer_rects
+        self.is_full_redraw_needed = False
 
     def run(self) -> None:
         # Game loop
         self.is_running = True
 
         while self.is_running:
-            self.clock.tick(Config.FPS)
             self.time_delta = self.clock.tick(Config.FPS) / 1000.0
 
-            self.clear_surfaces()  # Clearing surfaces
-            self.handle_events()  # Handling events
-            self.update()  # Updating
+            frame_start_time = time.perf_counter()
 
+            with self.profiler.measure('clear'):
+                self.clear_surfaces()  # Clearing surfaces
+            with self.profiler.measure('events'):
+                self.handle_events()  # Handling events (bodies are locked only while they are changed)
+            self.update()  # Updating
+            self.profiler.end_frame()
+
+            # Adapting quality to time of work of frame
+            self.frames_count += 1
+            if Config.ADAPTIVE_QUALITY and self.quality.update(time.perf_counter() - frame_start_time):
+                self.apply_quality()
+
+        if self.physics_worker is not None:
+            self.physics_worker.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.profiler.stop_csv()
+        if self.event_sink is not None:
+            self.event_sink.stop()
         pygame.quit()  # Quit
 
 
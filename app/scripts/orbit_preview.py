@@ -0,0 +1,169 @@
+"""
+Module containing predicted trajectory of planet, that is being launched.
+
+New planet is integrated as test particle (it doesn't attract bodies) in field of frozen snapshot of drawn bodies
+with the same integrator, as simulation (Config.INTEGRATOR or block time steps), so prediction follows the path,
+that planet takes after launch, while other bodies don't move much.
+Every step is a few array operations over bodies, and trajectory is extended within time budget of every frame,
+so dragging stays at full frame rate, and trajectory grows, while mouse is still.
+"""
+
+# Modules
+import time
+
+import numpy as np
+import pygame
+
+from app.scripts.camera import Camera
+from app.scripts.integrators import Integrators, BlockTimesteps
+from app.scripts.config import Config
+
+
+class OrbitPreview:
+    def __init__(self, max_steps: int = Config.ORBIT_PREVIEW_STEPS, dt: float = Config.PHYSICS_DT):
+        """
+        :param max_steps: Max number of predicted steps
+        :param dt: Time step (the same, as step of simulation)
+        """
+
+        self.max_steps = max_steps
+        self.dt = dt
+
+        self.launch = None  # (x, y, vx, vy, radius) of the current prediction
+        # State of planet in the form of integrators: arrays (1, 2)
+        self.position = np.zeros((1, 2))
+        self.velocity = np.zeros((1, 2))
+        self.acceleration = None  # Acceleration in position, returned by integrator (None if it is unknown)
+        self.steps_count = 0
+        self.points = []  # Predicted positions (every Config.ORBIT_PREVIEW_POINT_STRIDE step)
+        self.end = None  # 'collision', 'escape' or None (prediction isn't cut off)
+
+        # Frozen snapshot of bodies
+        self.xs = self.ys = self.masses = self.contact_distances = np.zeros(0)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.end is not None or self.steps_count >= self.max_steps
+
+    def take_snapshot(self, state, radius: float) -> None:
+        """
+        Copies state of bodies, in field of which planet moves
+        :param state: Drawn state of bodies (PhysicsState)
+        :param radius: Radius of new planet
+        :return: None
+        """
+
+        self.xs = state.positions[:, 0].copy()
+        self.ys = state.positions[:, 1].copy()
+        self.masses = Config.G / Config.K ** 2 * state.masses
+        self.contact_distances = state.radii + radius
+
+    def set_launch(self, state, position: tuple, velocity: tuple, radius: float) -> None:
+        """
+        Starts new prediction, if position, velocity or radius of new planet has changed
+        :param state: Drawn state of bodies (PhysicsState, snapshot is taken from it)
+        :param position: Position of new planet in world
+        :param velocity: Velocity of new planet
+        :param radius: Radius of new planet
+        :return: None
+        """
+
+        launch = (*position, *velocity, radius)
+        if launch == self.launch:
+            return
+
+        self.launch = launch
+        self.take_snapshot(state, radius)
+        dx, dy = self.xs - position[0], self.ys - position[1]
+        squared_lengths = dx * dx + dy * dy
+        self.end = 'collision' if (squared_lengths < self.contact_distances * self.contact_distances).any() else None
+
+        self.position = np.array([position], dtype=float)
+        self.velocity = np.array([velocity], dtype=float)
+        self.acceleration = None
+        self.steps_count = 0
+        self.points = [tuple(position)]
+
+    def reset(self) -> None:
+        self.launch = None
+        self.points = []
+
+    def get_accelerations(self, positions: np.ndarray, indexes: np.ndarray = None) -> np.ndarray:
+        """
+        Accelerations of planet in snapshot (the same G, K and softening, as Physic), in the form of integrators.
+        max(K * length, MIN_DISTANCE) = K * max(length, MIN_DISTANCE / K), so K is taken out of arrays
+        :param positions: Array (n, 2) of positions of planet
+        :param indexes: Indexes of positions, in which acceleration is calculated (all if None)
+        :return: Array of accelerations
+        """
+
+        targets = positions if indexes is None else positions[indexes]
+        dx = self.xs[np.newaxis, :] - targets[:, 0, np.newaxis]
+        dy = self.ys[np.newaxis, :] - targets[:, 1, np.newaxis]
+        lengths = np.sqrt(dx * dx + dy * dy)
+        softened_lengths = np.maximum(lengths, Config.MIN_DISTANCE / Config.K)
+
+        # Body doesn't attract planet in its center (as in Physic)
+        lengths[lengths == 0] = np.inf
+        coefficients = self.masses / (lengths * softened_lengths * softened_lengths)
+        return np.column_stack([(coefficients * dx).sum(axis=1), (coefficients * dy).sum(axis=1)])
+
+    def extend(self, time_budget: float = Config.ORBIT_PREVIEW_FRAME_TIME) -> None:
+        """
+        Continues prediction with integrator of simulation, until time budget is spent
+        :param time_budget: Max time of extension (seconds)
+        :return: None
+        """
+
+        if self.launch is None:
+            return
+
+        limit_x, limit_y = np.array(Config.WINDOW_SIZE, dtype=float) * (Config.SYSTEM_BOUNDARY or np.inf)
+        deadline = time.perf_counter() + time_budget
+        integrator = Integrators.INTEGRATORS[Config.INTEGRATOR]
+        squared_contact_distances = self.contact_distances * self.contact_distances
+        position, velocity, acceleration = self.position, self.velocity, self.acceleration
+
+        while not self.is_finished and time.perf_counter() < deadline:
+            for _ in range(Config.ORBIT_PREVIEW_POINT_STRIDE):
+                # The same step, as in SimulationManager.update_physics
+                if Config.BLOCK_TIMESTEPS:
+                    position, velocity, acceleration, _ = BlockTimesteps.integrate(
+                        position, velocity, self.get_accelerations, self.dt, acceleration
+                    )
+                else:
+                    position, velocity, acceleration = integrator(position, velocity, self.get_accelerations,
+                                                                  self.dt, acceleration)
+
+                # Planet would be devoured or merged, so trajectory ends at body
+                x, y = position[0].tolist()
+                dx, dy = self.xs - x, self.ys - y
+                if (dx * dx + dy * dy < squared_contact_distances).any():
+                    self.end = 'collision'
+                elif abs(x) > limit_x or abs(y) > limit_y:
+                    self.end = 'escape'
+
+                self.steps_count += 1
+                if self.is_finished:
+                    break
+
+            self.points.append(tuple(position[0].tolist()))
+
+        self.position, self.velocity, self.acceleration = position, velocity, acceleration
+
+    def draw(self, surface: pygame.Surface, camera: Camera) -> list:
+        """
+        Draws predicted trajectory
+        :param surface: Surface, on which trajectory is drawn
+        :param camera: Camera, that maps trajectory to screen
+        :return: List of changed rects
+        """
+
+        if len(self.points) < 2:
+            return []
+
+        points = camera.to_screen_array(np.array(self.points))
+        rects = [pygame.draw.lines(surface, Config.ORBIT_PREVIEW_COLOR, False, points.tolist())]
+        if self.end == 'collision':
+            rects.append(pygame.draw.circle(surface, Config.BUTTON_RED, points[-1].tolist(), 4, 1))
+        return rects
@@ -0,0 +1,140 @@
+"""
+Module containing multi-core gravity solver.
+
+Positions and masses of bodies are written into shared memory once per evaluation,
+and worker processes of a persistent pool read them and write accelerations of their chunks
+of targets back into shared memory. Only names of blocks and bounds of chunks are pickled.
+"""
+
+# Modules
+import os
+import atexit
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.scripts.physic import Physic
+from app.scripts.config import Config
+
+# Shared memory blocks, attached by worker process {role: SharedMemory}
+worker_blocks = {}
+
+
+def get_worker_array(role: str, name: str, shape: tuple) -> np.ndarray:
+    """
+    Returns array, backed by shared memory block (block is attached once per worker)
+    :param role: Role of block ('targets', 'positions', 'masses' or 'accelerations')
+    :param name: Name of shared memory block
+    :param shape: Shape of array
+    :return: np.ndarray
+    """
+
+    block = worker_blocks.get(role)
+    if block is None or block.name != name:
+        if block is not None:
+            block.close()
+        block = worker_blocks[role] = SharedMemory(name=name)
+
+    return np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+
+
+def evaluate_chunk(task: tuple) -> None:
+    """
+    Calculates accelerations of chunk of targets (runs in worker process)
+    :param task: Tuple of (names of blocks, number of targets, number of bodies, start of chunk, end of chunk)
+    :return: None
+    """
+
+    names, targets_count, bodies_count, start, end = task
+
+    targets = get_worker_array('targets', names['targets'], (targets_count, 2))
+    positions = get_worker_array('positions', names['positions'], (bodies_count, 2))
+    masses = get_worker_array('masses', names['masses'], (bodies_count,))
+    accelerations = get_worker_array('accelerations', names['accelerations'], (targets_count, 2))
+
+    accelerations[start:end] = Physic.calculate_accelerations(targets[start:end], positions, masses)
+
+
+class ParallelSolver:
+    """Direct summation, split between worker processes"""
+
+    def __init__(self, workers: int = Config.PARALLEL_WORKERS):
+        """
+        :param workers: Number of worker processes (number of CPUs if None)
+        """
+
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None  # Pool is created on the first evaluation and stays alive
+        self.blocks = {}  # {role: SharedMemory}
+        self.capacity = 0  # Max number of bodies, that fit into blocks
+
+        atexit.register(self.close)
+
+    def allocate(self, bodies_count: int) -> None:
+        """
+        Allocates shared memory blocks, if current ones are too small
+        :param bodies_count: Required number of bodies
+        :return: None
+        """
+
+        if bodies_count <= self.capacity:
+            return
+
+        self.release_blocks()
+        self.capacity = max(bodies_count, 2 * self.capacity, 1024)  # Growing with reserve
+
+        for role, columns in (('targets', 2), ('positions', 2), ('masses', 1), ('accelerations', 2)):
+            self.blocks[role] = SharedMemory(create=True, size=self.capacity * columns * 8)
+
+    def get_array(self, role: str, shape: tuple) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.float64, buffer=self.blocks[role].buf)
+
+    def calculate_accelerations(self, targets: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """
+        Calculates accelerations with direct summation on worker processes
+        :param targets: Array (n, 2) of positions, in which acceleration is calculated
+        :param positions: Array (m, 2) of positions of attracting bodies
+        :param masses: Array (m,) of masses of attracting bodies
+        :return: Array (n, 2) of accelerations
+        """
+
+        targets_count, bodies_count = len(targets), len(positions)
+        self.allocate(max(targets_count, bodies_count))
+
+        # Pool can be created by physics worker thread, while other threads hold locks, so processes are spawned
+        # instead of forking copies of these locks
+        if self.pool is None:
+            self.pool = multiprocessing.get_context('spawn').Pool(processes=self.workers)
+
+        # Writing state into shared memory
+        self.get_array('targets', (targets_count, 2))[:] = targets
+        self.get_array('positions', (bodies_count, 2))[:] = positions
+        self.get_array('masses', (bodies_count,))[:] = masses
+
+        # Every worker gets a few chunks, so workers finishing earlier take remaining ones
+        names = {role: block.name for role, block in self.blocks.items()}
+        bounds = np.linspace(0, targets_count, 4 * self.workers + 1).astype(int)
+        tasks = [(names, targets_count, bodies_count, start, end)
+                 for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        self.pool.map(evaluate_chunk, tasks)
+
+        return self.get_array('accelerations', (targets_count, 2)).copy()
+
+    def release_blocks(self) -> None:
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+        self.blocks = {}
+        self.capacity = 0
+
+    def close(self) -> None:
+        """Stops worker processes and frees shared memory"""
+
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+        self.release_blocks()
@@ -1,39 +1,91 @@
-import pygame
-from pygame.math import Vector2
+import numpy as np
 
 from app.scripts.config import Config
 
 
 class Physic:
-    # Scale vector
+    # Calculating accelerations, caused by pairs of bodies
     @staticmethod
-    def scale_vector(vector: Vector2, min_length=None, max_length=None) -> Vector2:
-        vector_length = vector.length()
+    def pair_accelerations(vector_distances: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """
+        Vectorized formula of acceleration: |a| = m / max(|r|, MIN_DISTANCE) ** 2 along r
+        :param vector_distances: Array (..., 2) of already scaled by K distances to attracting bodies
+        :param masses: Array (...) of masses of attracting bodies
+        :return: Array (..., 2) of accelerations
+        """
 
-        if min_length is not None:
-            if vector_length < min_length:
-                vector.scale_to_length(min_length)
+        lengths = np.sqrt(np.einsum('...k,...k->...', vector_distances, vector_distances))
+        scaled_lengths = np.maximum(lengths, Config.MIN_DISTANCE)  # Softening by Config.MIN_DISTANCE
 
-        elif max_length is not None:
-            if vector_length > max_length:
-                vector.scale_to_length(max_length)
+        # Body doesn't attract itself: zero distance gives infinite denominator and zero coefficient
+        denominators = np.where(lengths == 0, np.inf, lengths * scaled_lengths ** 2)
+        coefficients = masses / denominators  # |a| / |r|
 
-        return vector
+        return coefficients[..., np.newaxis] * vector_distances
 
-    # Calculating acceleration
+    # Calculating accelerations of many bodies at once
     @staticmethod
-    def calculate_acceleration(position_vector: Vector2, objects: pygame.sprite.Group) -> Vector2:
-        accelerations = Vector2(0, 0)  # Sum of forces ((0, 0) at the beginning)
+    def calculate_accelerations(targets: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """
+        Accelerations of targets by direct summation (the same formula, as pair_accelerations)
+        :param targets: Array (n, 2) of positions, in which acceleration is calculated
+        :param positions: Array (m, 2) of positions of attracting bodies
+        :param masses: Array (m,) of masses of attracting bodies
+        :return: Array (n, 2) of accelerations
+        """
 
-        for body in objects:
-            vector_distance = Config.K * (body.position_vector - position_vector)
+        accelerations = np.zeros((len(targets), 2))
+        scaled_positions = Config.K * positions
 
-            if vector_distance.length() != 0:
-                vector_distance = Physic.scale_vector(vector_distance, min_length=4)  # Scaling vector
-                universal_gravity = body.mass / vector_distance.length_squared()  # Calculating magnitude
-                unit_vector = (vector_distance / vector_distance.length())  # Calculating unit vector
-                acceleration = universal_gravity * unit_vector  # Calculating acceleration
+        # Targets are processed in chunks, so (chunk, m) temporary arrays stay small
+        for start in range(0, len(targets), Config.FORCE_CHUNK_SIZE):
+            chunk = Config.K * targets[start:start + Config.FORCE_CHUNK_SIZE]
 
-                accelerations += acceleration  # Adding acceleration
+            distances_x = scaled_positions[np.newaxis, :, 0] - chunk[:, 0, np.newaxis]
+            distances_y = scaled_positions[np.newaxis, :, 1] - chunk[:, 1, np.newaxis]
+            lengths = np.sqrt(distances_x * distances_x + distances_y * distances_y)
+            scaled_lengths = np.maximum(lengths, Config.MIN_DISTANCE)  # Softening by Config.MIN_DISTANCE
+
+            # Body doesn't attract itself: zero distance gives infinite denominator and zero coefficient
+            lengths[lengths == 0] = np.inf
+            coefficients = masses[np.newaxis, :] / (lengths * scaled_lengths * scaled_lengths)  # |a| / |r|
+
+            # Sum of coefficient * (position - target) is calculated as matrix product
+            accelerations[start:start + Config.FORCE_CHUNK_SIZE] = (
+                coefficients @ scaled_positions - chunk * coefficients.sum(axis=1)[:, np.newaxis]
+            )
 
         return accelerations
+
+    # Calculating gravitational potentials of many points at once
+    @staticmethod
+    def calculate_potentials(targets: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """
+        Potential, which gradient is minus acceleration of calculate_accelerations (without G).
+        Closer than MIN_DISTANCE acceleration doesn't grow, so potential is linear there
+        :param targets: Array (n, 2) of positions, in which potential is calculated
+        :param positions: Array (m, 2) of positions of attracting bodies
+        :param masses: Array (m,) of masses of attracting bodies
+        :return: Array (n,) of potentials
+        """
+
+        potentials = np.zeros(len(targets))
+        scaled_positions = Config.K * positions
+
+        for start in range(0, len(targets), Config.FORCE_CHUNK_SIZE):
+            chunk = Config.K * targets[start:start + Config.FORCE_CHUNK_SIZE]
+
+            distances_x = scaled_positions[np.newaxis, :, 0] - chunk[:, 0, np.newaxis]
+            distances_y = scaled_positions[np.newaxis, :, 1] - chunk[:, 1, np.newaxis]
+            lengths = np.sqrt(distances_x * distances_x + distances_y * distances_y)
+
+            # -1 / length far away, continued linearly inside MIN_DISTANCE (body doesn't attract itself)
+            with np.errstate(divide='ignore'):
+                inverse_lengths = np.where(lengths >= Config.MIN_DISTANCE, 1 / lengths,
+                                           (2 - lengths / Config.MIN_DISTANCE) / Config.MIN_DISTANCE)
+            inverse_lengths[lengths == 0] = 0
+
+            # Distances are scaled by K, so potential in coordinates of world is divided by K
+            potentials[start:start + Config.FORCE_CHUNK_SIZE] = -(inverse_lengths @ masses) / Config.K
+
+        return potentials
@@ -0,0 +1,187 @@
+"""
+Module containing background thread, that advances physics independently of rendering.
+
+Worker makes steps on its own schedule, holding SimulationManager.lock only for a single step,
+and publishes immutable states of bodies into a double buffer. Renderer draws only published states
+(planets between the last two states), so it never waits for physics and motion stays smooth,
+even if frames and steps aren't aligned.
+"""
+
+# Modules
+import time
+import threading
+
+import numpy as np
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.config import Config
+
+
+class PhysicsState:
+    """Immutable state of all bodies after step"""
+
+    def __init__(self, ids: np.ndarray, kinds: np.ndarray, positions: np.ndarray, masses: np.ndarray,
+                 radii: np.ndarray, colors: np.ndarray, step_time: float):
+        """
+        :param ids: Array (n,) of IDs of bodies (handle can be given to another body, but ID can't)
+        :param kinds: Array (n,) of kinds of bodies (BodyStore.STAR or BodyStore.PLANET)
+        :param positions: Array (n, 2) of positions of bodies
+        :param masses: Array (n,) of masses of bodies
+        :param radii: Array (n,) of radii of bodies
+        :param colors: Array (n, 4) of colors of bodies
+        :param step_time: Time (time.perf_counter), when step was finished
+        """
+
+        self.ids = ids
+        self.kinds = kinds
+        self.positions = positions
+        self.masses = masses
+        self.radii = radii
+        self.colors = colors
+        for array in (ids, kinds, positions, masses, radii, colors):
+            array.setflags(write=False)
+        self.time = step_time
+
+    @staticmethod
+    def capture(step_time: float = None) -> 'PhysicsState':
+        """
+        Copies state of all bodies of SimulationManager.bodies (must be called, while SimulationManager.lock is held)
+        :param step_time: Time of state (current time if None)
+        :return: PhysicsState
+        """
+
+        store = SimulationManager.bodies
+        count = store.count
+        return PhysicsState(store.ids[:count].copy(), store.kinds[:count].copy(), store.positions[:count].copy(),
+                            store.masses[:count].copy(), store.radii[:count].copy(), store.colors[:count].copy(),
+                            time.perf_counter() if step_time is None else step_time)
+
+
+class PhysicsWorker(threading.Thread):
+    def __init__(self):
+        super().__init__(name='physics', daemon=True)
+
+        self.speed = 1  # Animation speed (0 is pause)
+        self.physics_time = 0  # Simulation time, that hasn't been simulated yet
+        self.recorder = None  # Recorder of trajectories, that records every step
+        self.timings = dict.fromkeys(('physics', 'collisions'), 0.0)  # Time of steps since the last frame (seconds)
+
+        self.states = (None, None)  # Double buffer (previous state, latest state)
+        self.states_lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        with SimulationManager.lock:
+            self.publish()
+
+    def publish(self, is_step: bool = True) -> None:
+        """
+        Publishes state of bodies (must be called, while SimulationManager.lock is held)
+        :param is_step: State follows step of physics. Otherwise, bodies have been changed between steps
+        (by user), and the latest state is replaced, so interpolation isn't started again
+        :return: None
+        """
+
+        state = PhysicsState.capture()
+
+        with self.states_lock:
+            previous, latest = self.states
+            if is_step or latest is None:
+                self.states = (latest, state)
+            else:
+                state.time = latest.time
+                self.states = (previous, state)
+
+    def get_states(self) -> tuple:
+        """Returns the previous and the latest states (the previous one can be None)"""
+
+        with self.states_lock:
+            return self.states
+
+    def pop_timings(self) -> dict:
+        """Returns time of physics and collisions since the previous call (seconds) and forgets it"""
+
+        with self.states_lock:
+            timings, self.timings = self.timings, dict.fromkeys(self.timings, 0.0)
+        return timings
+
+    def get_step_interval(self) -> float:
+        """Returns real time between steps at current speed (seconds)"""
+
+        return Config.PHYSICS_DT / (Config.STABLE_FPS * self.speed) if self.speed > 0 else float('inf')
+
+    def reset(self) -> None:
+        """Forgets published states and publishes current bodies (after bodies were replaced)"""
+
+        with SimulationManager.lock:
+            state = PhysicsState.capture()
+        with self.states_lock:
+            self.states = (None, state)
+        self.physics_time = 0
+
+    def run(self) -> None:
+        last_time = time.perf_counter()
+
+        while not self.stop_event.is_set():
+            current_time = time.perf_counter()
+            self.physics_time += self.speed * (current_time - last_time) * Config.STABLE_FPS
+            last_time = current_time
+
+            steps = 0
+            while self.physics_time >= Config.PHYSICS_DT and steps < Config.MAX_PHYSICS_STEPS:
+                # Same as SimulationManager.step, but physics and collisions are timed separately
+                with SimulationManager.lock:
+                    start_time = time.perf_counter()
+                    SimulationManager.update_physics(dt=Config.PHYSICS_DT)
+                    physics_end_time = time.perf_counter()
+                    SimulationManager.resolve_collisions()
+                    collisions_end_time = time.perf_counter()
+
+                    if self.recorder is not None:
+                        self.recorder.record()
+                    self.publish()
+
+                with self.states_lock:
+                    self.timings['physics'] += physics_end_time - start_time
+                    self.timings['collisions'] += collisions_end_time - physics_end_time
+
+                self.physics_time -= Config.PHYSICS_DT
+                steps += 1
+
+            # Dropping time, that can't be simulated in real time
+            self.physics_time = min(self.physics_time, Config.PHYSICS_DT)
+
+            # Waiting for the next step (or for resuming)
+            waiting_time = (Config.PHYSICS_DT - self.physics_time) / (Config.STABLE_FPS * self.speed) \
+                if self.speed > 0 else Config.PHYSICS_WORKER_IDLE_TIME
+            self.stop_event.wait(min(max(waiting_time, 0), Config.PHYSICS_WORKER_IDLE_TIME))
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def interpolate(self) -> PhysicsState:
+        """
+        Returns state of bodies between the previous and the latest states (rendering is one step behind physics).
+        Planets, that don't exist in the previous state, and stars aren't moved. During pause the latest state is drawn
+        :return: PhysicsState
+        """
+
+        previous, latest = self.get_states()
+        if previous is None or not len(previous.ids) or self.speed <= 0:
+            return latest
+
+        alpha = min(max((time.perf_counter() - latest.time) / self.get_step_interval(), 0), 1)
+        if alpha >= 1:
+            return latest
+
+        # Previous positions of bodies of the latest state
+        order = np.argsort(previous.ids)
+        indexes = np.minimum(np.searchsorted(previous.ids, latest.ids, sorter=order), len(order) - 1)
+        previous_positions = previous.positions[order[indexes]]
+        is_found = previous.ids[order[indexes]] == latest.ids
+        previous_positions[~is_found] = latest.positions[~is_found]
+
+        positions = previous_positions + alpha * (latest.positions - previous_positions)
+        return PhysicsState(latest.ids, latest.kinds, positions, latest.masses, latest.radii, latest.colors,
+                            latest.time)
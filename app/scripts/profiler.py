@@ -0,0 +1,182 @@
+"""
+Module containing per-frame profiling of stages of the game loop
+"""
+
+# Modules
+import os
+import csv
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import pygame
+
+from app.scripts.config import Config
+
+
+class StageTimer:
+    """Context manager, that adds duration of block to timing of stage in current frame"""
+
+    def __init__(self, timings: list, index: int):
+        """
+        :param timings: Timings of stages in current frame
+        :param index: Index of stage
+        """
+
+        self.timings = timings
+        self.index = index
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, *exception):
+        self.timings[self.index] += time.perf_counter() - self.start_time
+
+
+class FrameProfiler:
+    """
+    Measures time of stages of every frame, while overlay is shown or timings are exported to CSV.
+    Otherwise, measure() returns empty context manager, so instrumentation costs almost nothing.
+    """
+
+    STAGES = ('clear', 'events', 'physics', 'collisions', 'grid', 'trace', 'glow', 'compose', 'sprites', 'ui_update',
+              'ui_draw', 'flip')
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, history: int = Config.PROFILER_HISTORY):
+        """
+        :param history: Number of last frames, from which percentiles are calculated
+        """
+
+        self.current = [0.0] * len(FrameProfiler.STAGES)  # Timings of current frame (seconds)
+        self.history = np.zeros((history, len(FrameProfiler.STAGES)))  # Ring buffer of timings (milliseconds)
+        self.frames_count = 0  # Number of measured frames
+        self.history_start = 0  # The first frame in history (timings of older frames are ignored)
+        self.timers = {stage: StageTimer(self.current, index) for index, stage in enumerate(FrameProfiler.STAGES)}
+        self.empty_timer = nullcontext()
+
+        self.is_overlay_shown = False
+        self.overlay = None  # Rendered overlay
+        self.font = None
+
+        self.csv_file = None
+        self.csv_writer = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.is_overlay_shown or self.csv_writer is not None
+
+    def measure(self, stage: str):
+        """
+        Returns context manager, that measures stage
+        :param stage: Name of stage (one of FrameProfiler.STAGES)
+        :return: Context manager
+        """
+
+        return self.timers[stage] if self.is_enabled else self.empty_timer
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        Adds time, measured outside of frame (by physics worker), to timing of stage in current frame
+        :param stage: Name of stage (one of FrameProfiler.STAGES)
+        :param seconds: Time of stage
+        :return: None
+        """
+
+        if self.is_enabled:
+            self.current[FrameProfiler.STAGES.index(stage)] += seconds
+
+    def end_frame(self) -> None:
+        """Saves timings of current frame and starts the next one"""
+
+        if not self.is_enabled:
+            return
+
+        timings = [timing * 1000 for timing in self.current]
+        self.history[self.frames_count % len(self.history)] = timings
+        if self.csv_writer is not None:
+            self.csv_writer.writerow([self.frames_count] + [f'{timing:.4f}' for timing in timings] +
+                                     [f'{sum(timings):.4f}'])
+
+        self.frames_count += 1
+        for index in range(len(self.current)):
+            self.current[index] = 0.0
+
+        if self.is_overlay_shown and self.frames_count % Config.PROFILER_OVERLAY_INTERVAL == 0:
+            self.render_overlay()
+
+    def get_percentiles(self) -> np.ndarray:
+        """
+        Returns percentiles of timings of stages and of the whole frame over the last frames
+        :return: Array (number of stages + 1, number of percentiles) of milliseconds
+        """
+
+        history = self.history[:min(self.frames_count - self.history_start, len(self.history))]
+        if len(history) == 0:
+            return np.zeros((len(FrameProfiler.STAGES) + 1, len(FrameProfiler.PERCENTILES)))
+
+        history = np.column_stack([history, history.sum(axis=1)])
+        return np.percentile(history, FrameProfiler.PERCENTILES, axis=0).T
+
+    def toggle_overlay(self) -> None:
+        self.is_overlay_shown = not self.is_overlay_shown
+        self.history_start = self.frames_count  # Old timings could be measured long ago
+        self.overlay = None
+
+    def render_overlay(self) -> None:
+        """Renders table of percentiles"""
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, Config.PROFILER_FONT_SIZE)
+
+        rows = [('stage',) + tuple(f'p{percentile}' for percentile in FrameProfiler.PERCENTILES)]
+        rows += [(stage,) + tuple(f'{value:.2f}' for value in values)
+                 for stage, values in zip(FrameProfiler.STAGES + ('total',), self.get_percentiles())]
+
+        # Table is rendered cell by cell, so columns are aligned with proportional font
+        cells = [[self.font.render(cell, True, Config.WHITE) for cell in row] for row in rows]
+        column_widths = [max(row[column].get_width() for row in cells) + 10 for column in range(len(rows[0]))]
+        line_height = self.font.get_linesize()
+
+        self.overlay = pygame.Surface((sum(column_widths) + 10, line_height * len(rows) + 10), pygame.SRCALPHA)
+        self.overlay.fill(Config.PROFILER_BG_COLOR)
+        for row_index, row in enumerate(cells):
+            x = 5
+            for cell, width in zip(row, column_widths):
+                self.overlay.blit(cell, (x, 5 + row_index * line_height))
+                x += width
+
+    def get_overlay_rect(self, surface: pygame.Surface):
+        """Returns rect of overlay in the top right corner of surface (None if overlay isn't drawn)"""
+
+        if not self.is_overlay_shown or self.overlay is None:
+            return None
+
+        return self.overlay.get_rect(topright=(surface.get_width(), 0))
+
+    def draw_overlay(self, surface: pygame.Surface) -> None:
+        rect = self.get_overlay_rect(surface)
+        if rect is not None:
+            surface.blit(self.overlay, rect)
+
+    def start_csv(self, path: str) -> None:
+        """
+        Starts writing timings of every frame (in milliseconds) to CSV file
+        :param path: Path to CSV file (file is overwritten)
+        :return: None
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.csv_file = open(path, 'w', newline='')
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(('frame',) + FrameProfiler.STAGES + ('total',))
+
+    def stop_csv(self) -> None:
+        if self.csv_file is not None:
+            self.csv_file.close()
+
+        self.csv_file = None
+        self.csv_writer = None
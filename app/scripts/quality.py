@@ -0,0 +1,83 @@
+"""
+Module containing adaptive quality of rendering
+"""
+
+# Modules
+from app.scripts.config import Config
+
+
+class QualityController:
+    """
+    Holds time of frame within budget of Config.FPS.
+    If frames are slower, than budget, quality is lowered level by level, and if there is enough headroom,
+    it is restored. Quality only scales layers, that are turned on by buttons of GUI.
+    """
+
+    # Levels of quality from the best to the worst
+    LEVELS = (
+        {'glow_layers': None, 'min_glow_radius': 0, 'trace_length': Config.MAX_TRACE_LENGTH, 'trace_interval': 1,
+         'grid_stride': 1},
+        {'glow_layers': 3, 'min_glow_radius': 0, 'trace_length': 300, 'trace_interval': 1, 'grid_stride': 1},
+        {'glow_layers': 2, 'min_glow_radius': 2, 'trace_length': 200, 'trace_interval': 2, 'grid_stride': 1},
+        {'glow_layers': 1, 'min_glow_radius': 3, 'trace_length': 100, 'trace_interval': 2, 'grid_stride': 2},
+        {'glow_layers': 1, 'min_glow_radius': 5, 'trace_length': 50, 'trace_interval': 3, 'grid_stride': 2},
+        {'glow_layers': 0, 'min_glow_radius': 0, 'trace_length': 25, 'trace_interval': 4, 'grid_stride': 3},
+    )
+
+    def __init__(self, fps: int = Config.FPS):
+        """
+        :param fps: Target frame rate
+        """
+
+        self.budget = 1 / fps  # Target time of frame (seconds)
+        self.level = 0
+        self.average_time = None  # Smoothed time of frame
+        self.frames_since_change = 0
+        self.level_times = {}  # Average time of frame at better level, when quality was lowered {level: time}
+
+    @property
+    def settings(self) -> dict:
+        """Settings of current level (see QualityController.LEVELS)"""
+
+        return QualityController.LEVELS[self.level]
+
+    def reset(self) -> None:
+        self.level = 0
+        self.average_time = None
+        self.frames_since_change = 0
+        self.level_times = {}
+
+    def update(self, frame_time: float) -> bool:
+        """
+        Adds time of frame and changes level of quality if it is needed
+        :param frame_time: Time of work of frame (without waiting for the next frame)
+        :return: True if level has changed
+        """
+
+        if self.average_time is None:
+            self.average_time = frame_time
+        self.average_time += Config.QUALITY_SMOOTHING * (frame_time - self.average_time)
+        self.frames_since_change += 1
+
+        if self.frames_since_change < Config.QUALITY_COOLDOWN_FRAMES:
+            return False
+
+        # Lowering quality
+        if self.average_time > self.budget and self.level < len(QualityController.LEVELS) - 1:
+            self.level_times[self.level] = self.average_time
+            self.level += 1
+
+        # Restoring quality, if there is enough headroom. Otherwise, better level is tried again after long time,
+        # if frames fit into budget (scene could become lighter, than when quality was lowered)
+        elif self.average_time < self.budget and self.level > 0:
+            is_known_as_slow = self.level_times.get(self.level - 1, 0) > self.budget
+            is_headroom = self.average_time < self.budget * Config.QUALITY_HEADROOM and not is_known_as_slow
+            if not is_headroom and self.frames_since_change < Config.QUALITY_RETRY_FRAMES:
+                return False
+            self.level -= 1
+
+        else:
+            return False
+
+        self.frames_since_change = 0
+        return True
@@ -0,0 +1,230 @@
+"""
+Module containing recording of trajectories and their replay without physics.
+
+Recording consists of two append-only files:
+    <path> - records of bodies (all frames one after another)
+    <path>.index - header and (step, first record, number of records) of every frame
+Both files are read as memory maps, so any frame is found in O(1) without reading previous ones.
+"""
+
+# Modules
+import os
+import struct
+
+import numpy as np
+
+from app.scripts.simulation import SimulationManager, Star
+from app.scripts.snapshot import Snapshot
+from app.scripts.body_store import BodyStore
+
+
+class TrajectoryLog:
+    """Read-only access to recorded frames"""
+
+    MAGIC = b'GRAVTRAJ'
+    VERSION = 1
+    PREFIX = struct.Struct('<8sQ')  # Magic, version
+
+    # Record of body in frame
+    RECORD = np.dtype([
+        ('id', '<i8'),
+        ('kind', 'u1'),  # Snapshot.STAR or Snapshot.PLANET
+        ('flags', 'u1'),  # BORN and DIED
+        ('color', 'u1', (4,)),
+        ('position', '<f8', (2,)),
+        ('mass', '<f8'),
+    ])
+    FRAME = np.dtype([('step', '<i8'), ('start', '<i8'), ('count', '<i8')])
+
+    # Flags of records
+    BORN = 1  # Body has appeared in this frame
+    DIED = 2  # Body has disappeared in this frame (record contains its last state)
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to file with records
+        """
+
+        with open(TrajectoryLog.get_index_path(path), 'rb') as file:
+            magic, version = TrajectoryLog.PREFIX.unpack(file.read(TrajectoryLog.PREFIX.size))
+        if magic != TrajectoryLog.MAGIC or version != TrajectoryLog.VERSION:
+            raise ValueError(f'{path} is not a recording of version {TrajectoryLog.VERSION}')
+
+        self.records = self.map_file(path, TrajectoryLog.RECORD)
+        self.frames = self.map_file(TrajectoryLog.get_index_path(path), TrajectoryLog.FRAME,
+                                    offset=TrajectoryLog.PREFIX.size)
+
+    @staticmethod
+    def get_index_path(path: str) -> str:
+        return path + '.index'
+
+    @staticmethod
+    def map_file(path: str, dtype: np.dtype, offset: int = 0) -> np.ndarray:
+        """Maps complete items of file to array (empty file can't be mapped)"""
+
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count <= 0:
+            return np.zeros(0, dtype=dtype)
+
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def get_frame(self, frame: int) -> np.ndarray:
+        """
+        Returns records of frame
+        :param frame: Index of frame
+        :return: Array of TrajectoryLog.RECORD
+        """
+
+        _, start, count = self.frames[frame].tolist()
+        return self.records[start:start + count]
+
+
+class TrajectoryRecorder:
+    """Appends state of all bodies after every step"""
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to file with records (file is overwritten)
+        """
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.records_file = open(path, 'wb')
+        self.index_file = open(TrajectoryLog.get_index_path(path), 'wb')
+        self.index_file.write(TrajectoryLog.PREFIX.pack(TrajectoryLog.MAGIC, TrajectoryLog.VERSION))
+
+        self.records_count = 0
+        self.frames_count = 0
+        self.previous = np.zeros(0, dtype=TrajectoryLog.RECORD)  # Records of the previous frame
+
+    @staticmethod
+    def collect() -> np.ndarray:
+        """Returns records of all bodies"""
+
+        store = SimulationManager.bodies
+        slots = np.concatenate([store.get_indexes(BodyStore.STAR), store.get_indexes(BodyStore.PLANET)])
+
+        records = np.zeros(len(slots), dtype=TrajectoryLog.RECORD)
+        records['id'] = store.ids[slots]
+        records['kind'] = store.kinds[slots]
+        records['color'] = store.colors[slots]
+        records['position'] = store.positions[slots]
+        records['mass'] = store.masses[slots]
+        return records
+
+    def record(self) -> None:
+        """Writes frame with current state of simulation"""
+
+        records = self.collect()
+        records['flags'][~np.isin(records['id'], self.previous['id'])] = TrajectoryLog.BORN
+
+        # Last states of removed bodies
+        deaths = self.previous[~np.isin(self.previous['id'], records['id'])]
+        deaths['flags'] = TrajectoryLog.DIED
+        self.previous = records
+
+        frame = np.concatenate([records, deaths])
+        self.records_file.write(frame.tobytes())
+        self.index_file.write(np.array([(SimulationManager.steps_count, self.records_count, len(frame))],
+                                       dtype=TrajectoryLog.FRAME).tobytes())
+
+        self.records_count += len(frame)
+        self.frames_count += 1
+
+    def flush(self) -> None:
+        """Makes written frames visible to readers"""
+
+        self.records_file.flush()
+        self.index_file.flush()
+
+    def close(self) -> None:
+        self.records_file.close()
+        self.index_file.close()
+
+
+class TrajectoryPlayer:
+    """
+    Shows recorded frames with ordinary bodies of simulation.
+    Bodies are only moved, so glow, traces and grid are drawn by existing code, and physics is never calculated.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to file with records
+        """
+
+        self.log = TrajectoryLog(path)
+        self.frame = -1  # Shown frame
+        self.bodies = {}  # {recorded ID: body}
+
+    def __len__(self) -> int:
+        return len(self.log)
+
+    def seek(self, frame: int, is_continuous: bool = False) -> bool:
+        """
+        Shows frame (positions of bodies are taken from the frame only, so seeking costs the same for any frame)
+        :param frame: Index of frame (clamped to recorded frames)
+        :param is_continuous: Frame follows shown frame in playback (otherwise traces are started again)
+        :return: True if stars or their masses have changed (grid has to be recalculated)
+        """
+
+        frame = min(max(frame, 0), len(self.log) - 1)
+        self.frame = frame
+
+        records = self.log.get_frame(frame)
+        records = records[records['flags'] & TrajectoryLog.DIED == 0]
+        is_stars_changed = False
+
+        shown_ids = set()
+        new_indexes = []  # Indexes of records of bodies, that aren't shown yet
+        for index, (body_id, kind, position, mass) in enumerate(zip(records['id'].tolist(), records['kind'].tolist(),
+                                                                    records['position'].tolist(),
+                                                                    records['mass'].tolist())):
+            shown_ids.add(body_id)
+            body = self.bodies.get(body_id)
+
+            if body is None:
+                new_indexes.append(index)
+
+            elif kind == Snapshot.STAR:
+                if body.mass != mass:
+                    body.set_mass(mass)
+                    is_stars_changed = True
+
+            else:
+                if body.mass != mass:
+                    body.set_mass(mass)
+                body.update_position(position, (0, 0))
+                if not is_continuous:
+                    SimulationManager.traces.pop(body.id, None)  # Trace is started again, when frame is drawn
+
+        # Removing bodies, that don't exist in this frame
+        for body_id in list(self.bodies):
+            if body_id not in shown_ids:
+                body = self.bodies.pop(body_id)
+                is_stars_changed = is_stars_changed or isinstance(body, Star)
+                body.kill()
+
+        # New bodies are added at once (kinds of Snapshot are the same as in BodyStore)
+        if new_indexes:
+            new_records = records[new_indexes]
+            slots = SimulationManager.add_bodies(new_records['kind'], new_records['position'], (0, 0),
+                                                 new_records['mass'], new_records['color'])
+            for body_id, slot in zip(new_records['id'].tolist(), slots.tolist()):
+                self.bodies[body_id] = SimulationManager.get_body(slot)
+            is_stars_changed = is_stars_changed or bool((new_records['kind'] == Snapshot.STAR).any())
+
+        return is_stars_changed
+
+    def close(self) -> None:
+        """Removes shown bodies"""
+
+        for body in self.bodies.values():
+            body.kill()
+        self.bodies = {}
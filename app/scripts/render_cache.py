@@ -0,0 +1,126 @@
+"""
+Module containing cache of pre-rendered surfaces of bodies and their glow
+"""
+
+# Modules
+from collections import OrderedDict
+
+import pygame
+
+from app.scripts.config import Config
+
+
+class RenderCache:
+    """
+    LRU cache of surfaces.
+    Surfaces are keyed by values (quantized radius, RGB of color, number of layers), so body,
+    whose radius or color has changed, simply gets another surface, and unused surfaces are evicted.
+    """
+
+    def __init__(self, max_size: int = Config.RENDER_CACHE_SIZE):
+        """
+        :param max_size: Max number of stored surfaces
+        """
+
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def quantize(radius: float) -> float:
+        """Rounds radius to Config.RENDER_CACHE_RADIUS_STEP"""
+
+        return round(radius / Config.RENDER_CACHE_RADIUS_STEP) * Config.RENDER_CACHE_RADIUS_STEP
+
+    @staticmethod
+    def create_surface(side: float) -> pygame.Surface:
+        """Creates transparent square surface (in format of display, if it is set)"""
+
+        surface = pygame.Surface((side, side), pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        surface.fill(Config.TRANSPARENT)
+        return surface
+
+    def get(self, key: tuple, render) -> pygame.Surface:
+        """
+        Returns cached surface or renders and caches new one
+        :param key: Key of surface
+        :param render: Function without arguments, that returns surface
+        :return: pygame.Surface
+        """
+
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = render()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # Removing least recently used surface
+
+        return surface
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+
+    def get_body_surface(self, radius: float, color: pygame.Color) -> pygame.Surface:
+        """
+        Returns surface with circle of body
+        :param radius: Radius of body
+        :param color: Color of body
+        :return: pygame.Surface
+        """
+
+        radius = self.quantize(radius)
+
+        def render() -> pygame.Surface:
+            surface = self.create_surface(2 * radius)
+            pygame.draw.circle(
+                surface,  # Surface
+                color,  # Color
+                (surface.get_width() // 2, surface.get_height() // 2),  # Relative position
+                radius  # Object radius
+            )
+            return surface
+
+        return self.get(('body', radius, tuple(color)), render)
+
+    def get_glow_surface(self, radius: float, glow_radius: float, glow_color: pygame.Color,
+                         glow_layers: int) -> pygame.Surface:
+        """
+        Returns surface with glow of body
+        :param radius: Radius of body
+        :param glow_radius: Max radius of glowing
+        :param glow_color: Color of glowing (alpha is ignored)
+        :param glow_layers: Number of layers of glowing
+        :return: pygame.Surface
+        """
+
+        radius = self.quantize(radius)
+        glow_radius = self.quantize(glow_radius)
+        rgb = tuple(glow_color)[:3]
+
+        def render() -> pygame.Surface:
+            surface_side = 2 * (radius + glow_radius)
+            surface = self.create_surface(surface_side)
+            center_of_surface = (surface_side // 2, surface_side // 2)
+
+            for i in range(glow_layers):
+                # Calculating color of glow
+                current_glow_alpha = min(Config.BASE_GLOW_ALPHA * (i + 1), 255)  # Calculated alpha (from 0 to 255)
+
+                pygame.draw.circle(
+                    surface,  # Surface
+                    pygame.Color(*rgb, current_glow_alpha),  # Color
+                    center_of_surface,  # Relative position
+                    radius + glow_radius * (1 - i / glow_layers)  # Glow radius
+                )
+
+            return surface
+
+        return self.get(('glow', radius, glow_radius, rgb, glow_layers), render)
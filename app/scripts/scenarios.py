@@ -0,0 +1,192 @@
+"""
+Module containing generators of reproducible scenes and loading of scenes from files
+"""
+
+# Modules
+import json
+from copy import copy
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+from app.scripts.simulation import SimulationManager, Planet, Star
+from app.scripts.body_store import BodyStore
+from app.scripts.collisions import Collisions
+from app.scripts.config import Config
+
+
+class Scenarios:
+    @staticmethod
+    def clear() -> None:
+        """Removes all bodies of simulation"""
+
+        SimulationManager.clear()
+
+    @staticmethod
+    def get_orbital_velocity(mass: float, distance: float) -> float:
+        """
+        Returns velocity of circular orbit (with the same K scaling as in Physic)
+        :param mass: Mass of central body
+        :param distance: Distance to central body
+        :return: float
+        """
+
+        return (Config.G * mass / (Config.K ** 2 * distance)) ** 0.5
+
+    @staticmethod
+    def get_region_scale(radii: np.ndarray, area: float, max_fill: float = Config.SCENARIO_MAX_FILL) -> float:
+        """
+        Returns multiplier of sides of region, so planets cover not more, than max_fill of its area
+        (otherwise free positions for all planets can't be found)
+        :param radii: Array of radii of planets
+        :param area: Area of region without scaling
+        :param max_fill: Max part of area, covered by planets
+        :return: float (not less than 1)
+        """
+
+        return max(1.0, (np.pi * float(radii @ radii) / (max_fill * area)) ** 0.5)
+
+    @staticmethod
+    def place(draw, radii: np.ndarray, obstacles: tuple = None,
+              attempts: int = Config.SCENARIO_PLACEMENT_ATTEMPTS) -> np.ndarray:
+        """
+        Draws positions of new bodies, drawing again positions of bodies, that overlap other bodies,
+        so scene doesn't start with merging and devouring
+        :param draw: Function, that returns array (n, 2) of n random positions
+        :param radii: Array (n,) of radii of new bodies
+        :param obstacles: Tuple of positions (m, 2) and radii (m,) of existing bodies
+        :param attempts: Max number of redrawings (bodies, that still overlap, keep their positions)
+        :return: Array (n, 2) of positions
+        """
+
+        obstacle_positions, obstacle_radii = obstacles if obstacles is not None else (np.zeros((0, 2)), np.zeros(0))
+        all_radii = np.concatenate([obstacle_radii, radii])
+        positions = draw(len(radii))
+
+        for _ in range(attempts):
+            first_bodies, second_bodies = Collisions.find_collisions(np.concatenate([obstacle_positions, positions]),
+                                                                     all_radii)
+
+            # The later body of every pair is moved (obstacles never move)
+            moved = np.unique(np.maximum(first_bodies, second_bodies)) - len(obstacle_positions)
+            moved = moved[moved >= 0]
+            if not len(moved):
+                break
+            positions[moved] = draw(len(moved))
+
+        return positions
+
+    @staticmethod
+    def ring(planets_count: int, seed: int = 0) -> None:
+        """
+        Single star with a ring of planets on circular orbits
+        :param planets_count: Number of planets
+        :param seed: Seed of random generator
+        :return: None
+        """
+
+        random = np.random.default_rng(seed)
+        center = np.array([Config.WIDTH / 2, Config.HEIGHT / 2])
+
+        star = Star(x=center[0], y=center[1], mass=Config.STAR_DEFAULT_MASS, color=copy(Config.STAR_COLOR))
+        # Ring stays light in comparison with star, otherwise it collapses under its own gravity
+        planet_mass = min(Config.PLANET_DEFAULT_MASS, 0.1 * star.mass / max(planets_count, 1))
+        radii = np.full(planets_count, Planet.get_radius(planet_mass))
+
+        def draw(count: int) -> np.ndarray:
+            distances = random.uniform(2 * star.radius, 0.45 * Config.HEIGHT, count)
+            angles = np.radians(random.uniform(0, 360, count))
+            return center + distances[:, np.newaxis] * np.column_stack([np.cos(angles), np.sin(angles)])
+
+        positions = Scenarios.place(draw, radii, obstacles=(center[np.newaxis], np.array([star.radius])))
+
+        # Velocities are perpendicular to radius
+        offsets = positions - center
+        distances = np.linalg.norm(offsets, axis=1)
+        speeds = Scenarios.get_orbital_velocity(star.mass, distances)
+        velocities = np.column_stack([-offsets[:, 1], offsets[:, 0]]) / distances[:, np.newaxis] * speeds[:, np.newaxis]
+
+        SimulationManager.add_bodies(np.full(planets_count, BodyStore.PLANET), positions, velocities,
+                                     np.full(planets_count, planet_mass), tuple(Config.PLANET_COLOR))
+
+    @staticmethod
+    def cloud(planets_count: int, seed: int = 0, stars_count: int = 3) -> None:
+        """
+        Several stars inside a cloud of planets with random velocities.
+        Cloud covers window, and it is bigger, if planets don't fit into window
+        :param planets_count: Number of planets
+        :param seed: Seed of random generator
+        :param stars_count: Number of stars
+        :return: None
+        """
+
+        random = np.random.default_rng(seed)
+        center = np.array([Config.WIDTH / 2, Config.HEIGHT / 2])
+
+        star_positions = random.uniform(0.25, 0.75, (stars_count, 2)) * Config.WINDOW_SIZE
+        star_masses = random.uniform(Config.STAR_MIN_MASS, Config.STAR_MAX_MASS, stars_count)
+        for (x, y), mass in zip(star_positions.tolist(), star_masses.tolist()):
+            Star(x=x, y=y, mass=mass, color=copy(Config.STAR_COLOR))
+
+        masses = random.uniform(Config.PLANET_MIN_MASS, Config.PLANET_MAX_MASS, planets_count)
+        radii = Planet.get_radius(masses)
+        half_size = center * Scenarios.get_region_scale(radii, Config.WIDTH * Config.HEIGHT)
+        positions = Scenarios.place(lambda count: random.uniform(center - half_size, center + half_size, (count, 2)),
+                                    radii, obstacles=(star_positions, Star.get_radius(star_masses)))
+        velocities = random.normal(0, 1, (planets_count, 2))
+
+        SimulationManager.add_bodies(np.full(planets_count, BodyStore.PLANET), positions, velocities, masses,
+                                     tuple(Config.PLANET_COLOR))
+
+    @staticmethod
+    def cluster(planets_count: int, seed: int = 0, spread: float = 60) -> None:
+        """
+        Dense cluster of planets around a single star
+        :param planets_count: Number of planets
+        :param seed: Seed of random generator
+        :param spread: Standard deviation of distance from center of cluster (it is bigger, if planets don't fit)
+        :return: None
+        """
+
+        random = np.random.default_rng(seed)
+        center = np.array([Config.WIDTH / 2, Config.HEIGHT / 2])
+
+        star = Star(x=center[0], y=center[1], mass=Config.STAR_DEFAULT_MASS, color=copy(Config.STAR_COLOR))
+
+        # Most of planets are within two standard deviations from center
+        radii = np.full(planets_count, Planet.get_radius(Config.PLANET_MIN_MASS))
+        spread *= Scenarios.get_region_scale(radii, np.pi * (2 * spread) ** 2)
+        positions = Scenarios.place(lambda count: center + random.normal(0, spread, (count, 2)), radii,
+                                    obstacles=(center[np.newaxis], np.array([star.radius])))
+        velocities = random.normal(0, 0.5, (planets_count, 2))
+
+        SimulationManager.add_bodies(np.full(planets_count, BodyStore.PLANET), positions, velocities,
+                                     np.full(planets_count, Config.PLANET_MIN_MASS), tuple(Config.PLANET_COLOR))
+
+    @staticmethod
+    def load(path: str) -> None:
+        """
+        Loads bodies from JSON file of the form
+        {"stars": [{"x", "y", "mass", "color"}], "planets": [{"x", "y", "vx", "vy", "mass", "color"}]}
+        :param path: Path to JSON file
+        :return: None
+        """
+
+        with open(path) as file:
+            scene = json.load(file)
+
+        for star in scene.get('stars', []):
+            Star(x=star['x'], y=star['y'], mass=star['mass'],
+                 color=pygame.Color(*star.get('color', Config.STAR_COLOR)))
+
+        for planet in scene.get('planets', []):
+            Planet(x=planet['x'], y=planet['y'], velocity=Vector2(planet['vx'], planet['vy']), mass=planet['mass'],
+                   color=pygame.Color(*planet.get('color', Config.PLANET_COLOR)))
+
+    # Generators, that can be chosen by name
+    GENERATORS = {
+        'ring': ring.__func__,
+        'cloud': cloud.__func__,
+        'cluster': cluster.__func__,
+    }
@@ -3,15 +3,25 @@ Module containing objects classes of simulations objects
 """
 
 # Modules
-from copy import copy
+import threading
 from abc import ABC, abstractmethod
 
+import numpy as np
 import pygame
 from pygame.math import Vector2
 
 from app.scripts.physic import Physic
+from app.scripts.barnes_hut import BarnesHut
+from app.scripts.parallel import ParallelSolver
+from app.scripts.star_field import StarField
+from app.scripts.integrators import Integrators, BlockTimesteps
+from app.scripts.render_cache import RenderCache
+from app.scripts.trace_buffer import TraceBuffer
+from app.scripts.collisions import Collisions
+from app.scripts.event_bus import EventBus
+from app.scripts.body_store import BodyStore
+from app.scripts.camera import Camera
 from app.scripts.config import Config
-from app.scripts.events import CustomEvents
 
 
 # Simulation manager class
@@ -20,95 +30,602 @@ class SimulationManager:
     glow_surface = pygame.Surface(Config.WINDOW_SIZE, pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
     trace_surface = pygame.Surface(Config.WINDOW_SIZE, pygame.SRCALPHA)  # lgtm [py/call/wrong-arguments]
 
-    # Sprite groups
-    celestial_bodies = pygame.sprite.Group()
-    planets = pygame.sprite.Group()
-    stars = pygame.sprite.Group()
+    # Pre-rendered surfaces of bodies and glow
+    render_cache = RenderCache(max_size=Config.RENDER_CACHE_SIZE)
+
+    # View of world (only bodies in view are drawn, others are only simulated)
+    camera = Camera(size=Config.WINDOW_SIZE)
+
+    # Drawn frame (renderer reads only published states of bodies, not SimulationManager.bodies)
+    view_state = None  # State of bodies, drawn in the current frame (PhysicsState)
+    view_indexes = np.zeros(0, dtype=np.int64)  # Indexes of bodies of view_state, that are visible
+    view_blits = []  # Surfaces of visible bodies and their rects on screen
+    traces = {}  # Traces of planets {ID: TraceBuffer}, used only by renderer
+
+    # State of all bodies in arrays (positions, velocities, masses, radii, kinds and colors)
+    bodies = BodyStore(capacity=Config.BODY_STORE_CAPACITY)
+
+    lock = threading.RLock()  # Held by physics worker during step and by game, while it changes bodies
+    events = EventBus(capacity=Config.EVENT_BUFFER_SIZE)  # Births, deaths, devours and changes of mass
+    diagnostics = None  # Diagnostics, that measure state just before and after collisions change bodies
+
+    # Gravity solvers
+    barnes_hut = BarnesHut(theta=Config.BARNES_HUT_THETA)
+    parallel_solver = None  # Pool of processes is started only if it is used
+    star_field = StarField()  # Used instead of summation of stars' forces, if Config.STAR_FIELD is on
+    steps_count = 0
+    force_evaluations = 0  # Number of planets, for which forces have been evaluated
+
+    # Accelerations of planets after the last step (valid while set of bodies isn't changed)
+    cached_accelerations = None
+    is_changed = True
+
+    @staticmethod
+    def clear() -> None:
+        """Removes all bodies of simulation"""
+
+        SimulationManager.bodies.clear()
+        SimulationManager.traces.clear()
+        SimulationManager.is_changed = True
+
+    @staticmethod
+    def add_bodies(kinds: np.ndarray, positions: np.ndarray, velocities: np.ndarray, masses: np.ndarray,
+                   colors: np.ndarray) -> np.ndarray:
+        """
+        Adds many bodies with one write into SimulationManager.bodies (objects of bodies aren't created,
+        see SimulationManager.get_body). Arrays of positions, velocities and colors can be broadcast
+        :param kinds: Array (n,) of kinds of bodies (BodyStore.STAR or BodyStore.PLANET)
+        :param positions: Array (n, 2) of positions
+        :param velocities: Array (n, 2) of velocities (velocities of stars are ignored by physics)
+        :param masses: Array (n,) of masses
+        :param colors: Array (n, 4) of colors
+        :return: Array (n,) of slots of new bodies (valid until the next removing of body)
+        """
+
+        store = SimulationManager.bodies
+        kinds = np.asarray(kinds, dtype=np.uint8)
+        masses = np.asarray(masses, dtype=float)
+        is_stars = kinds == BodyStore.STAR
+        ids = SimulationObject.allocate_ids(len(kinds))
+
+        start = store.count
+        store.add_many({
+            'positions': positions,
+            'velocities': velocities,
+            'masses': masses,
+            'radii': np.where(is_stars, Star.get_radius(masses), Planet.get_radius(masses)),
+            'kinds': kinds,
+            'colors': colors,
+            'ids': ids,
+        })
+        slots = np.arange(start, store.count)
+        SimulationManager.is_changed = True
+        SimulationManager.events.emit_many(EventBus.BIRTH, ids, store.positions[slots], masses,
+                                           step=SimulationManager.steps_count)
+
+        # Whole masses of new stars are added to grid
+        for slot, mass in zip(slots[is_stars].tolist(), masses[is_stars].tolist()):
+            SimulationManager.events.change_star(SimulationManager.get_body(slot), mass)
+
+        return slots
+
+    @staticmethod
+    def get_body(slot: int):
+        """
+        Returns object of body in slot. Object of body, added by SimulationManager.add_bodies, is created on
+        the first call, and the same object is returned until body is removed
+        :param slot: Slot of body in SimulationManager.bodies
+        :return: Star or Planet
+        """
+
+        store = SimulationManager.bodies
+        body = store.get_body(slot)
+        if body is None:
+            # Object is only a view of store, so it is created without adding of new body
+            body_class = Star if store.kinds[slot] == BodyStore.STAR else Planet
+            body = store.bodies[slot] = body_class.__new__(body_class)
+            body.id = int(store.ids[slot])
+            body.handle = int(store.handles[slot])
+        return body
+
+    @staticmethod
+    def calculate_accelerations(targets: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """
+        Calculates accelerations with solver, chosen in Config.GRAVITY_SOLVER
+        :param targets: Array (n, 2) of positions, in which acceleration is calculated
+        :param positions: Array (m, 2) of positions of attracting bodies
+        :param masses: Array (m,) of masses of attracting bodies
+        :return: Array (n, 2) of accelerations
+        """
+
+        if Config.GRAVITY_SOLVER == 'direct':
+            return Physic.calculate_accelerations(targets, positions, masses)
+
+        if Config.GRAVITY_SOLVER == 'barnes_hut':
+            # Tree is rebuilt on every step
+            SimulationManager.barnes_hut.theta = Config.BARNES_HUT_THETA
+            SimulationManager.barnes_hut.build(positions, masses)
+            return SimulationManager.barnes_hut.calculate_accelerations(targets)
+
+        if Config.GRAVITY_SOLVER == 'parallel':
+            # Small systems don't pay for the work of processes
+            if len(targets) < Config.PARALLEL_MIN_BODIES:
+                return Physic.calculate_accelerations(targets, positions, masses)
+
+            if SimulationManager.parallel_solver is None:
+                SimulationManager.parallel_solver = ParallelSolver(workers=Config.PARALLEL_WORKERS)
+            return SimulationManager.parallel_solver.calculate_accelerations(targets, positions, masses)
+
+        raise ValueError(f'Unknown gravity solver: {Config.GRAVITY_SOLVER}')
+
+    @staticmethod
+    def update_physics(dt) -> None:
+        """
+        Moves all planets by one step of integrator, chosen in Config.INTEGRATOR.
+        Accelerations of all planets are calculated from the same state of system,
+        so the result doesn't depend on order of planets in group.
+        :param dt: Time step
+        :return: None
+        """
+
+        store = SimulationManager.bodies
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        if not len(planet_slots):
+            return
+
+        SimulationManager.steps_count += 1
+
+        # State of system is taken from arrays of store (planets are in order of slots)
+        star_slots = store.get_indexes(BodyStore.STAR)
+        star_positions = store.positions[star_slots]
+        positions = store.positions[planet_slots]
+        velocities = store.velocities[planet_slots]
+        masses = np.concatenate([store.masses[star_slots], store.masses[planet_slots]])
+
+        def get_accelerations(planet_positions: np.ndarray, indexes: np.ndarray = None) -> np.ndarray:
+            all_positions = np.concatenate([star_positions, planet_positions])
+            targets = planet_positions if indexes is None else planet_positions[indexes]
+            SimulationManager.force_evaluations += len(targets)
+            return Config.G * SimulationManager.calculate_accelerations(targets, all_positions, masses)
+
+        if Config.STAR_FIELD:
+            star_field = SimulationManager.star_field
+            planet_masses = store.masses[planet_slots]
+
+            # Stars are sorted by ID, so removing of planets (which moves bodies between slots) doesn't rebuild field
+            order = np.argsort(store.ids[star_slots], kind='stable')
+            star_ids = tuple(store.ids[star_slots][order].tolist())
+            star_field.update(star_ids, star_positions[order], store.masses[star_slots][order])
+
+            def get_accelerations(planet_positions: np.ndarray, indexes: np.ndarray = None) -> np.ndarray:
+                targets = planet_positions if indexes is None else planet_positions[indexes]
+                SimulationManager.force_evaluations += len(targets)
+                return Config.G * (star_field.calculate_accelerations(targets) +
+                                   SimulationManager.calculate_accelerations(targets, planet_positions,
+                                                                             planet_masses))
+
+        # Accelerations, calculated on the previous step, are reused if nothing has changed
+        accelerations = SimulationManager.cached_accelerations
+        if SimulationManager.is_changed or accelerations is None or len(accelerations) != len(planet_slots):
+            accelerations = None
+
+        # Integrating
+        if Config.BLOCK_TIMESTEPS:
+            positions, velocities, SimulationManager.cached_accelerations, _ = BlockTimesteps.integrate(
+                positions, velocities, get_accelerations, dt, accelerations
+            )
+        else:
+            integrator = Integrators.INTEGRATORS[Config.INTEGRATOR]
+            positions, velocities, SimulationManager.cached_accelerations = integrator(
+                positions, velocities, get_accelerations, dt, accelerations
+            )
+        SimulationManager.is_changed = False
+
+        # Applying new state (it is drawn, when physics worker publishes it)
+        store.positions[planet_slots] = positions
+        store.velocities[planet_slots] = velocities
+        SimulationManager.report_errors()
+
+    @staticmethod
+    def report_errors() -> None:
+        """
+        Compares approximate solvers with direct summation in the current state and emits their relative errors
+        as events (once per step, on steps of Config.BARNES_HUT_REPORT_INTERVAL and STAR_FIELD_REPORT_INTERVAL)
+        :return: None
+        """
+
+        store = SimulationManager.bodies
+        step = SimulationManager.steps_count
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        targets = store.positions[planet_slots]
+
+        is_barnes_hut_report = (Config.GRAVITY_SOLVER == 'barnes_hut' and Config.BARNES_HUT_REPORT_ERROR and
+                                step % Config.BARNES_HUT_REPORT_INTERVAL == 0)
+        if is_barnes_hut_report:
+            # Forces of stars are taken from star field, if it is used
+            slots = planet_slots if Config.STAR_FIELD else np.arange(store.count)
+            positions, masses = store.positions[slots], store.masses[slots]
+            SimulationManager.barnes_hut.build(positions, masses)
+            error = BarnesHut.calculate_error(SimulationManager.barnes_hut.calculate_accelerations(targets),
+                                              Physic.calculate_accelerations(targets, positions, masses))
+            SimulationManager.events.emit_error(EventBus.BARNES_HUT_ERROR, error, step=step)
+
+        if Config.STAR_FIELD and Config.STAR_FIELD_REPORT_ERROR and step % Config.STAR_FIELD_REPORT_INTERVAL == 0:
+            error = SimulationManager.star_field.calculate_error(targets)
+            SimulationManager.events.emit_error(EventBus.STAR_FIELD_ERROR, error, step=step)
+
+    @staticmethod
+    def step(dt) -> None:
+        """
+        Makes one step of simulation without any rendering
+        :param dt: Time step
+        :return: None
+        """
+
+        SimulationManager.update_physics(dt)
+        SimulationManager.resolve_collisions()
+
+    @staticmethod
+    def resolve_collisions() -> None:
+        """
+        Finds all collisions after step and resolves them as a batch:
+        stars devour planets, colliding planets merge, planets out of system are removed
+        :return: None
+        """
+
+        store = SimulationManager.bodies
+        is_stars = (store.kinds[:store.count] == BodyStore.STAR).tolist()
+        first_bodies, second_bodies = Collisions.find_collisions(store.positions[:store.count],
+                                                                 store.radii[:store.count])
+
+        # Drift of conserved quantities is measured up to the state before changes, and new segment starts after them
+        diagnostics = SimulationManager.diagnostics
+        is_measured = diagnostics is not None and (len(first_bodies) > 0 or
+                                                   len(SimulationManager.get_out_of_system_slots()) > 0)
+        if is_measured:
+            diagnostics.end_segment()
+
+        devoured_planets = {}  # {planet: star}
+        merging_planets = []  # Pairs of colliding planets
+        for first, second in zip(first_bodies.tolist(), second_bodies.tolist()):
+            is_first_star, is_second_star = is_stars[first], is_stars[second]
+            # Objects of bodies are taken before killing, which changes order of slots
+            first, second = SimulationManager.get_body(first), SimulationManager.get_body(second)
+
+            if is_first_star and is_second_star:
+                continue
+            elif is_first_star:
+                devoured_planets.setdefault(second, first)
+            elif is_second_star:
+                devoured_planets.setdefault(first, second)
+            else:
+                merging_planets.append((first, second))
+
+        # Devouring
+        for planet, star in devoured_planets.items():
+            SimulationManager.emit_event(EventBus.DEVOUR, planet, star, planet.mass)
+            star.devour(planet)  # Star 'devouring' this planet
+            planet.kill()
+
+        # Merging (planets, devoured by stars, don't merge)
+        merging_planets = [pair for pair in merging_planets
+                           if pair[0] not in devoured_planets and pair[1] not in devoured_planets]
+        for group in Collisions.group_pairs(merging_planets):
+            planet = max(group, key=lambda body: body.mass)
+            planet.merge([other for other in group if other is not planet])
+
+        # Removing planets, that are out of system
+        for planet in [SimulationManager.get_body(slot) for slot in SimulationManager.get_out_of_system_slots()]:
+            SimulationManager.emit_event(EventBus.DEATH, planet, value=planet.mass)
+            planet.kill()
+
+        if is_measured:
+            diagnostics.start_segment()
+
+    @staticmethod
+    def get_out_of_system_slots() -> list:
+        """Returns slots of planets, that are farther from origin than Config.SYSTEM_BOUNDARY"""
+
+        if Config.SYSTEM_BOUNDARY is None:
+            return []
+
+        store = SimulationManager.bodies
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        limits = np.array(Config.WINDOW_SIZE, dtype=float) * Config.SYSTEM_BOUNDARY
+        return planet_slots[(np.abs(store.positions[planet_slots]) > limits).any(axis=1)].tolist()
+
+    @staticmethod
+    def update_traces(state) -> None:
+        """
+        Adds positions of all planets of drawn state to their traces (traces of removed planets are forgotten)
+        :param state: Drawn state of bodies (PhysicsState)
+        :return: None
+        """
+
+        traces = SimulationManager.traces
+        planets = np.flatnonzero(state.kinds == BodyStore.PLANET)
+        planet_ids = state.ids[planets].tolist()
+
+        for body_id, position in zip(planet_ids, state.positions[planets].tolist()):
+            trace = traces.get(body_id)
+            if trace is None:
+                trace = traces[body_id] = TraceBuffer(capacity=Config.MAX_TRACE_LENGTH)
+            trace.append(position)
+
+        # Every planet of state has trace, so other traces exist only if planets have been removed
+        if len(traces) > len(planet_ids):
+            planet_ids = set(planet_ids)
+            for body_id in [body_id for body_id in traces if body_id not in planet_ids]:
+                del traces[body_id]
+
+    @staticmethod
+    def update_view(state) -> None:
+        """
+        Finds bodies of drawn state in view of camera and prepares their surfaces and rects on screen.
+        Bodies out of view aren't drawn
+        :param state: Drawn state of bodies (PhysicsState)
+        :return: None
+        """
+
+        camera = SimulationManager.camera
+        render_cache = SimulationManager.render_cache
+
+        # Glow of body is not bigger than its two radii
+        indexes = np.flatnonzero(camera.get_visible(state.positions, 2 * state.radii))
+        centers = camera.to_screen_array(state.positions[indexes])
+        radii = state.radii[indexes] * camera.zoom  # Radii on screen
+
+        blits = []
+        for center, radius, color in zip(centers.tolist(), radii.tolist(), state.colors[indexes].tolist()):
+            # Surface is shared with other bodies of the same radius on screen and color
+            image = render_cache.get_body_surface(radius, color)
+            blits.append((image, image.get_rect(center=center)))
+
+        SimulationManager.view_state = state
+        SimulationManager.view_indexes = indexes
+        SimulationManager.view_blits = blits
+
+    @staticmethod
+    def get_view_rects() -> list:
+        """Returns rects of bodies, that are visible in the current frame"""
+
+        return [rect.copy() for _, rect in SimulationManager.view_blits]
+
+    @staticmethod
+    def draw_bodies(surface: pygame.Surface) -> list:
+        """
+        Draws bodies in view
+        :param surface: Surface, on which bodies are drawn
+        :return: List of changed rects
+        """
+
+        return surface.blits(SimulationManager.view_blits)
+
+    @staticmethod
+    def draw_trace(trace: TraceBuffer, color: tuple, max_length: int = Config.MAX_TRACE_LENGTH) -> list:
+        """
+        Draws trace of planet
+        :param trace: Trace of planet
+        :param color: Color of planet
+        :param max_length: Max number of the newest positions, that are drawn
+        :return: List of rects of parts of trace
+        """
+
+        points = SimulationManager.camera.to_screen_array(trace.get_points()[-max_length:]).tolist()
+        trace_color = pygame.Color(*color)
+        rects = []
+
+        # Segments are drawn by groups with the same thickness and alpha, one polyline per group
+        for start, end, line_thickness, alpha in TraceBuffer.get_buckets(len(points)):
+            # Calculating color
+            trace_color.a = alpha
+
+            # Drawing lines (segment with index i connects dots i - 1 and i)
+            rects.append(pygame.draw.lines(SimulationManager.trace_surface,
+                                           trace_color,
+                                           False,
+                                           points[start - 1:end],
+                                           line_thickness))
+
+        return rects
+
+    @staticmethod
+    def draw_traces(max_length: int = Config.MAX_TRACE_LENGTH) -> list:
+        """
+        Draws traces of planets of drawn state on trace_surface (trace, that is out of view, isn't drawn)
+        :param max_length: Max number of the newest positions of trace, that are drawn
+        :return: List of changed rects
+        """
+
+        state = SimulationManager.view_state
+        if state is None:
+            return []
+
+        left, top, right, bottom = SimulationManager.camera.get_world_rect()
+        is_visible = np.zeros(len(state.ids), dtype=bool)
+        is_visible[SimulationManager.view_indexes] = True
+        planets = np.flatnonzero(state.kinds == BodyStore.PLANET)
+
+        rects = []
+        for index, body_id, color in zip(planets.tolist(), state.ids[planets].tolist(),
+                                         state.colors[planets].tolist()):
+            trace = SimulationManager.traces.get(body_id)
+            if trace is None or len(trace) < 2:
+                continue
+
+            # Trace of planet out of view can still be visible
+            if not is_visible[index]:
+                min_x, min_y, max_x, max_y = trace.bounds
+                if max_x < left or min_x > right or max_y < top or min_y > bottom:
+                    continue
+
+            rects.extend(SimulationManager.draw_trace(trace, color, max_length))
+        return rects
+
+    @staticmethod
+    def draw_glow(max_layers: int = None, min_radius: float = 0) -> list:
+        """
+        Draws glow of bodies in view on glow_surface
+        :param max_layers: Max number of layers of glowing (number of layers of body if None)
+        :param min_radius: Bodies with smaller radius (in pixels) aren't glowing
+        :return: List of changed rects
+        """
+
+        state = SimulationManager.view_state
+        if max_layers == 0 or state is None:
+            return []
+
+        indexes = SimulationManager.view_indexes
+        radii = state.radii[indexes] * SimulationManager.camera.zoom  # Radii on screen
+        is_stars = state.kinds[indexes] == BodyStore.STAR
+        rects = []
+        for (_, rect), radius, color, is_star in zip(SimulationManager.view_blits, radii.tolist(),
+                                                     state.colors[indexes].tolist(), is_stars.tolist()):
+            if radius < min_radius:
+                continue
+
+            body_class = Star if is_star else Planet
+            glow_layers = body_class.GLOW_LAYERS if max_layers is None else min(body_class.GLOW_LAYERS, max_layers)
+            glow_surface = SimulationManager.render_cache.get_glow_surface(
+                radius, radius * body_class.GLOW_COEFFICIENT, color, glow_layers
+            )
+            rects.append(SimulationManager.glow_surface.blit(glow_surface, glow_surface.get_rect(center=rect.center)))
+        return rects
+
+    @staticmethod
+    def emit_event(kind: int, body, other=None, value: float = 0.0) -> None:
+        """
+        Adds event of current step to SimulationManager.events
+        :param kind: Kind of event (EventBus.BIRTH, EventBus.DEATH, ...)
+        :param body: Celestial body
+        :param other: The second celestial body
+        :param value: Mass or change of mass
+        :return: None
+        """
+
+        SimulationManager.events.emit(kind, body, other, value, step=SimulationManager.steps_count)
 
 
 # Main simulation class
-class SimulationObject(pygame.sprite.Sprite):
+class SimulationObject:
     """
     Main Class of simulation.
-    Inherited from PyGame Sprite Class.
     """
 
     __ID = 1  # Each object of simulation has ID
 
-    def __init__(self, x, y, color):
-        pygame.sprite.Sprite.__init__(self)
+    def __init__(self):
         self.id = SimulationObject.__ID
 
-        self.x = x  # X coordinate
-        self.y = y  # Y coordinate
-        self.color = color  # Color
-
         SimulationObject.__ID += 1  # Increasing ID by 1
 
+    @staticmethod
+    def allocate_ids(count: int) -> np.ndarray:
+        """Returns array of IDs for count new objects"""
+
+        ids = np.arange(SimulationObject.__ID, SimulationObject.__ID + count, dtype=np.int64)
+        SimulationObject.__ID += count
+        return ids
+
 
 # Celestial body class
 class CelestialBody(SimulationObject, ABC):
     """
     Class that contains general settings of 'celestial bodies'.
     Inherited from SimulationObject and ABC Classes.
+    State of body is stored in SimulationManager.bodies, object is its view (bodies are drawn from
+    published states, see PhysicsState). Objects of bodies, added at once, are created only when they are used
+    (see SimulationManager.get_body).
+    Properties of killed body mustn't be used (its handle can be given to another body).
     """
 
-    def __init__(self, x, y, mass, color):
-        super().__init__(x, y, color)
+    KIND = None  # Kind of body in BodyStore
+    GLOW_LAYERS = 3  # Number of layers of glowing
+    GLOW_COEFFICIENT = 1  # Size of glow in radii of body
 
-        self.mass = mass
-        self.glow_color = copy(self.color)  # Without alpha
+    def __init__(self, x, y, mass, color, velocity=(0, 0)):
+        super().__init__()
 
-        SimulationManager.celestial_bodies.add(self)
+        radius = self.get_radius(mass)
+        self.handle = SimulationManager.bodies.add(self, self.id, self.KIND, (x, y), tuple(velocity), mass, radius,
+                                                   tuple(color))
 
-    # Set object's surface, rect and image
-    def set_object_rect(self, radius) -> None:
-        self.image = pygame.Surface((2 * radius, 2 * radius)).convert_alpha()  # lgtm [py/call/wrong-arguments]
-        self.image.fill(Config.TRANSPARENT)
+        SimulationManager.is_changed = True
+        SimulationManager.emit_event(EventBus.BIRTH, self, value=mass)
 
-        self.rect = self.image.get_rect()
-        self.rect.center = (self.x, self.y)
-        self.position_vector = Vector2(self.rect.centerx, self.rect.centery)
+    def alive(self) -> bool:
+        """Returns True, if body hasn't been removed (handle of removed body can be given to another body)"""
 
-        pygame.draw.circle(
-            self.image,  # Surface
-            self.color,  # Color
-            (self.image.get_width() // 2, self.image.get_height() // 2),  # Relative position
-            self.radius  # Object radius
-        )
+        store = SimulationManager.bodies
+        slot = store.slots[self.handle]
+        return slot >= 0 and store.ids[slot] == self.id
 
-    def draw_object_glow(self, glow_radius: int, glow_color: pygame.Color, glow_layers: int) -> None:
-        """
-        Method in which the glow is drawn
-        :param glow_radius: Max radius of glowing
-        :param glow_color: Color of glowing
-        :param glow_layers: Number of layers of glowing
-        :return: None
-        """
+    def kill(self) -> None:
+        if self.alive():
+            SimulationManager.bodies.remove(self.handle)
+        SimulationManager.is_changed = True
 
-        # Glow surface
-        surface_side = 2 * (self.radius + glow_radius)
-        self.current_glow_surface = pygame.Surface((surface_side, surface_side)).convert_alpha()  # lgtm [py/call/wrong-arguments]
-        self.current_glow_surface.fill(Config.TRANSPARENT)
-        center_of_surface = (surface_side // 2, surface_side // 2)
+    @property
+    def slot(self) -> int:
+        return SimulationManager.bodies.slots[self.handle]
 
-        current_glow_color = glow_color  # Setting current color
+    @property
+    def x(self) -> float:
+        return SimulationManager.bodies.positions[self.slot, 0]
 
-        for i in range(glow_layers):
-            # Calculating color of glow
-            current_glow_alpha = min(Config.BASE_GLOW_ALPHA * (i + 1), 255)  # Calculated alpha (from 0 to 255)
-            current_glow_color.a = current_glow_alpha  # Setting alpha to current color
+    @x.setter
+    def x(self, value: float) -> None:
+        SimulationManager.bodies.positions[self.slot, 0] = value
 
-            pygame.draw.circle(
-                self.current_glow_surface,  # Surface
-                current_glow_color,  # Color
-                center_of_surface,  # Relative position
-                self.radius + glow_radius * (1 - i / glow_layers)  # Glow radius
-            )
+    @property
+    def y(self) -> float:
+        return SimulationManager.bodies.positions[self.slot, 1]
+
+    @y.setter
+    def y(self, value: float) -> None:
+        SimulationManager.bodies.positions[self.slot, 1] = value
+
+    @property
+    def position_vector(self) -> Vector2:
+        return Vector2(*SimulationManager.bodies.positions[self.slot])
+
+    @property
+    def velocity(self) -> Vector2:
+        return Vector2(*SimulationManager.bodies.velocities[self.slot])
 
-        # Drawing glow on a screen
-        position = (self.rect.centerx - self.radius - glow_radius, self.rect.centery - self.radius - glow_radius)
-        SimulationManager.glow_surface.blit(self.current_glow_surface, position)  # Drawing glow on screen
+    @velocity.setter
+    def velocity(self, value: Vector2) -> None:
+        SimulationManager.bodies.velocities[self.slot] = tuple(value)
+
+    @property
+    def mass(self) -> float:
+        return SimulationManager.bodies.masses[self.slot]
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        SimulationManager.bodies.masses[self.slot] = value
+
+    @property
+    def radius(self) -> float:
+        return SimulationManager.bodies.radii[self.slot]
+
+    @radius.setter
+    def radius(self, value: float) -> None:
+        SimulationManager.bodies.radii[self.slot] = value
+
+    @property
+    def color(self) -> pygame.Color:
+        return pygame.Color(*SimulationManager.bodies.colors[self.slot].tolist())
+
+    @color.setter
+    def color(self, value: pygame.Color) -> None:
+        SimulationManager.bodies.colors[self.slot] = tuple(pygame.Color(value))
+
+    def set_mass(self, mass: float) -> None:
+        """Changes mass and size of body"""
+
+        self.mass = mass
+        self.radius = self.get_radius(mass)
 
     @staticmethod
     @abstractmethod
@@ -116,11 +633,6 @@ class CelestialBody(SimulationObject, ABC):
         """Returns radius, based on object's mass"""
         pass
 
-    @abstractmethod
-    def update(self, *args, **kwargs) -> None:
-        """Updates object"""
-        pass
-
 
 # Planet class
 class Planet(CelestialBody):
@@ -129,6 +641,8 @@ class Planet(CelestialBody):
     Inherited from CelestialBody Class.
     """
 
+    KIND = BodyStore.PLANET
+
     def __init__(self, x, y, velocity, mass, color):
         """
         :param x: Initial X coordinate
@@ -138,19 +652,7 @@ class Planet(CelestialBody):
         :param color: Color of the planet
         """
 
-        super().__init__(x, y, mass, color)
-        self.radius = self.get_radius(self.mass)  # Radius of planet
-        self.set_object_rect(self.radius)
-
-        self.glow_radius = self.radius  # Size of glow
-        self.trace_color = copy(self.color)
-        self.trace_color.a = Config.BASE_TRACE_ALPHA
-
-        self.trace = [(self.x, self.y)]  # Array of dots
-        self.MAX_TRACE_LENGTH = 400  # Max size of array
-        self.velocity = velocity  # Set initial velocity
-
-        SimulationManager.planets.add(self)
+        super().__init__(x, y, mass, color, velocity)
 
     @staticmethod
     def get_radius(mass: int) -> float:
@@ -158,77 +660,40 @@ class Planet(CelestialBody):
         return radius
 
     # Updating position
-    def update_position(self, dt) -> None:
-        # Position vector
-        self.position_vector = Vector2(self.x, self.y)
-        # Calculating acceleration
-        self.acceleration = Physic.calculate_acceleration(self.position_vector, SimulationManager.celestial_bodies)
-        # Applying acceleration to velocity
-        self.velocity += Config.G * self.acceleration * dt
-
-        # Applying velocity to coordinates
-        self.x += self.velocity.x * dt
-        self.y += self.velocity.y * dt
-
-        self.rect.centerx = self.x
-        self.rect.centery = self.y
-
-    # Collision with stars
-    def collision_with_stars(self) -> None:
-        for star in SimulationManager.stars:
-            vector_distance = star.position_vector - self.position_vector
-            if vector_distance.length() < (star.radius + self.radius):
-                print(f'№{self.id} - killed by collision with star, position: {self.position_vector}')
-                star.devour(self)  # Star 'devouring' this planet
-                self.kill()
-
-    # Is planet out of system
-    def is_out_of_system(self) -> None:
-        max_coefficient = 8
-        if abs(self.rect.x) > Config.WIDTH * max_coefficient or abs(self.rect.y) > Config.HEIGHT * max_coefficient:
-            print(f'№{self.id} - killed by out of system, position: {self.position_vector}')
-            self.kill()
-
-    # Drawing planet trace
-    def draw_trace(self) -> None:
-        # Deleting unnecessary positions
-        if len(self.trace) > Config.MAX_TRACE_LENGTH:
-            difference = len(self.trace) - Config.MAX_TRACE_LENGTH
-            self.trace = self.trace[difference:]
-
-        previous_position = self.trace[0]
-
-        for index, current_position in enumerate(self.trace):
-            line_thickness = min(index // 100 + 1, 3)  # Calculated value or 3
-
-            # Calculating color
-            current_trace_color = self.trace_color
-            alpha = (index / len(self.trace))
-            current_trace_color.a = round(alpha * 255)
+    def update_position(self, position: np.ndarray, velocity: np.ndarray) -> None:
+        """
+        Applies position and velocity, calculated by integrator
+        :param position: New position (x, y)
+        :param velocity: New velocity (x, y)
+        :return: None
+        """
 
-            # Drawing line
-            pygame.draw.line(SimulationManager.trace_surface,
-                             current_trace_color,
-                             previous_position,
-                             current_position,
-                             line_thickness)
+        slot = self.slot
+        SimulationManager.bodies.positions[slot] = position
+        SimulationManager.bodies.velocities[slot] = velocity
 
-            previous_position = current_position  # Setting previous position
+    # Merging with other planets
+    def merge(self, planets: list) -> None:
+        """
+        Merges planets into this planet, conserving mass and momentum
+        :param planets: List of planets, that are merged and removed
+        :return: None
+        """
 
-    def update(self, *args, **kwargs) -> None:
-        delta_time = kwargs.get('dt') * Config.STABLE_FPS
+        bodies = [self] + planets
+        mass = sum(body.mass for body in bodies)
+        velocity = sum((body.mass * body.velocity for body in bodies), Vector2(0, 0)) / mass
+        position = sum((body.mass * Vector2(body.x, body.y) for body in bodies), Vector2(0, 0)) / mass
 
-        # Adding new position to trace array if simulation not on pause
-        if delta_time > 0:
-            position = (self.rect.centerx, self.rect.centery)
-            self.trace.append(position)
+        for planet in planets:
+            SimulationManager.emit_event(EventBus.MERGE, planet, self, planet.mass)
+            planet.kill()
 
-        # Updating
-        self.update_position(dt=delta_time)
-        self.collision_with_stars()
-        self.is_out_of_system()
-        self.draw_trace()
-        self.draw_object_glow(glow_radius=self.glow_radius, glow_color=self.glow_color, glow_layers=3)
+        SimulationManager.emit_event(EventBus.MASS_CHANGE, self, value=mass - self.mass)
+        self.velocity = velocity
+        self.x, self.y = position
+        self.set_mass(mass)
+        SimulationManager.is_changed = True
 
 
 # Star class
@@ -238,15 +703,15 @@ class Star(CelestialBody):
     Inherited from CelestialBody Class.
     """
 
+    KIND = BodyStore.STAR
+    GLOW_LAYERS = 5
+    GLOW_COEFFICIENT = 0.7
+
     def __init__(self, x, y, mass, color):
         super().__init__(x, y, mass, color)
-        self.radius = self.get_radius(self.mass)
-        self.set_object_rect(self.radius)
-        self.glow_radius = self.radius * 0.7  # Size of glow
 
-        # Posting event
-        SimulationManager.stars.add(self)
-        pygame.event.post(pygame.event.Event(CustomEvents.ADDED_NEW_STAR))
+        # Whole mass of new star is added to grid
+        SimulationManager.events.change_star(self, self.mass)
 
     @staticmethod
     def get_radius(mass: int) -> float:
@@ -254,14 +719,10 @@ class Star(CelestialBody):
         return radius
 
     def devour(self, planet: Planet) -> None:
-        self.mass += Config.DEVOUR_COEFFICIENT * planet.mass
-
-        self.radius = self.get_radius(self.mass)
-        self.set_object_rect(self.radius)
-        self.glow_radius = self.radius * 0.7  # Size of glow
-
-        # Posting event
-        pygame.event.post(pygame.event.Event(CustomEvents.CHANGED_STAR_MASS))
+        mass_delta = Config.DEVOUR_COEFFICIENT * planet.mass
+        self.set_mass(self.mass + mass_delta)
+        SimulationManager.is_changed = True
 
-    def update(self, *args, **kwargs) -> None:
-        self.draw_object_glow(glow_radius=self.glow_radius, glow_color=self.glow_color, glow_layers=5)
+        # Change of mass is coalesced with other changes of this star in the same frame
+        SimulationManager.emit_event(EventBus.MASS_CHANGE, self, value=mass_delta)
+        SimulationManager.events.change_star(self, mass_delta)
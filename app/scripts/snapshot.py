@@ -0,0 +1,165 @@
+"""
+Module containing saving and restoring of the full state of simulation.
+
+File consists of a small JSON header and columns of raw arrays, aligned to 64 bytes:
+    magic (8 bytes) | version (uint32) | length of header (uint32) | header | columns
+Columns are loaded as memory maps, so loading doesn't depend on number of bodies.
+"""
+
+# Modules
+import os
+import json
+import struct
+
+import numpy as np
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.trace_buffer import TraceBuffer
+from app.scripts.config import Config
+
+
+class Snapshot:
+    MAGIC = b'GRAVSNAP'
+    VERSION = 1
+    ALIGNMENT = 64
+    PREFIX = struct.Struct('<8sII')  # Magic, version, length of header
+
+    # Kinds of bodies
+    STAR = BodyStore.STAR
+    PLANET = BodyStore.PLANET
+
+    # Config constants, that are saved with bodies
+    CONFIG_FIELDS = ('G', 'K', 'MIN_DISTANCE', 'DEVOUR_COEFFICIENT', 'PHYSICS_DT', 'INTEGRATOR',
+                     'GRAVITY_SOLVER', 'BARNES_HUT_THETA', 'STAR_FIELD', 'BLOCK_TIMESTEPS')
+
+    @staticmethod
+    def collect() -> dict:
+        """
+        Gathers state of all bodies into columns
+        :return: Dictionary {name of column: array}
+        """
+
+        # Stars are saved before planets
+        store = SimulationManager.bodies
+        star_slots = store.get_indexes(BodyStore.STAR)
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        slots = np.concatenate([star_slots, planet_slots])
+
+        velocities = store.velocities[slots]
+        velocities[:len(star_slots)] = 0
+        empty_trace = np.zeros((0, 2))
+        traces = [empty_trace] * len(star_slots)
+        for body_id in store.ids[planet_slots].tolist():
+            trace = SimulationManager.traces.get(body_id)
+            traces.append(empty_trace if trace is None else trace.get_points())
+
+        return {
+            'kinds': store.kinds[slots],
+            'positions': store.positions[slots],
+            'velocities': velocities,
+            'masses': store.masses[slots],
+            'colors': store.colors[slots],
+            'trace_offsets': np.cumsum([0] + [len(trace) for trace in traces]).astype(np.int64),
+            'trace_points': np.concatenate(traces).astype(np.float64) if traces else np.zeros((0, 2)),
+        }
+
+    @staticmethod
+    def save(path: str, columns: dict = None) -> None:
+        """
+        Saves state of simulation and physical constants of Config to file
+        :param path: Path to file
+        :param columns: Columns to save (current state of simulation if None)
+        :return: None
+        """
+
+        columns = Snapshot.collect() if columns is None else columns
+
+        # Layout of columns
+        layout, offset = {}, 0
+        for name, column in columns.items():
+            column = np.ascontiguousarray(column)
+            columns[name] = column
+            layout[name] = {'dtype': column.dtype.str, 'shape': list(column.shape), 'offset': offset}
+            offset += -(-column.nbytes // Snapshot.ALIGNMENT) * Snapshot.ALIGNMENT
+
+        header = json.dumps({
+            'config': {field: getattr(Config, field) for field in Snapshot.CONFIG_FIELDS},
+            'columns': layout,
+        }).encode('utf-8')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'wb') as file:
+            file.write(Snapshot.PREFIX.pack(Snapshot.MAGIC, Snapshot.VERSION, len(header)))
+            file.write(header)
+            data_start = Snapshot.get_data_start(len(header))
+            for name, column in columns.items():
+                file.seek(data_start + layout[name]['offset'])
+                file.write(column.tobytes())
+            file.truncate(data_start + offset)
+
+    @staticmethod
+    def get_data_start(header_length: int) -> int:
+        """Returns offset of the first column in file"""
+
+        header_end = Snapshot.PREFIX.size + header_length
+        return -(-header_end // Snapshot.ALIGNMENT) * Snapshot.ALIGNMENT
+
+    @staticmethod
+    def load(path: str) -> tuple:
+        """
+        Loads columns as read-only memory maps (without creating bodies)
+        :param path: Path to file
+        :return: Tuple of columns {name: array} and saved config {field: value}
+        """
+
+        with open(path, 'rb') as file:
+            magic, version, header_length = Snapshot.PREFIX.unpack(file.read(Snapshot.PREFIX.size))
+            if magic != Snapshot.MAGIC or version != Snapshot.VERSION:
+                raise ValueError(f'{path} is not a snapshot of version {Snapshot.VERSION}')
+            header = json.loads(file.read(header_length).decode('utf-8'))
+
+        data_start = Snapshot.get_data_start(header_length)
+        columns = {}
+        for name, column in header['columns'].items():
+            shape = tuple(column['shape'])
+            if np.prod(shape) == 0:
+                columns[name] = np.zeros(shape, dtype=column['dtype'])
+            else:
+                columns[name] = np.memmap(path, dtype=column['dtype'], mode='r', shape=shape,
+                                          offset=data_start + column['offset'])
+
+        return columns, header['config']
+
+    @staticmethod
+    def restore(path: str, apply_config: bool = True) -> None:
+        """
+        Replaces all bodies of simulation with bodies from file
+        :param path: Path to file
+        :param apply_config: Apply saved physical constants to Config
+        :return: None
+        """
+
+        columns, config = Snapshot.load(path)
+        if apply_config:
+            for field, value in config.items():
+                setattr(Config, field, value)
+            Config.derive()
+
+        SimulationManager.clear()
+
+        # Columns are written into arrays of bodies at once (kinds of Snapshot are the same as in BodyStore)
+        slots = SimulationManager.add_bodies(columns['kinds'], columns['positions'], columns['velocities'],
+                                             columns['masses'], columns['colors'])
+
+        # Traces are restored only for planets, that have them
+        trace_offsets = np.asarray(columns['trace_offsets'])
+        indexes = np.flatnonzero(np.diff(trace_offsets) > 0)
+        trace_points = columns['trace_points']
+        for body_id, start, end in zip(SimulationManager.bodies.ids[slots[indexes]].tolist(),
+                                       trace_offsets[indexes].tolist(), trace_offsets[indexes + 1].tolist()):
+            trace = SimulationManager.traces[body_id] = TraceBuffer(capacity=Config.MAX_TRACE_LENGTH)
+            trace.set_points(trace_points[start:end])
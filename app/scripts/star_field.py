@@ -0,0 +1,213 @@
+"""
+Module containing precomputed gravity field of stars.
+
+Stars don't move, so their combined field is sampled once into grids and planets read it by bilinear interpolation.
+Grids are nested: one coarse grid covers the whole system, and every star has square patches, that are twice smaller
+and twice finer on every level, so field is sampled densely only where it changes fast.
+"""
+
+# Modules
+import numpy as np
+
+from app.scripts.physic import Physic
+from app.scripts.barnes_hut import BarnesHut
+from app.scripts.config import Config
+
+
+class StarField:
+    """
+    Nodes of all grids are stored in one flat array: coarse grid goes first,
+    then patches of all stars on level 0, then on level 1 and so on.
+    So every point is interpolated by the same four gathers, whichever grid it uses.
+    """
+
+    def __init__(self, levels: int = Config.STAR_FIELD_LEVELS, resolution: int = Config.STAR_FIELD_RESOLUTION,
+                 patch_size: float = Config.STAR_FIELD_PATCH_SIZE, extent: float = Config.STAR_FIELD_EXTENT):
+        """
+        :param levels: Number of levels of patches around every star
+        :param resolution: Number of cells along side of every patch
+        :param patch_size: Half of side of the biggest patch (halved on every next level)
+        :param extent: Coarse grid covers this number of window sizes from origin (field out of it is summed directly)
+        """
+
+        self.levels = levels
+        self.resolution = resolution
+        self.patch_size = patch_size
+
+        # Coarse grid has cells twice bigger, than cells of the biggest patch
+        self.coarse_cell = 4 * patch_size / resolution
+        self.coarse_limits = np.array(Config.WINDOW_SIZE, dtype=float) * extent
+        self.coarse_shape = np.ceil(2 * self.coarse_limits / self.coarse_cell).astype(np.int64)  # Cells (x, y)
+
+        # Half of side and size of cell of grids (index 0 is coarse grid, index level + 1 is patch)
+        self.halves = np.concatenate([[0.0], patch_size / 2 ** np.arange(levels)])
+        self.cell_sizes = np.concatenate([[self.coarse_cell], 2 * self.halves[1:] / resolution])
+
+        self.ids = ()  # IDs of stars, from which grids were built
+        self.positions = np.zeros((0, 2))
+        self.masses = np.zeros(0)
+        self.grid_masses = np.zeros(0)  # Masses of stars, from which values in nodes are calculated
+        self.steps_count = 0  # Number of updates since changes of masses were added to grids
+        self.nodes = None  # Array (number of nodes, 2) of positions of nodes of all grids
+        self.values = None  # Array (number of nodes, 2) of accelerations in nodes
+        self.nearest_stars = None  # Array (ny * nx) of star, closest to center of every coarse cell
+
+        self.builds_count = 0
+        self.updates_count = 0  # Number of times, when changes of masses were added to grids
+
+    def get_nodes(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Returns positions of nodes of all grids in order of flat array
+        :param positions: Array (stars, 2) of positions of stars
+        :return: Array (number of nodes, 2)
+        """
+
+        xs = np.arange(self.coarse_shape[0] + 1) * self.coarse_cell - self.coarse_limits[0]
+        ys = np.arange(self.coarse_shape[1] + 1) * self.coarse_cell - self.coarse_limits[1]
+        nodes = [np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)]
+
+        for level in range(self.levels):
+            offsets = np.arange(self.resolution + 1) * self.cell_sizes[level + 1] - self.halves[level + 1]
+            patch = np.stack(np.meshgrid(offsets, offsets), axis=-1)
+            nodes.append((positions[:, np.newaxis, np.newaxis, :] + patch).reshape(-1, 2))
+
+        return np.concatenate(nodes)
+
+    def build(self, ids: tuple, positions: np.ndarray, masses: np.ndarray) -> None:
+        """
+        Samples field of stars into all grids
+        :param ids: IDs of stars
+        :param positions: Array (stars, 2) of positions of stars
+        :param masses: Array (stars,) of masses of stars
+        :return: None
+        """
+
+        self.ids = ids
+        self.positions = positions.copy()
+        self.masses = masses.copy()
+        self.grid_masses = masses.copy()
+        self.steps_count = 0
+        self.nodes = self.get_nodes(positions)
+        self.values = Physic.calculate_accelerations(self.nodes, positions, masses)
+
+        # Patch of star, closest to center of coarse cell, is used for all points of cell,
+        # so choosing of patch doesn't depend on number of stars (Chebyshev distance, because patches are squares)
+        if len(positions):
+            nx, ny = self.coarse_shape
+            centers = self.nodes[:(nx + 1) * (ny + 1)].reshape(ny + 1, nx + 1, 2)[:-1, :-1] + self.coarse_cell / 2
+            distances = np.abs(centers[:, :, np.newaxis, :] - positions).max(axis=-1)
+            self.nearest_stars = distances.argmin(axis=-1).ravel()
+
+        self.builds_count += 1
+
+    def apply_mass_changes(self) -> None:
+        """Adds field of changes of stars' masses to all grids (field is linear in masses, so nothing is rebuilt)"""
+
+        changed = np.flatnonzero(self.masses != self.grid_masses)
+        if len(changed):
+            self.values += Physic.calculate_accelerations(self.nodes, self.positions[changed],
+                                                          self.masses[changed] - self.grid_masses[changed])
+            self.grid_masses = self.masses.copy()
+            self.updates_count += 1
+        self.steps_count = 0
+
+    def update(self, ids: tuple, positions: np.ndarray, masses: np.ndarray) -> None:
+        """
+        Rebuilds grids, if set of stars has changed. Changes of masses are added to grids once in
+        Config.STAR_FIELD_UPDATE_INTERVAL calls, until then field of changes is summed directly
+        :param ids: IDs of stars
+        :param positions: Array (stars, 2) of positions of stars
+        :param masses: Array (stars,) of masses of stars
+        :return: None
+        """
+
+        if ids != self.ids or self.values is None:
+            self.build(ids, positions, masses)
+            return
+
+        self.masses = masses.copy()
+        self.steps_count += 1
+        if self.steps_count >= Config.STAR_FIELD_UPDATE_INTERVAL:
+            self.apply_mass_changes()
+
+    def calculate_accelerations(self, targets: np.ndarray) -> np.ndarray:
+        """
+        Interpolates field of stars (without G, as Physic.calculate_accelerations)
+        :param targets: Array (n, 2) of positions, in which acceleration is calculated
+        :return: Array (n, 2) of accelerations
+        """
+
+        if not len(self.positions) or not len(targets):
+            return np.zeros((len(targets), 2))
+
+        # Changes of masses, that aren't added to grids yet
+        changed = np.flatnonzero(self.masses != self.grid_masses)
+        if len(changed):
+            accelerations = Physic.calculate_accelerations(targets, self.positions[changed],
+                                                           self.masses[changed] - self.grid_masses[changed])
+        else:
+            accelerations = np.zeros((len(targets), 2))
+
+        # Coordinates are processed as separate arrays, and arrays are indexed by np.take,
+        # which is several times faster, than fancy indexing of rows of (n, 2) arrays
+        nx, ny = self.coarse_shape.tolist()
+        coarse_x = (targets[:, 0] + self.coarse_limits[0]) / self.coarse_cell
+        coarse_y = (targets[:, 1] + self.coarse_limits[1]) / self.coarse_cell
+
+        # Points out of coarse grid are summed directly
+        is_inside = (coarse_x >= 0) & (coarse_x < nx) & (coarse_y >= 0) & (coarse_y < ny)
+        if is_inside.all():
+            inside = slice(None)
+        else:
+            outside = np.flatnonzero(~is_inside)
+            accelerations[outside] += Physic.calculate_accelerations(targets[outside], self.positions,
+                                                                    self.grid_masses)
+            inside = np.flatnonzero(is_inside)
+            targets, coarse_x, coarse_y = targets[inside], coarse_x[inside], coarse_y[inside]
+        x, y = targets[:, 0], targets[:, 1]
+
+        # The finest patch of the nearest star, that contains point (level -1 is coarse grid)
+        stars = self.nearest_stars.take(coarse_y.astype(np.int64) * nx + coarse_x.astype(np.int64))
+        star_x, star_y = self.positions[:, 0].take(stars), self.positions[:, 1].take(stars)
+        distances = np.maximum(np.abs(x - star_x), np.abs(y - star_y))
+        with np.errstate(divide='ignore'):
+            levels = np.floor(np.log2(self.patch_size / distances))
+        levels = np.clip(levels, -1, self.levels - 1).astype(np.int64)
+        is_coarse = levels < 0
+
+        # Position of point in cells of its grid
+        halves, cell_sizes = self.halves.take(levels + 1), self.cell_sizes.take(levels + 1)
+        grid_x = np.where(is_coarse, coarse_x, (x - star_x + halves) / cell_sizes)
+        grid_y = np.where(is_coarse, coarse_y, (y - star_y + halves) / cell_sizes)
+        max_cells = self.resolution - 1
+        cells_x = np.where(is_coarse, np.minimum(grid_x.astype(np.int64), nx - 1),
+                           np.clip(np.floor(grid_x), 0, max_cells).astype(np.int64))
+        cells_y = np.where(is_coarse, np.minimum(grid_y.astype(np.int64), ny - 1),
+                           np.clip(np.floor(grid_y), 0, max_cells).astype(np.int64))
+        fx = np.clip(grid_x - cells_x, 0, 1)[:, np.newaxis]
+        fy = np.clip(grid_y - cells_y, 0, 1)[:, np.newaxis]
+
+        # Index of the top left node of cell in flat array
+        side = self.resolution + 1
+        strides = np.where(is_coarse, nx + 1, side)
+        starts = np.where(is_coarse, 0, (nx + 1) * (ny + 1) + (levels * len(self.positions) + stars) * side ** 2)
+        indexes = starts + cells_y * strides + cells_x
+
+        # Bilinear interpolation
+        values = self.values
+        accelerations[inside] += (
+            (values.take(indexes, axis=0) * (1 - fx) + values.take(indexes + 1, axis=0) * fx) * (1 - fy) +
+            (values.take(indexes + strides, axis=0) * (1 - fx) + values.take(indexes + strides + 1, axis=0) * fx) * fy
+        )
+
+        return accelerations
+
+    def calculate_error(self, targets: np.ndarray) -> dict:
+        """
+        Compares interpolated field with direct summation of stars' forces
+        :param targets: Array (n, 2) of positions, in which field is compared
+        :return: Dictionary with mean and max relative error
+        """
+
+        exact_accelerations = Physic.calculate_accelerations(targets, self.positions, self.masses)
+        return BarnesHut.calculate_error(self.calculate_accelerations(targets), exact_accelerations)
@@ -0,0 +1,268 @@
+"""
+Parameter sweep: runs many independent simulations without window on a pool of processes.
+
+Every combination of parameters and seeds is a run of generated scenario. Summary of every finished run is appended
+to CSV table at once, so interrupted sweep continues from the first unfinished run, when it is started again.
+Runs are identified by all their settings, so sweep with another scenario, bodies, steps or dt never skips them.
+
+Usage (from the root of project):
+    python -m app.scripts.sweep --scenario ring --bodies 200 --steps 2000 --param G=0.05,0.075,0.1 --param K=1.3,2
+    python -m app.scripts.sweep --scenario cloud --param star_mass=10000,30000 --param velocity_scale=0.5,1,2
+                                --seeds 0 1 2 --output sweep.csv --workers 4 --diagnostics
+    python -m app.scripts.sweep --grid grid.json --output sweep.csv
+
+Parameters are constants of Config (G, K, INTEGRATOR, PHYSICS_DT, ...) or parameters of scene:
+    star_mass: mass of all stars
+    velocity_scale: multiplier of initial velocities of planets
+    velocity_noise: standard deviation of random velocity, added to every planet
+"""
+
+# Modules
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import itertools
+from multiprocessing import Pool
+
+import numpy as np
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.scenarios import Scenarios
+from app.scripts.headless import HeadlessRunner
+from app.scripts.diagnostics import Diagnostics
+from app.scripts.event_bus import EventBus
+from app.scripts.config import Config
+
+
+class Sweep:
+    SCENE_PARAMETERS = ('star_mass', 'velocity_scale', 'velocity_noise')
+    SUMMARY_COLUMNS = ('planets', 'survivors', 'devoured', 'merged', 'escaped', 'star_masses', 'steps', 'wall_time',
+                       'energy_drift')
+
+    @staticmethod
+    def get_run_key(task: dict) -> str:
+        """
+        Returns key, that identifies run in table of results. Key contains all settings of run (parameters, seed,
+        scenario, bodies, steps, dt and diagnostics), so runs of another sweep in the same table are never skipped
+        :param task: Task (see Sweep.get_tasks)
+        :return: str
+        """
+
+        return json.dumps(task, sort_keys=True)
+
+    @staticmethod
+    def get_tasks(grid: dict, seeds: list, options: dict) -> list:
+        """
+        Builds all combinations of parameters
+        :param grid: Dictionary {name of parameter: list of values}
+        :param seeds: Seeds of scenario (every combination is run with every seed)
+        :param options: Settings, that are the same for all runs (scenario, bodies, steps, dt, diagnostics)
+        :return: List of tasks (dictionaries)
+        """
+
+        names = sorted(grid)  # Columns of table don't depend on order of arguments
+        return [{'parameters': dict(zip(names, values)), 'seed': seed, **options}
+                for values in itertools.product(*[grid[name] for name in names]) for seed in seeds]
+
+    @staticmethod
+    def prepare_scene(task: dict) -> None:
+        """Applies parameters and generates scene of task"""
+
+        parameters = task['parameters']
+        for name, value in parameters.items():
+            if name not in Sweep.SCENE_PARAMETERS:
+                setattr(Config, name, value)
+
+        # Constants are applied before generation, so orbital velocities of scene match them
+        SimulationManager.clear()
+        Scenarios.GENERATORS[task['scenario']](task['bodies'], seed=task['seed'])
+
+        store = SimulationManager.bodies
+        if 'star_mass' in parameters:
+            for slot in store.get_indexes(BodyStore.STAR).tolist():
+                SimulationManager.get_body(slot).set_mass(parameters['star_mass'])
+
+        planet_slots = store.get_indexes(BodyStore.PLANET)
+        store.velocities[planet_slots] *= parameters.get('velocity_scale', 1)
+        if parameters.get('velocity_noise'):
+            random = np.random.default_rng([task['seed'], 1])  # Independent of random numbers of scenario
+            store.velocities[planet_slots] += random.normal(0, parameters['velocity_noise'], (len(planet_slots), 2))
+
+    @staticmethod
+    def run(task: dict) -> dict:
+        """
+        Runs simulation of task to the end
+        :param task: Task (see Sweep.get_tasks)
+        :return: Summary of run
+        """
+
+        start_time = time.perf_counter()
+        Sweep.prepare_scene(task)
+
+        store = SimulationManager.bodies
+        planets_count = len(store.get_indexes(BodyStore.PLANET))
+        diagnostics = Diagnostics(interval=Config.DIAGNOSTICS_INTERVAL) if task['diagnostics'] else None
+        runner = HeadlessRunner(dt=task['dt'] or Config.PHYSICS_DT, diagnostics=diagnostics)
+
+        # Events are counted by portions, so ring buffer of events never overflows
+        counts = np.zeros(len(EventBus.KINDS), dtype=np.int64)
+        cursor = SimulationManager.events.events_count
+        for start in range(0, task['steps'], Config.SWEEP_EVENTS_INTERVAL):
+            runner.run(min(Config.SWEEP_EVENTS_INTERVAL, task['steps'] - start))
+            events, cursor, _ = SimulationManager.events.read(cursor)
+            counts += np.bincount(events['kind'], minlength=len(EventBus.KINDS))
+
+        star_slots = store.get_indexes(BodyStore.STAR)
+        return {
+            'planets': planets_count,
+            'survivors': len(store.get_indexes(BodyStore.PLANET)),
+            'devoured': int(counts[EventBus.DEVOUR]),
+            'merged': int(counts[EventBus.MERGE]),
+            'escaped': int(counts[EventBus.DEATH]),
+            'star_masses': json.dumps(np.round(store.masses[star_slots], 6).tolist()),
+            'steps': runner.steps,
+            'wall_time': round(time.perf_counter() - start_time, 4),
+            'energy_drift': diagnostics.max_drift['energy'] if diagnostics is not None else '',
+        }
+
+    @staticmethod
+    def read_results(path: str, columns: list) -> list:
+        """
+        Reads rows of finished runs (row, that was cut by interruption, is dropped)
+        :param path: Path to CSV table
+        :param columns: Expected columns
+        :return: List of rows (dictionaries)
+        """
+
+        if not os.path.exists(path):
+            return []
+
+        with open(path, newline='') as file:
+            lines = file.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith('\n'):
+            lines.pop()
+
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is not None and reader.fieldnames != columns:
+            raise ValueError(f'Columns of {path} differ from columns of this sweep')
+        return [row for row in reader if None not in row and None not in row.values()]
+
+    @staticmethod
+    def run_all(tasks: list, path: str, workers: int = Config.SWEEP_WORKERS) -> tuple:
+        """
+        Runs tasks, that aren't in table of results yet, and appends their summaries to table
+        :param tasks: List of tasks (with the same parameters)
+        :param path: Path to CSV table of results
+        :param workers: Number of processes (number of CPUs if None)
+        :return: Tuple of (all rows of table, number of skipped tasks)
+        """
+
+        columns = ['run', 'seed'] + list(tasks[0]['parameters']) + list(Sweep.SUMMARY_COLUMNS)
+        rows = Sweep.read_results(path, columns)
+        finished = {row['run'] for row in rows}
+        pending = [task for task in tasks if Sweep.get_run_key(task) not in finished]
+
+        # Table is rewritten without cut row, then every summary is appended and flushed
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+            if not pending:
+                return rows, len(tasks)
+
+            # Every run gets new process, so state of simulation and Config never leaks between runs
+            with Pool(processes=workers or os.cpu_count() or 1, maxtasksperchild=1) as pool:
+                for index, row in enumerate(pool.imap_unordered(run_task, pending), start=1):
+                    writer.writerow(row)
+                    file.flush()
+                    rows.append(row)
+                    print(f'[{index}/{len(pending)}] {row["run"]}: survivors {row["survivors"]}, '
+                          f'devoured {row["devoured"]}, {row["wall_time"]:.2f} s')
+
+        return rows, len(tasks) - len(pending)
+
+
+def run_task(task: dict) -> dict:
+    """
+    Runs task and returns row of table (runs in worker process)
+    :param task: Task (see Sweep.get_tasks)
+    :return: Dictionary {column: value}
+    """
+
+    return {'run': Sweep.get_run_key(task), 'seed': task['seed'],
+            **task['parameters'], **Sweep.run(task)}
+
+
+def parse_value(value: str):
+    """Parses value of parameter as JSON (string, if it isn't JSON)"""
+
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def parse_arguments(arguments=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Runs simulations for all combinations of parameters')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE,VALUE',
+                        help='Values of parameter (Config constant, star_mass, velocity_scale or velocity_noise)')
+    parser.add_argument('--grid', help='Path to JSON file {name of parameter: list of values}')
+    parser.add_argument('--scenario', choices=sorted(Scenarios.GENERATORS), default='ring', help='Generated scene')
+    parser.add_argument('--bodies', type=int, default=200, help='Number of generated planets')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0], help='Seeds of generated scene')
+    parser.add_argument('--steps', type=int, default=1000, help='Number of steps of every run')
+    parser.add_argument('--dt', type=float, help=f'Time step (default: {Config.PHYSICS_DT})')
+    parser.add_argument('--diagnostics', action='store_true', help='Measure max drift of energy of every run')
+    parser.add_argument('--workers', type=int, default=Config.SWEEP_WORKERS, help='Number of processes')
+    parser.add_argument('--output', default='sweep.csv', help='Path to CSV table of results (runs in it are skipped)')
+    arguments = parser.parse_args(arguments)
+
+    grid = {}
+    if arguments.grid:
+        with open(arguments.grid) as file:
+            grid.update(json.load(file))
+    for parameter in arguments.param:
+        name, _, values = parameter.partition('=')
+        grid[name.strip()] = [parse_value(value.strip()) for value in values.split(',')]
+
+    for name, values in grid.items():
+        if name not in Sweep.SCENE_PARAMETERS and not (name.isupper() and hasattr(Config, name)):
+            parser.error(f'Unknown parameter: {name}')
+        if not isinstance(values, list) or not values:
+            parser.error(f'Parameter {name} needs a list of values')
+
+    # Runs are already processes of pool, so they can't start processes of parallel solver
+    if 'parallel' in grid.get('GRAVITY_SOLVER', [Config.GRAVITY_SOLVER]):
+        parser.error('Parallel gravity solver can\'t be used inside sweep')
+
+    arguments.grid = grid
+    return arguments
+
+
+def main(arguments=None) -> int:
+    arguments = parse_arguments(arguments)
+
+    options = {'scenario': arguments.scenario, 'bodies': arguments.bodies, 'steps': arguments.steps,
+               'dt': arguments.dt, 'diagnostics': arguments.diagnostics}
+    tasks = Sweep.get_tasks(arguments.grid, arguments.seeds, options)
+
+    try:
+        rows, skipped_count = Sweep.run_all(tasks, arguments.output, workers=arguments.workers)
+    except KeyboardInterrupt:
+        print(f'Interrupted, finished runs are saved in {arguments.output} (run again to continue)')
+        return 1
+
+    print(f'Runs: {len(tasks)}, skipped (already finished): {skipped_count}, results: {arguments.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Module containing storage of traces of planets
+"""
+
+# Modules
+from functools import lru_cache
+
+import numpy as np
+
+from app.scripts.config import Config
+
+
+class TraceBuffer:
+    """
+    Ring buffer of positions, backed by array of fixed size.
+    When buffer is full, new position overwrites the oldest one.
+    """
+
+    def __init__(self, capacity: int = Config.MAX_TRACE_LENGTH):
+        """
+        :param capacity: Max number of positions
+        """
+
+        self.points = np.empty((capacity, 2))
+        self.start = 0  # Index of the oldest position
+        self.length = 0  # Number of stored positions
+
+        # Bounding box of stored positions (it can be bigger, than box of positions, until it is recalculated)
+        self.bounds = (np.inf, np.inf, -np.inf, -np.inf)  # (min x, min y, max x, max y)
+        self.appends_count = 0  # Number of positions, appended after recalculation of bounds
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, point: tuple) -> None:
+        capacity = len(self.points)
+        self.points[(self.start + self.length) % capacity] = point
+
+        if self.length < capacity:
+            self.length += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+        # Bounds are only extended, and are recalculated, when all old positions have been overwritten
+        x, y = point
+        min_x, min_y, max_x, max_y = self.bounds
+        self.bounds = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+        self.appends_count += 1
+        if self.appends_count >= capacity:
+            self.update_bounds()
+
+    def update_bounds(self) -> None:
+        """Recalculates exact bounding box of stored positions"""
+
+        points = self.get_points()
+        if len(points):
+            (min_x, min_y), (max_x, max_y) = points.min(axis=0).tolist(), points.max(axis=0).tolist()
+            self.bounds = (min_x, min_y, max_x, max_y)
+        else:
+            self.bounds = (np.inf, np.inf, -np.inf, -np.inf)
+        self.appends_count = 0
+
+    def extend(self, points: np.ndarray) -> None:
+        for point in points:
+            self.append(point)
+
+    def set_points(self, points: np.ndarray) -> None:
+        """Replaces positions with the newest positions of array (from the oldest to the newest one)"""
+
+        points = points[-len(self.points):]
+        self.points[:len(points)] = points
+        self.start = 0
+        self.length = len(points)
+        self.update_bounds()
+
+    def clear(self) -> None:
+        self.start = 0
+        self.length = 0
+        self.update_bounds()
+
+    def get_points(self) -> np.ndarray:
+        """Returns array (length, 2) of positions from the oldest to the newest one"""
+
+        end = self.start + self.length
+        if end <= len(self.points):
+            return self.points[self.start:end]
+
+        return np.concatenate([self.points[self.start:], self.points[:end - len(self.points)]])
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_buckets(length: int, buckets_count: int = Config.TRACE_ALPHA_BUCKETS) -> tuple:
+        """
+        Splits segments of trace into groups, drawn by a single polyline with the same alpha and thickness.
+        Segment with index i connects positions i - 1 and i, has thickness min(i // 100 + 1, 3)
+        and alpha i / length, group gets average alpha of its segments
+        :param length: Number of positions in trace
+        :param buckets_count: Number of groups with different alpha
+        :return: Tuple of (first segment, last segment + 1, thickness, alpha) tuples
+        """
+
+        edges = set(np.linspace(1, length, buckets_count + 1).round().astype(int).tolist())
+        edges.update(edge for edge in (100, 200) if 1 < edge < length)  # Changes of thickness
+        edges = sorted(edges)
+
+        buckets = []
+        for start, end in zip(edges[:-1], edges[1:]):
+            thickness = min(start // 100 + 1, 3)
+            alpha = round((start + end - 1) / 2 / length * 255)
+            buckets.append((start, end, thickness, alpha))
+
+        return tuple(buckets)
@@ -0,0 +1,43 @@
+"""
+Tests of Barnes-Hut gravity solver
+"""
+
+# Modules
+import numpy as np
+import pytest
+
+from app.scripts.barnes_hut import BarnesHut
+from app.scripts.physic import Physic
+from app.scripts.config import Config
+
+BODIES_COUNT = 2000
+
+
+@pytest.fixture
+def bodies():
+    """Clustered bodies (some of them share the deepest cells of the tree) with their positions and masses"""
+
+    random = np.random.default_rng(0)
+    positions = np.concatenate([random.uniform(0, 2000, (BODIES_COUNT // 2, 2)),
+                                random.normal(640, 5, (BODIES_COUNT // 2, 2))])
+    positions[:10] = positions[10:20]  # Bodies at the same point don't attract each other
+    masses = random.uniform(Config.PLANET_MIN_MASS, Config.PLANET_MAX_MASS, BODIES_COUNT)
+    return positions, masses
+
+
+@pytest.mark.parametrize('targets', ['bodies', 'points'])
+def test_zero_theta_is_direct_summation(bodies, targets):
+    positions, masses = bodies
+    if targets == 'bodies':
+        targets = positions
+    else:
+        targets = np.random.default_rng(1).uniform(-500, 2500, (500, 2))
+
+    # No node is accepted as a single body, so every body is summed directly
+    solver = BarnesHut(theta=0)
+    solver.build(positions, masses)
+    accelerations = solver.calculate_accelerations(targets)
+
+    exact = Physic.calculate_accelerations(targets, positions, masses)
+    assert np.allclose(accelerations, exact, rtol=1e-9, atol=1e-12)
+    assert BarnesHut.calculate_error(accelerations, exact)['max'] < 1e-9
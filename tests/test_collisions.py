@@ -0,0 +1,37 @@
+"""
+Tests of search of collisions between bodies
+"""
+
+# Modules
+import numpy as np
+import pytest
+
+from app.scripts.collisions import Collisions
+
+
+def find_pairs_directly(positions: np.ndarray, radii: np.ndarray) -> set:
+    """Returns set of pairs (i, j), i < j, of overlapping bodies by checking of all pairs"""
+
+    first_bodies, second_bodies = np.triu_indices(len(positions), k=1)
+    distances = np.linalg.norm(positions[first_bodies] - positions[second_bodies], axis=1)
+    is_colliding = distances < radii[first_bodies] + radii[second_bodies]
+    return set(zip(first_bodies[is_colliding].tolist(), second_bodies[is_colliding].tolist()))
+
+
+@pytest.mark.parametrize('seed, bodies_count, size', [(0, 1000, 300), (1, 2000, 100), (2, 500, 5000)])
+def test_broad_phase_finds_all_pairs(seed, bodies_count, size):
+    random = np.random.default_rng(seed)
+    # Negative coordinates, bodies at the same point and radii of very different sizes
+    positions = random.uniform(-size, size, (bodies_count, 2))
+    positions[:10] = positions[10:20]
+    radii = random.uniform(0.5, 3, bodies_count)
+    radii[:5] = 40
+
+    first_bodies, second_bodies = Collisions.find_collisions(positions, radii)
+    pairs = list(zip(np.minimum(first_bodies, second_bodies).tolist(),
+                     np.maximum(first_bodies, second_bodies).tolist()))
+
+    # Every pair is found once
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == find_pairs_directly(positions, radii)
+    assert pairs
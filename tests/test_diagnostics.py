@@ -0,0 +1,37 @@
+"""
+Tests of conservation diagnostics
+"""
+
+# Modules
+import pytest
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.scenarios import Scenarios
+from app.scripts.diagnostics import Diagnostics
+from app.scripts.headless import HeadlessRunner
+
+
+@pytest.fixture
+def runner():
+    """Runner with diagnostics in cloud, where planets merge and are devoured on most of steps"""
+
+    Scenarios.clear()
+    Scenarios.cloud(300, seed=0)
+    yield HeadlessRunner(dt=1, diagnostics=Diagnostics(interval=50))
+
+    SimulationManager.diagnostics = None
+    Scenarios.clear()
+
+
+def test_drift_accumulates_over_collisions(runner):
+    diagnostics = runner.diagnostics
+    drifts = []
+    for _ in range(4):
+        runner.run(25)
+        drifts.append(dict(diagnostics.previous_drift))
+
+    # Collisions end segments, so every segment adds its drift instead of starting from zero
+    assert diagnostics.segments_count > 10
+    assert diagnostics.max_drift['energy'] > 0
+    assert all(drift['energy'] != 0 for drift in drifts)
+    assert len({drift['energy'] for drift in drifts}) == len(drifts)
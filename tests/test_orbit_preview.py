@@ -0,0 +1,49 @@
+"""
+Tests of predicted trajectory of new planet
+"""
+
+# Modules
+import numpy as np
+import pygame
+import pytest
+from pygame.math import Vector2
+
+from app.scripts.simulation import SimulationManager, Planet, Star
+from app.scripts.physics_worker import PhysicsState
+from app.scripts.orbit_preview import OrbitPreview
+from app.scripts.config import Config
+
+
+@pytest.fixture
+def star(monkeypatch):
+    """Single star, in field of which planet is launched"""
+
+    monkeypatch.setattr(Config, 'STAR_FIELD', False)
+    SimulationManager.clear()
+    yield Star(640, 360, Config.STAR_DEFAULT_MASS, pygame.Color(255, 255, 17))
+
+    SimulationManager.clear()
+
+
+@pytest.mark.parametrize('integrator, block_timesteps', [('euler', False), ('leapfrog', False), ('rk4', False),
+                                                         ('leapfrog', True)])
+def test_preview_follows_simulation(star, monkeypatch, integrator, block_timesteps):
+    monkeypatch.setattr(Config, 'INTEGRATOR', integrator)
+    monkeypatch.setattr(Config, 'BLOCK_TIMESTEPS', block_timesteps)
+    position, velocity, mass = (640.0, 160.0), (1.5, 0.0), Config.PLANET_DEFAULT_MASS
+
+    preview = OrbitPreview(max_steps=400, dt=1)
+    preview.set_launch(PhysicsState.capture(), position, velocity, Planet.get_radius(mass))
+    while not preview.is_finished:
+        preview.extend(time_budget=1)
+
+    # Single planet doesn't attract other planets, so simulation moves it as test particle
+    planet = Planet(*position, Vector2(velocity), mass, pygame.Color(0, 255, 0))
+    positions = [position]
+    for _ in range(len(preview.points) - 1):
+        for _ in range(Config.ORBIT_PREVIEW_POINT_STRIDE):
+            SimulationManager.update_physics(1)
+        positions.append((planet.x, planet.y))
+
+    assert preview.end is None
+    assert np.allclose(preview.points, positions, rtol=0, atol=1e-6)
@@ -0,0 +1,69 @@
+"""
+Tests of saving and restoring of the full state of simulation
+"""
+
+# Modules
+import time
+
+import numpy as np
+import pytest
+
+from app.scripts.simulation import SimulationManager
+from app.scripts.body_store import BodyStore
+from app.scripts.snapshot import Snapshot
+from app.scripts.trace_buffer import TraceBuffer
+from app.scripts.config import Config
+
+BODIES_COUNT = 100000
+MAX_RESTORE_TIME = 1  # Seconds
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """Saves 100k bodies (3 stars and planets, some of them with traces) and returns path to file"""
+
+    random = np.random.default_rng(0)
+    kinds = np.full(BODIES_COUNT, BodyStore.PLANET)
+    kinds[:3] = BodyStore.STAR
+
+    SimulationManager.clear()
+    slots = SimulationManager.add_bodies(kinds, random.uniform(0, 1000, (BODIES_COUNT, 2)),
+                                         random.normal(0, 1, (BODIES_COUNT, 2)),
+                                         random.uniform(Config.PLANET_MIN_MASS, Config.PLANET_MAX_MASS, BODIES_COUNT),
+                                         tuple(Config.PLANET_COLOR))
+    SimulationManager.bodies.velocities[slots[:3]] = 0  # Velocities of stars aren't saved
+
+    for body_id in SimulationManager.bodies.ids[slots[3:13]].tolist():
+        trace = SimulationManager.traces[body_id] = TraceBuffer(capacity=Config.MAX_TRACE_LENGTH)
+        trace.set_points(random.uniform(0, 1000, (5, 2)))
+
+    path = str(tmp_path / 'bodies.snapshot')
+    Snapshot.save(path)
+    yield path
+
+    SimulationManager.clear()
+
+
+def test_restore_is_bulk(snapshot_path):
+    columns = Snapshot.collect()
+    traces = [trace.get_points() for trace in SimulationManager.traces.values()]
+    SimulationManager.clear()
+
+    store = SimulationManager.bodies
+    version = store.version
+    start_time = time.perf_counter()
+    Snapshot.restore(snapshot_path)
+    restore_time = time.perf_counter() - start_time
+
+    # Clearing and one write of all bodies
+    assert store.version == version + 2
+    assert restore_time < MAX_RESTORE_TIME
+
+    restored_columns = Snapshot.collect()
+    for name, column in columns.items():
+        assert np.array_equal(restored_columns[name], column), name
+
+    # Objects of planets are created only when they are used (objects of stars are passed to grid)
+    assert all(store.get_body(slot) is None for slot in store.get_indexes(BodyStore.PLANET).tolist())
+    assert [trace.get_points().tolist() for trace in SimulationManager.traces.values()] == \
+           [points.tolist() for points in traces]